@@ -9,19 +9,48 @@ data_lock = threading.Lock()
 
 wave_running = False
 sismo_running = False
+emergency_stop_latched = False     # set by an emergency stop or the firmware watchdog; blocks motion commands
+stop_status = ""
+stop_status_dirty = False
+device_stats_history = deque(maxlen=600)   # (monotonic time, stats dict) from the firmware's 'q' line
+latest_angle = None                # last absolute encoder angle (deg) and its monotonic receive time
+latest_angle_time = 0.0
+position_loop_enabled = False      # host-side closed-loop correction (position_loop.py)
+position_loop_kp = 0.3
+position_loop_ki = 2.0             # 1/s
+position_loop_limit = 400          # steps
+position_loop_delay_s = 0.03       # expected table lag behind the command
+telemetry_rate_hz = 250            # encoder telemetry rate requested from the firmware ('r<hz>')
+serial_baud = 921600               # baud rate of the open connection (caps the telemetry rate)
+telemetry_dropped_samples = 0      # encoder samples the device reported as dropped ("!d")
 
 x_data = deque(maxlen=500)
 y_data = deque(maxlen=500)
 expected_wave_data = deque(maxlen=500)
 expected_wave_time = deque(maxlen=500)
+velocity_data = deque(maxlen=500)          # (plot time, steps/s) estimated from the encoder (kinematics.py)
+acceleration_data = deque(maxlen=500)      # (plot time, steps/s^2) estimated from the encoder
+target_acceleration_data = deque(maxlen=500)   # (plot time, steps/s^2) of the commanded trajectory
 plot_start_time = 0
 max_points = 500
-
-log_recv = deque(maxlen=100)
-log_sent = deque(maxlen=100)
-log_dirty = False
+replay_running = False             # a recorded session is feeding the plots instead of the serial port
+replay_position = 0.0
+replay_duration = 0.0
+telemetry_capture = None           # list of (time, absolute angle) while a correction run captures the full response
+telemetry_pending_since_ns = None   # perf_counter_ns of the oldest sample not yet plotted (instrumentation)
 
 viewer_seismic_files = {}
 viewer_all_traces = []              
 viewer_selected_trace_index = None
-viewer_data_dirty = threading.Event()
\ No newline at end of file
+viewer_visible_indices = None       # ordered global indices from a catalog query, None = all
+viewer_data_dirty = threading.Event()
+viewer_playback_amplitude = 1600
+viewer_command_rate = 100.0         # Hz; records are resampled to this rate for playback (0 = record rate)
+viewer_similitude_scale = 1.0       # length scale of the specimen; time is compressed by sqrt(scale)
+viewer_trim_strong_motion = True   # play only the strong-motion window (strong_motion.py)...
+viewer_trim_pre_s = 5.0             # ...padded by this much before
+viewer_trim_post_s = 10.0           # ...and after
+envelope_enforce = True             # refuse trajectories outside the mapped envelope (performance_envelope.py)
+backlash_compensation = False       # pre-compensate playback with the fitted backlash model (backlash.py)
+viewer_playback_status = ""
+viewer_playback_status_dirty = False
@@ -0,0 +1,182 @@
+# backlash.py
+# Backlash/hysteresis model of the drive, fitted from recorded bidirectional
+# sweeps and inverted on playback trajectories.
+# The table is modelled as a play (backlash) operator of width w on the command,
+# followed by a gain, an offset and a transport lag:
+#     y[k] = gain * play_w(x)[k - lag] + offset
+# Fit: for every candidate lag, least squares of y on [x, direction, 1] (the
+# direction coefficient is -gain * w / 2) gives a first estimate; width and lag
+# are then refined together against the exact play operator. The play operator
+# is a composition of clip functions, which compose into a clip again, so it is
+# evaluated for a whole record with a log-step prefix scan instead of a
+# per-sample loop.
+# Pre-compensation adds +-w/2 in the direction of motion, switching over a few
+# steps of travel so sensor-level reversals do not toggle it.
+
+import json
+import os
+
+import numpy as np
+
+from drive_correction import degrees_to_steps
+
+MODEL_FILE_NAME = "backlash_model.json"
+MAX_LAG_S = 0.2
+DEFAULT_TRANSITION_STEPS = 4.0    # travel over which the compensation switches sides
+WIDTH_REFINE_POINTS = 25
+
+_model = None
+_model_mtime = None
+
+def get_model_path():
+    """Gets the absolute path to the fitted model next to the app modules."""
+    return os.path.join(os.path.dirname(os.path.abspath(__file__)), MODEL_FILE_NAME)
+
+def load_model():
+    """Returns the fitted model dict, or None if no sweep has been fitted yet."""
+    global _model, _model_mtime
+    path = get_model_path()
+    try:
+        mtime = os.path.getmtime(path)
+    except OSError:
+        return None
+    if _model is None or mtime != _model_mtime:
+        with open(path) as f:
+            _model = json.load(f)
+        _model_mtime = mtime
+    return _model
+
+def save_model(model):
+    with open(get_model_path(), "w") as f:
+        json.dump(model, f, indent=2)
+
+def motion_direction(x):
+    """+1/-1 direction of motion per sample; samples without motion keep the last direction."""
+    x = np.asarray(x, dtype=np.float64)
+    step = np.sign(np.diff(x, prepend=x[:1]))
+    moving = np.flatnonzero(step)
+    if moving.size == 0:
+        return np.ones_like(x)
+    last = np.zeros(x.size, dtype=np.int64)
+    last[moving] = moving
+    last = np.maximum.accumulate(last)
+    direction = step[last]
+    direction[:moving[0]] = step[moving[0]]
+    return direction
+
+def play_operator(x, width, initial=None):
+    """Backlash (play) operator: the output follows x only once it is more than
+    width/2 away, p[k] = clip(p[k-1], x[k] - width/2, x[k] + width/2)."""
+    x = np.asarray(x, dtype=np.float64)
+    half = max(float(width), 0.0) / 2.0
+    if x.size == 0 or half == 0.0:
+        return x.copy()
+    # Each sample is clip(., lo, hi); clip(clip(v, a1, b1), a2, b2) = clip(v, clip(a1, a2, b2), clip(b1, a2, b2)).
+    lo, hi = x - half, x + half
+    shift = 1
+    while shift < x.size:
+        prev_lo, prev_hi = lo[:-shift], hi[:-shift]
+        cur_lo, cur_hi = lo[shift:], hi[shift:]
+        new_lo = np.clip(prev_lo, cur_lo, cur_hi)
+        new_hi = np.clip(prev_hi, cur_lo, cur_hi)
+        lo = np.concatenate([lo[:shift], new_lo])
+        hi = np.concatenate([hi[:shift], new_hi])
+        shift *= 2
+    return np.clip(x[0] if initial is None else initial, lo, hi)
+
+def _fit_linear(x, direction, y, lag):
+    n = x.size - lag
+    design = np.column_stack([x[:n], direction[:n], np.ones(n)])
+    coefficients, *_ = np.linalg.lstsq(design, y[lag:], rcond=None)
+    residual = y[lag:] - design @ coefficients
+    return coefficients, float(np.sqrt(np.mean(residual ** 2)))
+
+def _line_fit(a, b):
+    """Least squares b ~ g * a + o; returns (g, o, rms residual)."""
+    a_mean, b_mean = a.mean(), b.mean()
+    da, db = a - a_mean, b - b_mean
+    var_a = float(np.dot(da, da))
+    g = float(np.dot(da, db)) / var_a if var_a > 0 else 0.0
+    residual = db - g * da
+    return g, float(b_mean - g * a_mean), float(np.sqrt(np.dot(residual, residual) / a.size))
+
+def fit(commanded, measured, sample_interval, max_lag_s=MAX_LAG_S):
+    """Fits the model to a sweep: commanded and measured positions in steps on the same grid.
+
+    Returns a dict with width (steps), gain, offset, lag_s, rms residuals with and
+    without the backlash term, and the number of direction reversals seen."""
+    x = np.asarray(commanded, dtype=np.float64)
+    y = np.asarray(measured, dtype=np.float64)
+    if x.size != y.size or x.size < 16:
+        raise ValueError("Sweep too short to fit.")
+    direction = motion_direction(x)
+    reversals = int(np.count_nonzero(np.diff(direction)))
+    if reversals < 2:
+        raise ValueError("The sweep must move in both directions (at least two reversals).")
+
+    max_lag = int(min(max_lag_s / sample_interval, x.size // 4))
+    fits = [_fit_linear(x, direction, y, lag) for lag in range(max_lag + 1)]
+    lag = int(np.argmin([rms for _, rms in fits]))
+    gain, direction_term, offset = fits[lag][0]
+    width = max(0.0, -2.0 * direction_term / gain) if gain else 0.0
+
+    # The linear fit switches direction instantly and underestimates the width:
+    # refine width and lag jointly against the exact play operator
+    def search(widths, best):
+        for candidate in widths:
+            played = play_operator(x, candidate)
+            for candidate_lag in range(max_lag + 1):
+                n = x.size - candidate_lag
+                g, o, rms = _line_fit(played[:n], y[candidate_lag:])
+                if rms < best[0]:
+                    best = (rms, float(candidate), candidate_lag, g, o)
+        return best
+    coarse = np.linspace(0.0, 3.0 * width + 2.0, WIDTH_REFINE_POINTS)
+    best = search(coarse, (np.inf, width, lag, gain, offset))
+    spacing = coarse[1] - coarse[0]
+    best = search(np.linspace(max(0.0, best[1] - spacing), best[1] + spacing, 9), best)
+    rms, width, lag, gain, offset = best
+
+    n = x.size - lag
+    plain_rms = _line_fit(x[:n], y[lag:])[2]
+    return dict(width=width, gain=gain, offset=offset, lag_s=lag * sample_interval,
+                residual_rms=rms, residual_rms_without_backlash=plain_rms, reversals=reversals)
+
+def session_sweep(records, sample_interval=0.005):
+    """Commanded and measured positions (steps) of a recorded session on a common grid.
+
+    Commands are held between writes (they are stepper targets); the encoder angle
+    is interpolated and taken relative to its value at the first command."""
+    import session_log
+    commands = records[records['kind'] == session_log.KIND_COMMAND]
+    telemetry = records[records['kind'] == session_log.KIND_TELEMETRY]
+    if commands.size < 2 or telemetry.size < 2:
+        raise ValueError("The session has no command/telemetry pairs to fit.")
+    start = max(commands['t'][0], telemetry['t'][0])
+    end = min(commands['t'][-1], telemetry['t'][-1])
+    grid = np.arange(start, end, sample_interval)
+    held = np.searchsorted(commands['t'], grid, side="right") - 1
+    commanded = commands['value'][held]
+    measured = degrees_to_steps(np.interp(grid, telemetry['t'], telemetry['value']))
+    return commanded, measured - measured[0] + commanded[0]
+
+def fit_session(path, sample_interval=0.005):
+    """Fits a recorded sweep session; returns the model dict (see fit) with its source."""
+    import session_log
+    commanded, measured = session_sweep(session_log.open_session(path), sample_interval)
+    model = fit(commanded, measured, sample_interval)
+    model['source'] = os.path.basename(path)
+    return model
+
+def precompensate(displacement, width, transition=DEFAULT_TRANSITION_STEPS):
+    """Inverse of the backlash on a trajectory (steps): adds width/2 in the direction of motion.
+
+    The side switches over `transition` steps of travel after each reversal."""
+    x = np.asarray(displacement, dtype=np.float64)
+    if width <= 0 or x.size == 0:
+        return x
+    if transition > 0:
+        side = (x - play_operator(x, transition)) / (transition / 2.0)
+    else:
+        side = motion_direction(x)
+    return x + side * (width / 2.0)
@@ -0,0 +1,127 @@
+# batch_export.py
+# Batch export of table-ready trajectories for a test campaign.
+# Each record file is processed in a worker process (the same preparation as
+# playback: detrend, taper, double integration, scaling to motor steps) and every
+# trace is written as an uncompressed .npz holding displacement (steps),
+# velocity (steps/s), acceleration (steps/s^2) and its metadata. CSV can be
+# written as well. A manifest.json lists every exported trace.
+
+import json
+import multiprocessing
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+EXPORTS_FOLDER_NAME = "exports"
+MAX_WORKERS = max(1, min(8, (os.cpu_count() or 2) - 1))
+
+def get_exports_folder_path():
+    """Gets the absolute path to the folder holding export campaigns."""
+    return os.path.join(os.path.dirname(os.path.abspath(__file__)), EXPORTS_FOLDER_NAME)
+
+def _safe_name(text):
+    return "".join(c if c.isalnum() or c in "-_." else "_" for c in text)
+
+def table_trajectory(displacement, sample_interval):
+    """Velocity and acceleration of a step trajectory by central differences."""
+    displacement = np.asarray(displacement, dtype=np.float64)
+    if displacement.size < 2:
+        zeros = np.zeros(displacement.size)
+        return zeros, zeros
+    velocity = np.gradient(displacement, sample_interval)
+    return velocity, np.gradient(velocity, sample_interval)
+
+def _export_file(file_path, trace_ids, out_dir, amplitude, command_rate, similitude_scale, backlash_width,
+                 trim_padding, write_csv):
+    """Processes the selected traces of one record file (runs in a worker process).
+
+    trace_ids is a set of (trace id, starttime) or None for every trace.
+    Returns a list of manifest entries."""
+    from obspy import read
+    import seismic_handler as sh
+
+    entries = []
+    for trace in read(file_path):
+        starttime = str(trace.stats.starttime)
+        if trace_ids is not None and (trace.id, starttime) not in trace_ids:
+            continue
+        displacement, sample_interval = sh._prepare_trace_for_playback(trace, amplitude, command_rate, similitude_scale,
+                                                                       backlash_width, trim_padding)
+        velocity, acceleration = table_trajectory(displacement, sample_interval)
+        name = _safe_name(f"{os.path.splitext(os.path.basename(file_path))[0]}_{trace.id}_{starttime}")
+        metadata = dict(source_file=os.path.basename(file_path), trace_id=trace.id, starttime=starttime,
+                        sample_interval=sample_interval, samples=int(displacement.size), amplitude=amplitude,
+                        command_rate=command_rate, similitude_scale=similitude_scale, backlash_width=backlash_width,
+                        trim_padding=trim_padding,
+                        peak_velocity=float(np.max(np.abs(velocity))) if velocity.size else 0.0,
+                        peak_acceleration=float(np.max(np.abs(acceleration))) if acceleration.size else 0.0)
+        npz_path = os.path.join(out_dir, name + ".npz")
+        np.savez(npz_path, displacement=displacement.astype(np.int32), velocity=velocity.astype(np.float32),
+                 acceleration=acceleration.astype(np.float32), metadata=np.array(json.dumps(metadata)))
+        files = [os.path.basename(npz_path)]
+        if write_csv:
+            csv_path = os.path.join(out_dir, name + ".csv")
+            times = np.arange(displacement.size) * sample_interval
+            np.savetxt(csv_path, np.column_stack([times, displacement, velocity, acceleration]),
+                       delimiter=",", fmt=("%.6f", "%d", "%.6g", "%.6g"),
+                       header="time_s,displacement_steps,velocity_steps_s,acceleration_steps_s2", comments="")
+            files.append(os.path.basename(csv_path))
+        metadata['files'] = files
+        metadata['bytes'] = sum(os.path.getsize(os.path.join(out_dir, f)) for f in files)
+        entries.append(metadata)
+    return entries
+
+def _safe_export_file(args):
+    try:
+        return _export_file(*args), None
+    except Exception as e:
+        return [], f"{os.path.basename(args[0])}: {e}"
+
+def export_traces(selection, amplitude, command_rate=0.0, similitude_scale=1.0, backlash_width=0.0,
+                  trim_padding=None, write_csv=False, out_dir=None, max_workers=MAX_WORKERS):
+    """Exports the selected traces and returns a summary with throughput figures.
+
+    selection maps file_path -> set of (trace id, starttime), or None for every
+    trace in that file. command_rate, similitude_scale, backlash_width and
+    trim_padding are applied as for playback."""
+    out_dir = out_dir or os.path.join(get_exports_folder_path(), time.strftime("campaign-%Y%m%d-%H%M%S"))
+    os.makedirs(out_dir, exist_ok=True)
+    jobs = [(path, ids, out_dir, int(amplitude), float(command_rate), float(similitude_scale),
+             float(backlash_width), trim_padding, write_csv) for path, ids in selection.items()]
+
+    start = time.perf_counter()
+    entries, errors = [], []
+    if jobs:
+        # spawn: the GUI process has live threads, forking them is not safe
+        with ProcessPoolExecutor(max_workers=min(max_workers, len(jobs)),
+                                 mp_context=multiprocessing.get_context("spawn")) as pool:
+            for file_entries, error in pool.map(_safe_export_file, jobs):
+                entries.extend(file_entries)
+                if error:
+                    errors.append(error)
+    elapsed = time.perf_counter() - start
+
+    with open(os.path.join(out_dir, "manifest.json"), "w") as f:
+        json.dump({'created': time.strftime('%Y-%m-%d %H:%M:%S'), 'amplitude': int(amplitude),
+                   'command_rate': float(command_rate), 'similitude_scale': float(similitude_scale),
+                   'backlash_width': float(backlash_width), 'trim_padding': trim_padding,
+                   'traces': entries, 'errors': errors}, f, indent=2)
+
+    samples = sum(e['samples'] for e in entries)
+    written = sum(e['bytes'] for e in entries)
+    summary = dict(out_dir=out_dir, traces=len(entries), files=len(jobs), samples=samples, bytes=written,
+                   elapsed_s=elapsed, traces_per_s=len(entries) / elapsed if elapsed > 0 else 0.0,
+                   samples_per_s=samples / elapsed if elapsed > 0 else 0.0, errors=errors)
+    print(f"Export: {len(entries)} traces ({samples} samples, {written / 1e6:.1f} MB) in {elapsed:.2f} s "
+          f"-> {summary['traces_per_s']:.1f} traces/s, {summary['samples_per_s'] / 1e6:.2f} Msamples/s")
+    for error in errors:
+        print(f"Export: Error in {error}")
+    return summary
+
+def load_export(npz_path):
+    """Reads an exported trajectory: returns (displacement, velocity, acceleration, metadata)."""
+    with np.load(npz_path) as data:
+        return (data['displacement'], data['velocity'], data['acceleration'],
+                json.loads(str(data['metadata'])))
@@ -0,0 +1,195 @@
+# catalog_index.py
+# Persistent SQLite index of the records folder.
+# Stores per-trace metadata plus derived intensity measures (PGA, PGV, Arias
+# intensity, significant duration, dominant frequency) and the unpadded
+# strong-motion window so the viewer can filter and sort large catalogs without
+# reading every waveform. Only files whose modification time or size changed are
+# re-indexed; an index whose PRAGMA user_version differs from CATALOG_VERSION
+# (older schema or measures computed differently) is rebuilt.
+
+import multiprocessing
+import os
+import sqlite3
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+import strong_motion
+
+CATALOG_FILE_NAME = ".catalog.sqlite"
+RECORD_EXTENSIONS = ('.mseed', '.msd', '.miniseed')
+MAX_WORKERS = 4
+CATALOG_VERSION = 2              # bump when the schema or how a measure is computed changes
+
+# Columns that can be used in query_traces filters and ordering
+QUERY_FIELDS = ('trace_id', 'network', 'station', 'location', 'channel', 'file_name',
+                'starttime', 'sampling_rate', 'npts', 'duration',
+                'pga', 'pgv', 'arias', 'significant_duration', 'dominant_freq',
+                'window_start', 'window_end')
+INDEXED_FIELDS = ('station', 'channel', 'sampling_rate', 'duration',
+                  'pga', 'pgv', 'arias', 'significant_duration', 'dominant_freq')
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS files (
+    file_path TEXT PRIMARY KEY,
+    mtime REAL NOT NULL,
+    size INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS traces (
+    file_path TEXT NOT NULL REFERENCES files(file_path) ON DELETE CASCADE,
+    file_name TEXT NOT NULL,
+    trace_id TEXT NOT NULL,
+    network TEXT, station TEXT, location TEXT, channel TEXT,
+    starttime TEXT NOT NULL, endtime TEXT,
+    sampling_rate REAL, npts INTEGER, duration REAL,
+    pga REAL, pgv REAL, arias REAL, significant_duration REAL, dominant_freq REAL,
+    window_start REAL, window_end REAL,
+    PRIMARY KEY (file_path, trace_id, starttime)
+);
+"""
+
+def get_catalog_path(folder_path):
+    """Location of the index database for a records folder."""
+    return os.path.join(folder_path, CATALOG_FILE_NAME)
+
+def list_record_files(folder_path):
+    """Returns {file_path: (mtime, size)} for every seismic record in the folder."""
+    records = {}
+    with os.scandir(folder_path) as entries:
+        for entry in entries:
+            if entry.is_file() and entry.name.lower().endswith(RECORD_EXTENSIONS):
+                stat = entry.stat()
+                records[entry.path] = (stat.st_mtime, stat.st_size)
+    return records
+
+def _connect(folder_path):
+    conn = sqlite3.connect(get_catalog_path(folder_path))
+    conn.row_factory = sqlite3.Row
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA foreign_keys=ON")
+    if conn.execute("PRAGMA user_version").fetchone()[0] != CATALOG_VERSION:
+        conn.executescript("DROP TABLE IF EXISTS traces; DROP TABLE IF EXISTS files;" + _SCHEMA)
+        conn.execute(f"PRAGMA user_version = {CATALOG_VERSION}")
+    for field in INDEXED_FIELDS:
+        conn.execute(f"CREATE INDEX IF NOT EXISTS idx_traces_{field} ON traces({field})")
+    return conn
+
+def intensity_measures(trace):
+    """PGA, PGV, Arias intensity, 5-95% significant duration, dominant frequency
+    and the unpadded strong-motion window (seconds from the trace start).
+
+    The trace is treated like the shaking table pipeline does: a velocity record
+    that is detrended, band-pass filtered and differentiated to acceleration
+    (strong_motion.record_acceleration); every measure comes from that acceleration."""
+    dt = float(trace.stats.delta)
+    v, a = strong_motion.record_acceleration(trace.data, dt)
+    if a.size == 0:
+        return dict(pga=0.0, pgv=0.0, arias=0.0, significant_duration=0.0, dominant_freq=0.0,
+                    window_start=0.0, window_end=0.0)
+
+    arias, i5, i95 = strong_motion.significant_window(a, dt)
+    arias = float(arias)
+    significant_duration = float((i95 - i5) * dt) if arias > 0 else 0.0
+    start, end = strong_motion.strong_motion_window(a, dt, 0.0, 0.0, significant=(i5, i95))
+
+    amps = np.abs(np.fft.rfft(a))
+    freqs = np.fft.rfftfreq(a.size, dt)
+    dominant_freq = float(freqs[1 + np.argmax(amps[1:])]) if a.size > 2 else 0.0
+
+    return dict(pga=float(np.max(np.abs(a))), pgv=float(np.max(np.abs(v))), arias=arias,
+                significant_duration=significant_duration, dominant_freq=dominant_freq,
+                window_start=float(start * dt), window_end=float(end * dt))
+
+def _index_file(file_path):
+    """Reads one record file and returns its trace rows (runs in a worker process)."""
+    from obspy import read
+    rows = []
+    for trace in read(file_path):
+        stats = trace.stats
+        row = dict(file_path=file_path, file_name=os.path.basename(file_path), trace_id=trace.id,
+                   network=stats.network, station=stats.station,
+                   location=getattr(stats, 'location', ''), channel=stats.channel,
+                   starttime=str(stats.starttime), endtime=str(stats.endtime),
+                   sampling_rate=float(stats.sampling_rate), npts=int(stats.npts),
+                   duration=float(stats.npts * stats.delta))
+        row.update(intensity_measures(trace))
+        rows.append(row)
+    return rows
+
+def update_catalog(folder_path, max_workers=MAX_WORKERS):
+    """Brings the index in sync with the folder, re-indexing only changed files.
+
+    Returns (n_indexed, n_removed)."""
+    on_disk = list_record_files(folder_path)
+    conn = _connect(folder_path)
+    try:
+        known = {row['file_path']: (row['mtime'], row['size'])
+                 for row in conn.execute("SELECT file_path, mtime, size FROM files")}
+        removed = [path for path in known if path not in on_disk]
+        changed = [path for path, sig in on_disk.items() if known.get(path) != sig]
+
+        with conn:
+            conn.executemany("DELETE FROM files WHERE file_path = ?", [(p,) for p in removed + changed])
+
+        if changed:
+            # spawn: the GUI process has live threads, forking them is not safe
+            with ProcessPoolExecutor(max_workers=min(max_workers, len(changed)),
+                                     mp_context=multiprocessing.get_context("spawn")) as pool:
+                results = pool.map(_safe_index_file, changed)
+                for file_path, rows in zip(changed, results):
+                    if rows is None:
+                        continue
+                    with conn:
+                        mtime, size = on_disk[file_path]
+                        conn.execute("INSERT INTO files VALUES (?, ?, ?)", (file_path, mtime, size))
+                        if rows:
+                            columns = list(rows[0].keys())
+                            conn.executemany(
+                                f"INSERT OR REPLACE INTO traces ({', '.join(columns)}) "
+                                f"VALUES ({', '.join('?' for _ in columns)})",
+                                [tuple(row[c] for c in columns) for row in rows])
+        print(f"Catalog: {len(changed)} files indexed, {len(removed)} removed.")
+        return len(changed), len(removed)
+    finally:
+        conn.close()
+
+def _safe_index_file(file_path):
+    try:
+        return _index_file(file_path)
+    except Exception as e:
+        print(f"Catalog: Error indexing {file_path}: {e}")
+        return None
+
+def query_traces(folder_path, filters=None, order_by=None, descending=False, limit=None):
+    """Returns catalog rows (as dicts) matching the filters.
+
+    filters maps a field from QUERY_FIELDS to either an exact value or a
+    (min, max) tuple where either bound may be None."""
+    clauses, params = [], []
+    for field, value in (filters or {}).items():
+        if field not in QUERY_FIELDS:
+            raise ValueError(f"Unknown catalog field: {field}")
+        if isinstance(value, tuple):
+            low, high = value
+            if low is not None:
+                clauses.append(f"{field} >= ?"); params.append(low)
+            if high is not None:
+                clauses.append(f"{field} <= ?"); params.append(high)
+        else:
+            clauses.append(f"{field} = ?"); params.append(value)
+
+    sql = "SELECT * FROM traces"
+    if clauses:
+        sql += " WHERE " + " AND ".join(clauses)
+    if order_by is not None:
+        if order_by not in QUERY_FIELDS:
+            raise ValueError(f"Unknown catalog field: {order_by}")
+        sql += f" ORDER BY {order_by} {'DESC' if descending else 'ASC'}"
+    if limit is not None:
+        sql += " LIMIT ?"; params.append(int(limit))
+
+    conn = _connect(folder_path)
+    try:
+        return [dict(row) for row in conn.execute(sql, params)]
+    finally:
+        conn.close()
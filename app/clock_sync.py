@@ -0,0 +1,74 @@
+# clock_sync.py
+# Maps device (ESP32 micros()) timestamps onto the host monotonic clock.
+# Transport delay (USB buffering, GIL stalls) only ever makes a sample arrive
+# later, so the smallest observed host-minus-device offset in each window is the
+# best estimate of the true offset. A linear fit over those per-window minima
+# tracks the crystal drift between both clocks.
+
+from collections import deque
+
+DEVICE_WRAP_US = 2 ** 32          # micros() is a 32-bit counter (~71.6 min)
+
+class ClockSync:
+    """Minimum-delay filter plus linear drift regression over recent windows."""
+
+    def __init__(self, window_s=1.0, history=30):
+        self.window_s = window_s
+        self.history = history
+        self.reset()
+
+    def reset(self):
+        """Forgets all state (call on reconnect or when the device restarts)."""
+        self._last_raw_us = None
+        self._wraps = 0
+        self._window_start = None
+        self._window_min = None          # (device_s, offset_s) with the smallest offset
+        self._minima = deque(maxlen=self.history)
+        self.offset = None               # host_s - device_s at device time 0
+        self.drift = 0.0                 # seconds of offset change per device second
+
+    def _unwrap(self, raw_us):
+        if self._last_raw_us is not None and raw_us < self._last_raw_us:
+            if self._last_raw_us - raw_us > DEVICE_WRAP_US // 2:
+                self._wraps += 1
+            else:
+                # Large step backwards without a wrap: the device restarted
+                self.reset()
+        self._last_raw_us = raw_us
+        return (raw_us + self._wraps * DEVICE_WRAP_US) * 1e-6
+
+    def _fit(self):
+        n = len(self._minima)
+        if n == 1:
+            self.offset, self.drift = self._minima[0][1], 0.0
+            return
+        mean_t = sum(t for t, _ in self._minima) / n
+        mean_o = sum(o for _, o in self._minima) / n
+        var = sum((t - mean_t) ** 2 for t, _ in self._minima)
+        cov = sum((t - mean_t) * (o - mean_o) for t, o in self._minima)
+        self.drift = cov / var if var > 0 else 0.0
+        self.offset = mean_o - self.drift * mean_t
+
+    def update(self, device_us, host_s):
+        """Adds one (device timestamp, host receive time) pair and returns the
+        sample's device time expressed on the host clock."""
+        device_s = self._unwrap(int(device_us))
+        offset = host_s - device_s
+
+        if self._window_start is None:
+            self._window_start = device_s
+        if self._window_min is None or offset < self._window_min[1]:
+            self._window_min = (device_s, offset)
+        if device_s - self._window_start >= self.window_s:
+            self._minima.append(self._window_min)
+            self._fit()
+            self._window_start, self._window_min = device_s, None
+
+        if self.offset is None:
+            # Not enough history yet: best bound so far is the running minimum
+            return device_s + self._window_min[1]
+        return device_s + self.offset + self.drift * device_s
+
+    @property
+    def drift_ppm(self):
+        return self.drift * 1e6
@@ -0,0 +1,134 @@
+# drive_correction.py
+# Offline iterative drive-signal correction (tracking compensation).
+# Each run plays the current drive and captures the encoder response. The table
+# transfer function is estimated from all runs so far (H1 estimator with Welch
+# averaging), the tracking error is taken to the frequency domain and the drive
+# is updated with a regularized inverse of the transfer function:
+#     D[k+1] = D[k] + gain * conj(H) / (|H|^2 + reg * max|H|^2) * (R - Y[k])
+# Frequencies where the response is not coherent with the drive are left
+# untouched. Everything is vectorized FFT work on the command grid, and the
+# spectra that do not change between iterations are computed once.
+
+import threading
+
+import numpy as np
+
+STEPS_PER_REVOLUTION = 3200       # motor steps per encoder revolution (see utilities/python calibrador_pasivo.py)
+DEFAULT_GAIN = 0.5
+DEFAULT_REGULARIZATION = 0.01
+DEFAULT_MIN_COHERENCE = 0.6
+DEFAULT_SEGMENT = 256             # samples per Welch segment for the FRF estimate
+MIN_SEGMENT = 16
+MIN_RECORD_SAMPLES = 4 * MIN_SEGMENT   # at least a few overlapping segments
+DRIVE_LIMIT_FACTOR = 1.5          # corrected drive peak, relative to the reference peak
+
+_corrected = {}                   # playback key -> (drive positions, sample_interval, rms error ratio);
+                                  # cleared when the records folder is reloaded
+_corrected_lock = threading.Lock()
+
+def degrees_to_steps(angle_deg):
+    return np.asarray(angle_deg, dtype=np.float64) * (STEPS_PER_REVOLUTION / 360.0)
+
+def response_on_grid(sample_times, angles_deg, n_samples, sample_interval):
+    """Resamples captured telemetry (times relative to the first command) onto the
+    command grid, in steps relative to the position before the run."""
+    sample_times = np.asarray(sample_times, dtype=np.float64)
+    steps = degrees_to_steps(angles_deg)
+    if sample_times.size < 2:
+        raise ValueError("Not enough telemetry captured during the run.")
+    order = np.argsort(sample_times, kind="stable")
+    sample_times, steps = sample_times[order], steps[order]
+    before = steps[sample_times <= 0]
+    baseline = before[-1] if before.size else steps[0]
+    grid = np.arange(n_samples) * sample_interval
+    return np.interp(grid, sample_times, steps) - baseline
+
+def _segments(x, nperseg):
+    step = nperseg // 2
+    view = np.lib.stride_tricks.sliding_window_view(x, nperseg)[::step]
+    return view * np.hanning(nperseg)
+
+class DriveCorrector:
+    """Keeps the reference, the current drive and the accumulated cross spectra."""
+
+    def __init__(self, reference, sample_interval, gain=DEFAULT_GAIN,
+                 regularization=DEFAULT_REGULARIZATION, min_coherence=DEFAULT_MIN_COHERENCE,
+                 nperseg=DEFAULT_SEGMENT):
+        self.reference = np.asarray(reference, dtype=np.float64)
+        self.sample_interval = float(sample_interval)
+        self.gain = gain
+        self.regularization = regularization
+        self.min_coherence = min_coherence
+        n = self.reference.size
+        if n < MIN_RECORD_SAMPLES:
+            raise ValueError(f"Record too short for drive correction: {n} samples, "
+                             f"at least {MIN_RECORD_SAMPLES} needed.")
+        self.nperseg = int(min(nperseg, max(MIN_SEGMENT, n // 4)))
+        # Zero padding of one segment limits circular wrap-around of the correction
+        self.nfft = n + self.nperseg
+        self._reference_spectrum = np.fft.rfft(self.reference, self.nfft)
+        self._seg_freqs = np.fft.rfftfreq(self.nperseg, self.sample_interval)
+        self._freqs = np.fft.rfftfreq(self.nfft, self.sample_interval)
+        self._s_dd = np.zeros(self._seg_freqs.size)
+        self._s_yy = np.zeros(self._seg_freqs.size)
+        self._s_dy = np.zeros(self._seg_freqs.size, dtype=complex)
+        self.drive = self.reference.copy()
+        self.history = []                 # per iteration: rms error ratio
+
+    def _accumulate(self, drive, response):
+        d = np.fft.rfft(_segments(drive - drive.mean(), self.nperseg), axis=1)
+        y = np.fft.rfft(_segments(response - response.mean(), self.nperseg), axis=1)
+        self._s_dd += np.sum(np.abs(d) ** 2, axis=0)
+        self._s_yy += np.sum(np.abs(y) ** 2, axis=0)
+        self._s_dy += np.sum(np.conj(d) * y, axis=0)
+
+    def transfer_function(self):
+        """Returns (freqs, H, coherence) estimated from every run so far."""
+        with np.errstate(divide="ignore", invalid="ignore"):
+            h = np.where(self._s_dd > 0, self._s_dy / self._s_dd, 0.0)
+            coherence = np.where(self._s_dd * self._s_yy > 0,
+                                 np.abs(self._s_dy) ** 2 / (self._s_dd * self._s_yy), 0.0)
+        return self._seg_freqs, h, coherence
+
+    def update(self, response):
+        """Adds one run's response (steps, on the command grid) and computes the next drive.
+
+        Returns the run's RMS tracking error relative to the reference RMS."""
+        response = np.asarray(response, dtype=np.float64)
+        error = self.reference - response
+        ratio = float(np.sqrt(np.mean(error ** 2) / max(np.mean(self.reference ** 2), 1e-12)))
+        self.history.append(ratio)
+
+        self._accumulate(self.drive, response)
+        seg_freqs, h, coherence = self.transfer_function()
+        h = np.interp(self._freqs, seg_freqs, h.real) + 1j * np.interp(self._freqs, seg_freqs, h.imag)
+        mask = np.interp(self._freqs, seg_freqs, coherence) >= self.min_coherence
+        power = np.abs(h) ** 2
+        inverse = np.conj(h) / (power + self.regularization * max(power.max(), 1e-12))
+
+        error_spectrum = self._reference_spectrum - np.fft.rfft(response, self.nfft)
+        correction = np.fft.irfft(self.gain * inverse * error_spectrum * mask, self.nfft)[:self.reference.size]
+        limit = DRIVE_LIMIT_FACTOR * max(np.max(np.abs(self.reference)), 1.0)
+        self.drive = np.clip(self.drive + correction, -limit, limit)
+        return ratio
+
+    def converged(self, tolerance=0.02):
+        """True once an iteration improves the error ratio by less than tolerance (absolute)."""
+        return len(self.history) >= 2 and self.history[-2] - self.history[-1] < tolerance
+
+    def drive_positions(self):
+        return np.rint(self.drive).astype(np.int64)
+
+def store_corrected(key, drive, sample_interval, error_ratio):
+    with _corrected_lock:
+        _corrected[key] = (drive, sample_interval, error_ratio)
+
+def get_corrected(key):
+    """Returns (drive, sample_interval, error_ratio) for a playback key, or None."""
+    with _corrected_lock:
+        return _corrected.get(key)
+
+def clear():
+    """Drops every corrected drive."""
+    with _corrected_lock:
+        _corrected.clear()
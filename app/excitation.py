@@ -0,0 +1,119 @@
+# excitation.py
+# Excitation signal library for characterizing the table: sine, linear and
+# logarithmic chirps, Schroeder-phase multisines, band-limited white noise and
+# step trains. Whole signals are synthesized at once with NumPy at the chosen
+# command rate and cached, so repeated runs stream identical position sequences
+# through the same deadline-based path as earthquake records.
+
+import threading
+from collections import OrderedDict
+
+import numpy as np
+
+KINDS = ("sine", "linear chirp", "log chirp", "multisine", "noise", "step train")
+DEFAULT_FADE_S = 0.5       # cosine fade-in/out so the table starts and ends at rest
+CACHE_SIZE = 8
+
+_cache = OrderedDict()
+_cache_lock = threading.Lock()
+
+def time_vector(duration, rate):
+    """Sample times for duration seconds at rate commands per second."""
+    return np.arange(int(round(duration * rate))) / float(rate)
+
+def sine(t, frequency):
+    return np.sin(2.0 * np.pi * frequency * t)
+
+def linear_chirp(t, f0, f1, duration):
+    """Instantaneous frequency sweeping linearly from f0 to f1 over duration."""
+    return np.sin(2.0 * np.pi * (f0 * t + 0.5 * (f1 - f0) / duration * t * t))
+
+def log_chirp(t, f0, f1, duration):
+    """Exponential sweep: equal time per octave from f0 to f1."""
+    ratio = f1 / f0
+    if ratio == 1.0:
+        return sine(t, f0)
+    k = np.log(ratio)
+    return np.sin(2.0 * np.pi * f0 * duration / k * np.expm1(k * t / duration))
+
+def schroeder_multisine(n_samples, rate, f_min, f_max):
+    """Sum of every frequency bin in [f_min, f_max] with Schroeder phases (low crest factor).
+
+    Built with one inverse rfft, so tones are exact multiples of 1/duration and
+    the signal is periodic over the record."""
+    freqs = np.fft.rfftfreq(n_samples, 1.0 / rate)
+    bins = np.flatnonzero((freqs >= f_min) & (freqs <= f_max) & (freqs > 0))
+    if bins.size == 0:
+        raise ValueError("No multisine tones between f_min and f_max for this duration.")
+    k = np.arange(1, bins.size + 1)
+    spectrum = np.zeros(freqs.size, dtype=complex)
+    spectrum[bins] = np.exp(-1j * np.pi * k * (k - 1) / bins.size)
+    return np.fft.irfft(spectrum, n=n_samples)
+
+def band_limited_noise(n_samples, rate, f_min, f_max, seed=0):
+    """Gaussian white noise with everything outside [f_min, f_max] removed (repeatable per seed)."""
+    rng = np.random.default_rng(seed)
+    spectrum = np.fft.rfft(rng.standard_normal(n_samples))
+    freqs = np.fft.rfftfreq(n_samples, 1.0 / rate)
+    spectrum[(freqs < f_min) | (freqs > f_max)] = 0.0
+    return np.fft.irfft(spectrum, n=n_samples)
+
+def step_train(t, step_s):
+    """Levels 0, +1, 0, -1 held for step_s seconds each, repeated."""
+    levels = np.array([0.0, 1.0, 0.0, -1.0])
+    return levels[(t // step_s).astype(np.int64) % levels.size]
+
+def fade(signal, rate, fade_s=DEFAULT_FADE_S):
+    """Applies a raised-cosine fade-in and fade-out (at most 10% of the signal each)."""
+    n = min(int(fade_s * rate), signal.size // 10)
+    if n > 1:
+        ramp = 0.5 - 0.5 * np.cos(np.linspace(0.0, np.pi, n))
+        signal[:n] *= ramp
+        signal[-n:] *= ramp[::-1]
+    return signal
+
+def synthesize(kind, amplitude, duration, rate, frequency=1.0, f_min=0.5, f_max=10.0, seed=0):
+    """Returns integer step positions for the given excitation, peak = amplitude."""
+    if duration <= 0 or rate <= 0:
+        raise ValueError("Duration and command rate must be positive.")
+    nyquist = rate / 2.0
+    if kind != "step train" and max(frequency if kind == "sine" else f_max, 0) >= nyquist:
+        raise ValueError(f"Frequency must stay below half the command rate ({nyquist:g} Hz).")
+    t = time_vector(duration, rate)
+    if kind == "sine":
+        signal = sine(t, frequency)
+    elif kind == "linear chirp":
+        signal = linear_chirp(t, f_min, f_max, duration)
+    elif kind == "log chirp":
+        if f_min <= 0:
+            raise ValueError("A logarithmic chirp needs f_min > 0.")
+        signal = log_chirp(t, f_min, f_max, duration)
+    elif kind == "multisine":
+        signal = schroeder_multisine(t.size, rate, f_min, f_max)
+    elif kind == "noise":
+        signal = band_limited_noise(t.size, rate, f_min, f_max, seed)
+    elif kind == "step train":
+        signal = step_train(t, 0.25 / frequency)
+    else:
+        raise ValueError(f"Unknown excitation '{kind}'.")
+
+    if kind != "step train":
+        signal = fade(signal, rate)
+    peak = np.max(np.abs(signal)) if signal.size else 0.0
+    if peak > 0:
+        signal = signal * (amplitude / peak)
+    return np.rint(signal).astype(np.int64)
+
+def get_excitation(kind, amplitude, duration, rate, **params):
+    """Cached synthesize(): returns (positions, sample_interval)."""
+    key = (kind, amplitude, duration, rate, tuple(sorted(params.items())))
+    with _cache_lock:
+        if key in _cache:
+            _cache.move_to_end(key)
+            return _cache[key]
+    result = (synthesize(kind, amplitude, duration, rate, **params), 1.0 / rate)
+    with _cache_lock:
+        _cache[key] = result
+        while len(_cache) > CACHE_SIZE:
+            _cache.popitem(last=False)
+    return result
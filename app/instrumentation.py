@@ -0,0 +1,207 @@
+# instrumentation.py
+# Lightweight hot-path instrumentation: perf_counter_ns spans, log-linear
+# (HDR-style) latency histograms, counters and gauges (latest value of a
+# quantity reported from elsewhere, e.g. the firmware's stats line). When disabled every entry point
+# returns after a single flag check, so the calls can stay in the hot paths.
+# Snapshots (p50/p99/max per metric) feed the diagnostics tab and can be
+# appended periodically to a JSON-lines file for offline comparison.
+
+import json
+import threading
+import time
+
+ENABLED = False
+
+SUB_BUCKET_BITS = 4                     # 16 sub-buckets per power of two: ~6% resolution
+_SUB_BUCKETS = 1 << SUB_BUCKET_BITS
+_MAX_EXPONENT = 40                      # up to ~18 minutes in ns
+
+class Histogram:
+    """Fixed-size log-linear histogram of non-negative integer values (ns)."""
+
+    def __init__(self):
+        self.counts = [0] * ((_MAX_EXPONENT + 2) * _SUB_BUCKETS)
+        self.count = 0
+        self.total = 0
+        self.max = 0
+
+    @staticmethod
+    def _index(value):
+        # Values below _SUB_BUCKETS are exact; above, each power of two is split
+        # into _SUB_BUCKETS linear buckets.
+        if value < _SUB_BUCKETS:
+            return value
+        exponent = value.bit_length() - SUB_BUCKET_BITS - 1
+        if exponent > _MAX_EXPONENT:
+            return (_MAX_EXPONENT + 2) * _SUB_BUCKETS - 1
+        return (exponent + 1) * _SUB_BUCKETS + ((value >> exponent) - _SUB_BUCKETS)
+
+    @staticmethod
+    def _upper_bound(index):
+        bucket, sub = divmod(index, _SUB_BUCKETS)
+        if bucket == 0:
+            return sub
+        return ((_SUB_BUCKETS + sub + 1) << (bucket - 1)) - 1
+
+    def record(self, value):
+        value = max(0, int(value))
+        self.counts[self._index(value)] += 1
+        self.count += 1
+        self.total += value
+        if value > self.max:
+            self.max = value
+
+    def percentile(self, p):
+        if self.count == 0:
+            return 0
+        target = max(1, int(round(self.count * p / 100.0)))
+        seen = 0
+        for index, n in enumerate(self.counts):
+            seen += n
+            if seen >= target:
+                if index == len(self.counts) - 1:       # overflow bucket has no upper bound
+                    return self.max
+                return min(self._upper_bound(index), self.max)
+        return self.max
+
+_histograms = {}
+_counters = {}
+_gauges = {}
+_registry_lock = threading.Lock()
+
+def enable(flag=True):
+    """Turns instrumentation on or off globally."""
+    global ENABLED
+    ENABLED = bool(flag)
+
+def record(name, value_ns):
+    """Adds one measurement (in ns) to the named histogram."""
+    if not ENABLED:
+        return
+    hist = _histograms.get(name)
+    if hist is None:
+        with _registry_lock:
+            hist = _histograms.setdefault(name, Histogram())
+    hist.record(value_ns)
+
+def count(name, n=1):
+    """Increments the named counter."""
+    if not ENABLED:
+        return
+    with _registry_lock:
+        _counters[name] = _counters.get(name, 0) + n
+
+def gauge(name, value):
+    """Sets the named gauge to its latest value."""
+    if not ENABLED:
+        return
+    with _registry_lock:
+        _gauges[name] = value
+
+class _Span:
+    __slots__ = ("name", "start")
+
+    def __init__(self, name):
+        self.name = name
+
+    def __enter__(self):
+        self.start = time.perf_counter_ns()
+        return self
+
+    def __exit__(self, *exc):
+        record(self.name, time.perf_counter_ns() - self.start)
+        return False
+
+class _NullSpan:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+_NULL_SPAN = _NullSpan()
+
+def span(name):
+    """Context manager timing its block into the named histogram."""
+    if not ENABLED:
+        return _NULL_SPAN
+    return _Span(name)
+
+class _TimedLock:
+    __slots__ = ("lock", "name", "acquired")
+
+    def __init__(self, lock, name):
+        self.lock = lock
+        self.name = name
+
+    def __enter__(self):
+        start = time.perf_counter_ns()
+        self.lock.acquire()
+        self.acquired = time.perf_counter_ns()
+        record(self.name + ".wait", self.acquired - start)
+        return self
+
+    def __exit__(self, *exc):
+        held = time.perf_counter_ns() - self.acquired
+        self.lock.release()
+        record(self.name + ".hold", held)
+        return False
+
+def locked(lock, name):
+    """Use as `with locked(app_state.data_lock, "data_lock"):` to record wait and hold
+    times. When disabled the lock itself is returned, so the cost is one flag check."""
+    if not ENABLED:
+        return lock
+    return _TimedLock(lock, name)
+
+def snapshot():
+    """Returns {'histograms': {name: stats in ms}, 'counters': {...}, 'gauges': {...}, 'time': epoch}."""
+    with _registry_lock:
+        items = list(_histograms.items())
+        counters = dict(_counters)
+        gauges = dict(_gauges)
+    histograms = {}
+    for name, hist in sorted(items):
+        histograms[name] = {
+            'count': hist.count,
+            'mean_ms': (hist.total / hist.count / 1e6) if hist.count else 0.0,
+            'p50_ms': hist.percentile(50) / 1e6,
+            'p99_ms': hist.percentile(99) / 1e6,
+            'max_ms': hist.max / 1e6,
+        }
+    return {'time': time.time(), 'histograms': histograms, 'counters': counters, 'gauges': gauges}
+
+def reset():
+    """Clears every histogram, counter and gauge."""
+    with _registry_lock:
+        _histograms.clear()
+        _counters.clear()
+        _gauges.clear()
+
+_exporter_stop = None
+
+def start_exporter(path, interval_s=5.0):
+    """Appends a snapshot as one JSON line to path every interval_s seconds."""
+    global _exporter_stop
+    stop_exporter()
+    stop = threading.Event()
+    _exporter_stop = stop
+
+    def run():
+        while not stop.wait(interval_s):
+            try:
+                with open(path, "a") as f:
+                    f.write(json.dumps(snapshot()) + "\n")
+            except OSError as e:
+                print(f"Instrumentation: Could not write snapshot: {e}")
+
+    threading.Thread(target=run, daemon=True).start()
+
+def stop_exporter():
+    """Stops the periodic snapshot export, if running."""
+    global _exporter_stop
+    if _exporter_stop is not None:
+        _exporter_stop.set()
+        _exporter_stop = None
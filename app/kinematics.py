@@ -0,0 +1,121 @@
+# kinematics.py
+# Live velocity and acceleration of the table from the encoder telemetry.
+# The serial reader only appends (time, angle) to a bounded queue; the GUI frame
+# drains it and estimates the whole batch with numpy, so the per-sample cost on
+# the 1 kHz reader path is one deque append.
+# Estimator: causal Savitzky-Golay. A cubic is least-squares fitted to the last
+# N samples and differentiated at the newest one; for a fixed window that is a
+# pair of FIR filters, applied to the batch with a sliding window view. (A
+# quadratic's second derivative is the window average, i.e. it lags by N/2.)
+# The state carried between batches is the last N - 1 samples, O(1) per sample.
+# N follows the telemetry rate so the window stays WINDOW_S long.
+
+import threading
+from collections import deque
+from functools import lru_cache
+
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+
+import app_state
+from drive_correction import degrees_to_steps
+
+WINDOW_S = 0.04             # fit window; longer is smoother but misses faster motion
+POLY_ORDER = 3
+MIN_WINDOW = 5
+MAX_WINDOW = 201
+GAP_FACTOR = 5.0            # a gap this many sample intervals long restarts the estimate
+PENDING_MAX = 8192          # samples kept when nobody drains the queue
+
+_pending = deque(maxlen=PENDING_MAX)
+
+def feed(sample_time, angle):
+    """Queues one telemetry sample (plot time in s, absolute angle in deg); called per line."""
+    _pending.append((sample_time, angle))
+
+def feed_batch(times, angles):
+    """Queues many telemetry samples at once (e.g. from a session replay)."""
+    _pending.extend(zip(times, angles))
+
+@lru_cache(maxsize=16)
+def derivative_filters(window, order=POLY_ORDER):
+    """FIR taps giving the first and second derivative (per sample, per sample^2)
+    at the newest of `window` samples, oldest tap first."""
+    tau = np.arange(window, dtype=np.float64) - (window - 1)
+    coefficients = np.linalg.pinv(np.vander(tau, order + 1, increasing=True))
+    taps = np.vstack([coefficients[1], 2.0 * coefficients[2]])
+    taps.setflags(write=False)
+    return taps
+
+class KinematicsEstimator:
+    """Batched causal Savitzky-Golay estimate of velocity and acceleration (steps)."""
+
+    def __init__(self, window_s=WINDOW_S):
+        """window_s: fit window in seconds (at least MIN_WINDOW samples)."""
+        self.window_s = window_s
+        self.reset()
+
+    def reset(self):
+        self._times = np.empty(0)
+        self._positions = np.empty(0)
+        self.sample_interval = None
+
+    def update(self, times, positions):
+        """Estimates at each new sample; returns (times, velocity, acceleration) for
+        the samples where the window was full."""
+        times = np.asarray(times, dtype=np.float64)
+        positions = np.asarray(positions, dtype=np.float64)
+        if times.size == 0:
+            return times, times, times
+        if self._times.size and (times[0] <= self._times[-1] or (
+                self.sample_interval and times[0] - self._times[-1] > GAP_FACTOR * self.sample_interval)):
+            self.reset()                 # plot clock restarted or telemetry interrupted
+        times = np.concatenate([self._times, times])
+        positions = np.concatenate([self._positions, positions])
+        if times.size < 2:
+            self._times, self._positions = times, positions
+            return np.empty(0), np.empty(0), np.empty(0)
+
+        steps = np.diff(times)
+        batch_interval = float(np.median(steps))
+        if self.sample_interval is None or abs(batch_interval - self.sample_interval) > 0.25 * self.sample_interval:
+            self.sample_interval = batch_interval        # first batch or telemetry rate changed
+        else:
+            self.sample_interval += 0.05 * (batch_interval - self.sample_interval)
+        window = int(min(max(round(self.window_s / self.sample_interval), MIN_WINDOW), MAX_WINDOW))
+
+        keep = window - 1
+        self._times, self._positions = times[-keep:], positions[-keep:]
+        if times.size < window:
+            return np.empty(0), np.empty(0), np.empty(0)
+        derivatives = sliding_window_view(positions, window) @ derivative_filters(window).T
+        dt = self.sample_interval
+        return times[keep:], derivatives[:, 0] / dt, derivatives[:, 1] / (dt * dt)
+
+estimator = KinematicsEstimator()
+_drain_lock = threading.Lock()
+
+def process_pending():
+    """Drains the queued telemetry through the estimator and appends the results to
+    app_state.velocity_data / acceleration_data. Returns the number of samples estimated."""
+    with _drain_lock:
+        count = len(_pending)
+        if not count:
+            return 0
+        batch = [_pending.popleft() for _ in range(count)]
+        times, angles = np.array(batch).T
+        times, velocity, acceleration = estimator.update(times, degrees_to_steps(angles))
+    if times.size:
+        keep = app_state.velocity_data.maxlen
+        times, velocity, acceleration = times[-keep:].tolist(), velocity[-keep:].tolist(), acceleration[-keep:].tolist()
+        with app_state.data_lock:
+            app_state.velocity_data.extend(zip(times, velocity))
+            app_state.acceleration_data.extend(zip(times, acceleration))
+    return len(times)
+
+def target_acceleration(positions, sample_interval):
+    """Acceleration (steps/s^2) of the commanded trajectory, for plotting against the estimate."""
+    positions = np.asarray(positions, dtype=np.float64)
+    if positions.size < 3:
+        return np.zeros(positions.size)
+    return np.gradient(np.gradient(positions, sample_interval), sample_interval)
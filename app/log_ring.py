@@ -0,0 +1,71 @@
+# log_ring.py
+# Structured console log. Events are stored as (sequence, wall time in ns, kind,
+# payload reference) in preallocated ring buffers; no string formatting happens
+# on the serial thread. Telemetry and streamed position commands have their own
+# rings so 1 kHz encoder lines and playback commands never push operator-relevant
+# messages out of the history. The GUI pulls new events by sequence number a few
+# times per second and formats only what it shows.
+
+import threading
+import time
+
+KIND_TELEMETRY = 0
+KIND_RECEIVED = 1       # non-telemetry lines from the device
+KIND_INFO = 2           # host messages (connect, disconnect, ...)
+KIND_SENT = 3
+KIND_SEND_ERROR = 4
+
+KIND_PREFIXES = ("<<", "<<", "--", ">>", "!!")
+
+class LogRing:
+    """Fixed-capacity event ring; appends are O(1) and allocation-free."""
+
+    def __init__(self, capacity):
+        self.capacity = capacity
+        self._times = [0] * capacity
+        self._kinds = [0] * capacity
+        self._payloads = [None] * capacity
+        self._lock = threading.Lock()
+        self.head = 0               # sequence number of the next event
+
+    def append(self, kind, payload):
+        with self._lock:
+            i = self.head % self.capacity
+            self._times[i] = time.time_ns()
+            self._kinds[i] = kind
+            self._payloads[i] = payload
+            self.head += 1
+
+    def since(self, seq, limit=None, every=1):
+        """Returns (head, [(seq, time_ns, kind, payload)]) for events after seq still in the ring.
+
+        limit keeps only the newest events; every > 1 keeps one event in every
+        (by sequence number), for sampling telemetry."""
+        with self._lock:
+            head = self.head
+            if seq > head:          # the ring was cleared
+                seq = 0
+            start = max(seq, head - self.capacity)
+            if limit is not None:
+                start = max(start, head - limit * every)
+            if every > 1:
+                start += -start % every
+            events = [(s, self._times[s % self.capacity], self._kinds[s % self.capacity],
+                       self._payloads[s % self.capacity]) for s in range(start, head, every)]
+        return head, events
+
+    def clear(self):
+        with self._lock:
+            self._payloads = [None] * self.capacity
+            self.head = 0
+
+telemetry = LogRing(4096)
+motion = LogRing(4096)          # position commands of streamed trajectories
+messages = LogRing(1024)
+
+def log_message(kind, text):
+    messages.append(kind, text)
+
+def format_event(time_ns, kind, payload):
+    stamp = time.strftime('%H:%M:%S', time.localtime(time_ns / 1e9))
+    return f"[{stamp}] {KIND_PREFIXES[kind]} {payload}"
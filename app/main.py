@@ -1,15 +1,47 @@
 import dearpygui.dearpygui as dpg
+import os
 import threading
 import time
+from collections import deque
 
 # Import the shared state
 import app_state
+import backlash
+import excitation
+import instrumentation
+import kinematics
+import log_ring
+import performance_envelope
+import session_log
 from serial_handler import (find_serial_ports, connect_serial, disconnect_serial, 
-                            send_command, wave_generator_thread, read_serial_thread)
+                            send_command, read_serial_thread, heartbeat_thread, emergency_stop,
+                            release_emergency_stop, set_telemetry_rate, TELEMETRY_RATES_HZ)
 import seismic_handler as sh
+import spectrum_handler as spec
 
 prefab = True
 
+VIEWER_LIST_ROWS = 24     # row widgets in the virtualized trace list (only these are ever created)
+VIEWER_WHEEL_ROWS = 3     # rows scrolled per mouse wheel notch
+VIEWER_PREFETCH_NEIGHBOURS = 1  # traces prepared speculatively on each side of the selection
+_viewer_list_offset = 0
+_viewer_ranking = None             # Future of the similarity ranking in progress
+_viewer_positions = (None, {})      # (query result, {trace index: list position}) built once per query
+
+DIAGNOSTICS_REFRESH_S = 0.5   # how often the diagnostics table is rebuilt
+DIAGNOSTICS_EXPORT_FILE = "diagnostics_snapshots.jsonl"
+_diagnostics_last_refresh = 0.0
+
+CONSOLE_REFRESH_S = 0.25      # consoles are re-rendered at most 4 times per second
+CONSOLE_LINES = 200           # text lines kept in each console
+TELEMETRY_SAMPLING = {"off": 0, "1 in 100": 100, "1 in 10": 10, "all": 1}
+_console_last_refresh = 0.0
+_console_seq = {"telemetry": 0, "motion": 0, "messages": 0}
+_console_items = {"console_recv_container": deque(), "console_send_container": deque()}
+
+REPLAY_SPEEDS = {"1x": 1.0, "10x": 10.0, "60x": 60.0, "max": None}
+_replay = None
+
 def update_ui_for_connection_state(connected: bool):
     """Enables or disables UI elements based on the connection state."""
     if connected:
@@ -44,7 +76,7 @@ def connect_callback():
             update_ui_for_connection_state(True)
             with app_state.data_lock:
                 app_state.x_data.clear(); app_state.y_data.clear(); app_state.expected_wave_data.clear()
-            app_state.plot_start_time = time.time()
+            app_state.plot_start_time = time.monotonic()
         else:
             dpg.set_value("connection_status", f"Error: {message}")
 
@@ -64,40 +96,260 @@ def send_manual_command_callback():
             dpg.set_value("command_input", "")
 
 def start_wave_callback():
-    if not app_state.wave_running:
-        app_state.wave_running = True
-        with app_state.data_lock:
-            app_state.x_data.clear(); app_state.y_data.clear(); app_state.expected_wave_data.clear()
-        app_state.plot_start_time = time.time()
-        if dpg.does_item_exist("speed_input"): send_command(f"s{dpg.get_value('speed_input')}")
-        if dpg.does_item_exist("accel_input"): send_command(f"a{dpg.get_value('accel_input')}")
-        threading.Thread(target=wave_generator_thread, daemon=True).start()
-        if dpg.does_item_exist("start_wave_button"): dpg.disable_item("start_wave_button")
-        if dpg.does_item_exist("stop_wave_button"): dpg.enable_item("stop_wave_button")
+    sh.start_excitation(dpg.get_value("wave_kind_combo"), dpg.get_value("amplitude_slider"),
+                        dpg.get_value("wave_duration_input"), dpg.get_value("wave_rate_input"),
+                        frequency=dpg.get_value("frequency_slider"),
+                        f_min=dpg.get_value("wave_fmin_input"), f_max=dpg.get_value("wave_fmax_input"))
 
 def stop_wave_callback():
-    app_state.wave_running = False
-    if dpg.does_item_exist("start_wave_button"): dpg.enable_item("start_wave_button")
-    if dpg.does_item_exist("stop_wave_button"): dpg.disable_item("stop_wave_button")
+    with app_state.data_lock:
+        app_state.wave_running = False
+
+def _replay_record_callback(sender, app_data):
+    if app_data:
+        path = session_log.recorder.start()
+        dpg.set_value("replay_record_text", f"Recording: {path}")
+    else:
+        session_log.recorder.stop()
+        dpg.set_value("replay_record_text", "Not recording.")
+        _replay_refresh_callback()
+
+def _replay_refresh_callback():
+    sessions = session_log.list_sessions()
+    dpg.configure_item("replay_session_combo", items=sessions)
+    if sessions and dpg.get_value("replay_session_combo") not in sessions:
+        dpg.set_value("replay_session_combo", sessions[0])
+
+def _replay_play_callback():
+    global _replay
+    if app_state.sismo_running or app_state.wave_running:
+        dpg.set_value("replay_status_text", "Stop the running test before replaying.")
+        return
+    name = dpg.get_value("replay_session_combo")
+    if not name:
+        dpg.set_value("replay_status_text", "Select a recorded session.")
+        return
+    _replay_stop_callback()
+    try:
+        _replay = session_log.SessionReplay(os.path.join(session_log.get_sessions_folder_path(), name))
+    except (OSError, ValueError) as e:
+        dpg.set_value("replay_status_text", f"Error: {e}")
+        return
+    dpg.configure_item("replay_seek_slider", max_value=max(_replay.duration, 0.001))
+    _replay.start(REPLAY_SPEEDS[dpg.get_value("replay_speed_combo")])
+    dpg.set_value("replay_status_text", f"Replaying {name} ({_replay.records.size} records).")
+
+def _replay_pause_callback():
+    if _replay is not None:
+        _replay.paused = not _replay.paused
+
+def _replay_stop_callback():
+    global _replay
+    if _replay is not None:
+        _replay.stop()
+        _replay = None
+
+def _replay_speed_callback(sender, app_data):
+    if _replay is not None:
+        _replay.set_speed(REPLAY_SPEEDS[app_data])
+
+def _replay_seek_callback(sender, app_data):
+    if _replay is not None:
+        _replay.seek(app_data)
+
+def _update_replay_controls():
+    if _replay is None or not dpg.does_item_exist("replay_seek_slider"):
+        return
+    position, duration = app_state.replay_position, app_state.replay_duration
+    if not dpg.is_item_active("replay_seek_slider"):
+        dpg.set_value("replay_seek_slider", position)
+    state = "paused" if _replay.paused else ("finished" if position >= duration else "playing")
+    dpg.set_value("replay_position_text", f"{position:.1f} / {duration:.1f} s ({state})")
 
 def _viewer_on_trace_select(sender, app_data, user_data):
     app_state.viewer_selected_trace_index = user_data
-    _update_viewer_file_tree()
+    _update_viewer_row_highlight()
     _update_viewer_detailed_plot()
+    _viewer_prefetch_around(user_data)
+
+def _viewer_list_position(index):
+    """Position of a trace in the current list, or None when it is filtered out."""
+    global _viewer_positions
+    rows = app_state.viewer_visible_indices
+    if rows is None:
+        return index if 0 <= index < len(app_state.viewer_all_traces) else None
+    if _viewer_positions[0] is not rows:
+        _viewer_positions = (rows, {trace_index: position for position, trace_index in enumerate(rows)})
+    return _viewer_positions[1].get(index)
+
+def _viewer_prefetch_around(index):
+    position = _viewer_list_position(index)
+    if position is None:
+        sh.prefetch_traces([index])
+        return
+    rows = _viewer_list_indices()
+    low = max(0, position - VIEWER_PREFETCH_NEIGHBOURS)
+    neighbours = [rows[p] for p in range(low, min(len(rows), position + VIEWER_PREFETCH_NEIGHBOURS + 1)) if p != position]
+    sh.prefetch_traces([index] + neighbours)
+
+def _viewer_amplitude_callback(sender, app_data):
+    with app_state.data_lock:
+        app_state.viewer_playback_amplitude = app_data
+    if app_state.viewer_selected_trace_index is not None:
+        _viewer_prefetch_around(app_state.viewer_selected_trace_index)
+
+def _viewer_resampling_callback(sender, app_data):
+    with app_state.data_lock:
+        app_state.viewer_command_rate = max(0.0, dpg.get_value("viewer_command_rate_input"))
+        app_state.viewer_similitude_scale = max(1.0, dpg.get_value("viewer_similitude_input"))
+    if app_state.viewer_selected_trace_index is not None:
+        _viewer_prefetch_around(app_state.viewer_selected_trace_index)
+
+def _viewer_trim_callback(sender, app_data):
+    with app_state.data_lock:
+        app_state.viewer_trim_strong_motion = dpg.get_value("viewer_trim_enable")
+        app_state.viewer_trim_pre_s = max(0.0, dpg.get_value("viewer_trim_pre_input"))
+        app_state.viewer_trim_post_s = max(0.0, dpg.get_value("viewer_trim_post_input"))
+    if app_state.viewer_selected_trace_index is not None:
+        _update_viewer_detailed_plot()
+        _viewer_prefetch_around(app_state.viewer_selected_trace_index)
+
+def _kinematics_window_callback(sender, app_data):
+    kinematics.estimator.window_s = max(0.005, app_data / 1000.0)
+
+def _envelope_summary():
+    points = performance_envelope.load_envelope()
+    if not points:
+        return "No envelope map: run utilities/envelope_mapper.py."
+    feasible = sum(1 for p in points if p['feasible'])
+    return f"Envelope map: {feasible} of {len(points)} points feasible."
+
+def _envelope_enforce_callback(sender, app_data):
+    with app_state.data_lock:
+        app_state.envelope_enforce = app_data
+
+def _position_loop_callback(sender, app_data):
+    with app_state.data_lock:
+        app_state.position_loop_enabled = dpg.get_value("position_loop_enable")
+        app_state.position_loop_kp = max(0.0, dpg.get_value("position_loop_kp"))
+        app_state.position_loop_ki = max(0.0, dpg.get_value("position_loop_ki"))
+        app_state.position_loop_limit = max(0, dpg.get_value("position_loop_limit"))
+        app_state.position_loop_delay_s = max(0.0, dpg.get_value("position_loop_delay_ms") / 1000.0)
+
+def _backlash_model_summary():
+    model = backlash.load_model()
+    if model is None:
+        return "No backlash model: fit one from a recorded sweep (replay tab)."
+    return (f"Backlash model: {model['width']:.1f} steps, lag {model['lag_s'] * 1000:.0f} ms, "
+            f"rms {model['residual_rms']:.1f} steps ({model.get('source', '?')})")
+
+def _backlash_compensation_callback(sender, app_data):
+    with app_state.data_lock:
+        app_state.backlash_compensation = app_data
+    if app_state.viewer_selected_trace_index is not None:
+        _viewer_prefetch_around(app_state.viewer_selected_trace_index)
+
+def _backlash_fit_callback():
+    name = dpg.get_value("replay_session_combo")
+    if not name:
+        dpg.set_value("replay_status_text", "Select a recorded sweep session.")
+        return
+    try:
+        model = backlash.fit_session(os.path.join(session_log.get_sessions_folder_path(), name))
+    except (OSError, ValueError) as e:
+        dpg.set_value("replay_status_text", f"Backlash fit failed: {e}")
+        return
+    backlash.save_model(model)
+    dpg.set_value("replay_status_text", f"{_backlash_model_summary()}; without backlash term "
+                                        f"rms {model['residual_rms_without_backlash']:.1f} steps.")
+    dpg.set_value("backlash_model_text", _backlash_model_summary())
+    _backlash_compensation_callback(None, app_state.backlash_compensation)
+
+def _viewer_on_row_click(sender, app_data, user_data):
+    rows = _viewer_list_indices()
+    position = _viewer_list_offset + user_data
+    if position < len(rows):
+        _viewer_on_trace_select(sender, app_data, rows[position])
+
+def _viewer_apply_query():
+    order_by = dpg.get_value("viewer_sort_combo")
+    filters = {}
+    min_pga = dpg.get_value("viewer_min_pga_input")
+    if min_pga > 0: filters['pga'] = (min_pga, None)
+    station = dpg.get_value("viewer_station_input").strip().upper()
+    if station: filters['station'] = station
+    if order_by == "file order" and not filters:
+        app_state.viewer_visible_indices = None
+    else:
+        try:
+            app_state.viewer_visible_indices = sh.query_catalog(
+                filters, None if order_by == "file order" else order_by, dpg.get_value("viewer_sort_desc"))
+        except Exception as e:
+            print(f"Viewer: Catalog query failed: {e}")
+            app_state.viewer_visible_indices = None
+    _update_viewer_file_tree()
+
+def _viewer_list_indices():
+    if app_state.viewer_visible_indices is not None:
+        return app_state.viewer_visible_indices
+    return range(len(app_state.viewer_all_traces))
+
+def _viewer_max_offset():
+    return max(0, len(_viewer_list_indices()) - VIEWER_LIST_ROWS)
+
+def _viewer_set_offset(offset):
+    global _viewer_list_offset
+    offset = min(max(0, int(offset)), _viewer_max_offset())
+    if offset != _viewer_list_offset:
+        _viewer_list_offset = offset
+        dpg.set_value("viewer_list_scroll", _viewer_max_offset() - offset)
+        _render_viewer_rows()
+
+def _viewer_on_scroll(sender, app_data):
+    # The vertical slider has its minimum at the bottom
+    _viewer_set_offset(_viewer_max_offset() - app_data)
+
+def _viewer_on_wheel(sender, app_data):
+    if dpg.does_item_exist("viewer_file_tree") and dpg.is_item_hovered("viewer_file_tree"):
+        _viewer_set_offset(_viewer_list_offset - app_data * VIEWER_WHEEL_ROWS)
+
+def _render_viewer_rows():
+    """Relabels the fixed pool of row widgets for the current scroll offset."""
+    rows = _viewer_list_indices()
+    for slot in range(VIEWER_LIST_ROWS):
+        position = _viewer_list_offset + slot
+        tag = f"viewer_row_{slot}"
+        if position < len(rows):
+            trace = app_state.viewer_all_traces[rows[position]]
+            dpg.configure_item(tag, show=True,
+                               label=f"{trace['id']} | SR: {trace['sampling_rate']}Hz | {trace['file_name']}")
+            dpg.set_value(tag, rows[position] == app_state.viewer_selected_trace_index)
+        else:
+            dpg.configure_item(tag, show=False)
+
+def _update_viewer_row_highlight():
+    """Moves the selection highlight in place, touching only the visible rows."""
+    rows = _viewer_list_indices()
+    for slot in range(VIEWER_LIST_ROWS):
+        position = _viewer_list_offset + slot
+        if position < len(rows):
+            dpg.set_value(f"viewer_row_{slot}", rows[position] == app_state.viewer_selected_trace_index)
 
 def _update_viewer_file_tree():
+    """Resets the virtualized list after a load or a catalog query."""
+    global _viewer_list_offset
     if not dpg.does_item_exist("viewer_file_tree"): return
-    dpg.delete_item("viewer_file_tree", children_only=True)
+    total = len(_viewer_list_indices())
     if not app_state.viewer_seismic_files:
-        dpg.add_text("No data loaded. Click 'Load Data'.", parent="viewer_file_tree")
-        return
-    for file_name, traces in app_state.viewer_seismic_files.items():
-        with dpg.tree_node(label=f"{file_name} ({len(traces)} traces)", parent="viewer_file_tree", default_open=True):
-            for trace in traces:
-                is_selected = (app_state.viewer_selected_trace_index == trace['global_index'])
-                indicator = "▶" if is_selected else " "
-                label = f"{indicator} {trace['id']} | SR: {trace['sampling_rate']}Hz"
-                dpg.add_button(label=label, width=-1, callback=_viewer_on_trace_select, user_data=trace['global_index'])
+        dpg.set_value("viewer_list_status", "No data loaded. Click 'Load Data'.")
+    elif app_state.viewer_visible_indices is not None:
+        dpg.set_value("viewer_list_status", f"{total} matching traces")
+    else:
+        dpg.set_value("viewer_list_status", f"{total} traces in {len(app_state.viewer_seismic_files)} files")
+    _viewer_list_offset = 0
+    dpg.configure_item("viewer_list_scroll", max_value=max(_viewer_max_offset(), 1), show=_viewer_max_offset() > 0)
+    dpg.set_value("viewer_list_scroll", _viewer_max_offset())
+    _render_viewer_rows()
 
 def _update_viewer_detailed_plot():
     parent_container = "viewer_detailed_plot_container"
@@ -115,16 +367,183 @@ def _update_viewer_detailed_plot():
     info = (f"ID: {trace_data['id']}\nFile: {trace_data['file_name']}\n"
             f"Frequency: {trace_data['sampling_rate']} Hz\nSamples: {len(trace_data['data'])}\n"
             f"Max Amplitude: {trace_data['max_amp']:.3e}")
+    span = sh.strong_motion_span(trace_data)
+    if span is not None:
+        info += f"\nStrong motion: {span[0]:.1f}-{span[1]:.1f} s (plays {span[1] - span[0]:.1f} s)"
     dpg.add_text(info, parent=parent_container)
     dpg.add_separator(parent=parent_container)
-    with dpg.plot(label="Detailed View", height=-50, width=-1, parent=parent_container):
+    with dpg.plot(label="Detailed View", height=-90, width=-1, parent=parent_container):
         x_axis = dpg.add_plot_axis(dpg.mvXAxis, label="Time (s)")
         with dpg.plot_axis(dpg.mvYAxis, label="Amplitude") as y_axis:
             dpg.add_line_series(trace_data['times'].tolist(), trace_data['data'].tolist(), label=trace_data['id'])
+            if span is not None:
+                dpg.add_vline_series(list(span), label="Played window")
         dpg.fit_axis_data(x_axis)
         dpg.fit_axis_data(y_axis)
     with dpg.group(horizontal=True, parent=parent_container):
+        dpg.add_button(label="Play on Table", callback=sh.start_playback, width=120, height=30)
+        dpg.add_button(label="Stop", callback=sh.stop_playback, width=60, height=30)
+        dpg.add_button(label="Show Spectrum", callback=_viewer_show_spectrum, width=150, height=30)
+        dpg.add_button(label="Find Similar Records", callback=_viewer_rank_similar, width=150, height=30)
         dpg.add_button(label="Process for Shaking Table", callback=sh.process_selected_trace, width=-1, height=30)
+    with dpg.group(horizontal=True, parent=parent_container):
+        dpg.add_input_int(label="iterations", tag="viewer_correction_iterations", default_value=5,
+                          min_value=1, min_clamped=True, width=90)
+        dpg.add_button(label="Iterative Drive Correction", width=200, height=30,
+                       callback=lambda: sh.start_drive_correction(dpg.get_value("viewer_correction_iterations")))
+
+def _viewer_show_spectrum():
+    if app_state.viewer_selected_trace_index is None: return
+    trace_data = app_state.viewer_all_traces[app_state.viewer_selected_trace_index]
+    freqs, amps = spec.get_trace_spectrum(trace_data)
+    periods, psa = spec.get_trace_response_spectrum(trace_data)
+    if dpg.does_item_exist("spectrum_window"):
+        dpg.delete_item("spectrum_window")
+    with dpg.window(label=f"Spectrum - {trace_data['id']}", width=800, height=600, tag="spectrum_window"):
+        with dpg.plot(label="Fourier Amplitude Spectrum", height=260, width=-1):
+            x_axis = dpg.add_plot_axis(dpg.mvXAxis, label="Frequency (Hz)", scale=dpg.mvPlotScale_Log10)
+            with dpg.plot_axis(dpg.mvYAxis, label="Amplitude", scale=dpg.mvPlotScale_Log10) as y_axis:
+                dpg.add_line_series(freqs.tolist(), amps.tolist(), label="FFT")
+            dpg.fit_axis_data(x_axis)
+            dpg.fit_axis_data(y_axis)
+        with dpg.plot(label=f"Response Spectrum ({spec.DEFAULT_DAMPING:.0%} damping)", height=-1, width=-1):
+            x_axis = dpg.add_plot_axis(dpg.mvXAxis, label="Period (s)", scale=dpg.mvPlotScale_Log10)
+            with dpg.plot_axis(dpg.mvYAxis, label="Pseudo-acceleration") as y_axis:
+                dpg.add_line_series(periods.tolist(), psa.tolist(), label="PSA")
+            dpg.fit_axis_data(x_axis)
+            dpg.fit_axis_data(y_axis)
+
+def _rank_similar(target):
+    periods, target_psa = spec.get_trace_response_spectrum(target)
+    return spec.rank_catalog(periods, target_psa)
+
+def _viewer_rank_similar():
+    global _viewer_ranking
+    if app_state.viewer_selected_trace_index is None: return
+    target = app_state.viewer_all_traces[app_state.viewer_selected_trace_index]
+    # Ranking loads and filters every record: done on the spectrum pool, shown when ready
+    _viewer_ranking = spec.submit(_rank_similar, target)
+    if dpg.does_item_exist("ranking_window"):
+        dpg.delete_item("ranking_window")
+    with dpg.window(label=f"Records similar to {target['id']}", width=600, height=400, tag="ranking_window"):
+        dpg.add_text(f"Ranking {len(app_state.viewer_all_traces)} traces...", tag="ranking_status_text")
+
+def _update_viewer_ranking():
+    global _viewer_ranking
+    if _viewer_ranking is None or not _viewer_ranking.done():
+        return
+    future, _viewer_ranking = _viewer_ranking, None
+    if not dpg.does_item_exist("ranking_window"):
+        return
+    try:
+        ranking = future.result()
+    except Exception as e:
+        dpg.set_value("ranking_status_text", f"Ranking failed: {e}")
+        return
+    dpg.delete_item("ranking_window", children_only=True)
+    with dpg.table(header_row=True, borders_innerH=True, borders_outerV=True, parent="ranking_window"):
+        dpg.add_table_column(label="Trace")
+        dpg.add_table_column(label="File")
+        dpg.add_table_column(label="Misfit (ln)")
+        dpg.add_table_column(label="Scale")
+        for trace_info, misfit, scale in ranking[:20]:
+            with dpg.table_row():
+                dpg.add_button(label=trace_info['id'], callback=_viewer_on_trace_select, user_data=trace_info['global_index'])
+                dpg.add_text(trace_info['file_name'])
+                dpg.add_text(f"{misfit:.3f}")
+                dpg.add_text(f"{scale:.3g}")
+
+def _diagnostics_enable_callback(sender, app_data):
+    instrumentation.enable(app_data)
+
+def _diagnostics_export_callback(sender, app_data):
+    if app_data:
+        path = dpg.get_value("diagnostics_export_path") or DIAGNOSTICS_EXPORT_FILE
+        instrumentation.start_exporter(path, dpg.get_value("diagnostics_export_interval"))
+        print(f"Diagnostics: Exporting snapshots to {path}")
+    else:
+        instrumentation.stop_exporter()
+
+def _update_diagnostics_table():
+    global _diagnostics_last_refresh
+    now = time.monotonic()
+    if now - _diagnostics_last_refresh < DIAGNOSTICS_REFRESH_S or not dpg.does_item_exist("diagnostics_table"):
+        return
+    _diagnostics_last_refresh = now
+    snapshot = instrumentation.snapshot()
+    dpg.delete_item("diagnostics_table", children_only=True, slot=1)
+    for name, stats in snapshot['histograms'].items():
+        with dpg.table_row(parent="diagnostics_table"):
+            dpg.add_text(name)
+            dpg.add_text(str(stats['count']))
+            dpg.add_text(f"{stats['p50_ms']:.3f}")
+            dpg.add_text(f"{stats['p99_ms']:.3f}")
+            dpg.add_text(f"{stats['max_ms']:.3f}")
+    counters = ", ".join(f"{name}={value}" for name, value in sorted(snapshot['counters'].items()))
+    dpg.set_value("diagnostics_counters_text", f"Counters: {counters or '-'}")
+    _update_device_stats()
+
+DEVICE_STATS_SERIES = {"device_series_cmd": "cmd", "device_series_host_cmd": "host_cmd",   # series tag -> stats key
+                       "device_series_jmax": "jmax", "device_series_jmean": "jmean", "device_series_stq": "stq"}
+
+def _update_device_stats():
+    with app_state.data_lock:
+        history = list(app_state.device_stats_history)
+    if not history or not dpg.does_item_exist("device_stats_plot"):
+        return
+    t0 = history[0][0]
+    times = [t - t0 for t, _ in history]
+    for tag, key in DEVICE_STATS_SERIES.items():
+        dpg.set_value(tag, [times, [stats.get(key, 0) for _, stats in history]])
+    for axis in ("device_x_axis", "device_y_rates", "device_y_micros"):
+        dpg.fit_axis_data(axis)
+    latest = history[-1][1]
+    dpg.set_value("diagnostics_device_text",
+                  f"Device: loop {latest.get('loop', 0) / 1000:.1f} kHz, {latest.get('cmd', 0)} cmd/s "
+                  f"(host {latest.get('host_cmd', 0)}), RX overflows {latest.get('ovf', 0)}, "
+                  f"encoder jitter {latest.get('jmean', 0)}/{latest.get('jmax', 0)} us (mean/max), "
+                  f"spikes {latest.get('spk', 0)}, dropped samples {latest.get('drop', 0)}, "
+                  f"stepper queue {latest.get('stq', 0)}")
+
+def _console_append(container, lines):
+    # Incremental update: add text items for the new lines, drop the oldest ones
+    items = _console_items[container]
+    if len(lines) >= CONSOLE_LINES:
+        while items:
+            dpg.delete_item(items.popleft())
+        lines = lines[-CONSOLE_LINES:]
+    for line in lines:
+        items.append(dpg.add_text(line, parent=container))
+    while len(items) > CONSOLE_LINES:
+        dpg.delete_item(items.popleft())
+    if lines:
+        dpg.set_y_scroll(container, -1.0)
+
+def _console_sampled(name, ring, combo):
+    # New events of a high-rate ring, one in every N as chosen in its combo (none when off)
+    every = TELEMETRY_SAMPLING.get(dpg.get_value(combo), 0)
+    if not every:
+        _console_seq[name] = ring.head
+        return []
+    _console_seq[name], events = ring.since(_console_seq[name], limit=CONSOLE_LINES, every=every)
+    return events
+
+def _update_console():
+    global _console_last_refresh
+    now = time.monotonic()
+    if now - _console_last_refresh < CONSOLE_REFRESH_S or not dpg.does_item_exist("console_recv_container"):
+        return
+    _console_last_refresh = now
+
+    _console_seq["messages"], messages = log_ring.messages.since(_console_seq["messages"], limit=CONSOLE_LINES)
+    telemetry = _console_sampled("telemetry", log_ring.telemetry, "console_telemetry_combo")
+    motion = _console_sampled("motion", log_ring.motion, "console_motion_combo")
+
+    sent_kinds = (log_ring.KIND_SENT, log_ring.KIND_SEND_ERROR)
+    received = sorted([e for e in messages if e[2] not in sent_kinds] + telemetry, key=lambda e: e[1])
+    sent = sorted([e for e in messages if e[2] in sent_kinds] + motion, key=lambda e: e[1])
+    _console_append("console_recv_container", [log_ring.format_event(t, k, p) for _, t, k, p in received])
+    _console_append("console_send_container", [log_ring.format_event(t, k, p) for _, t, k, p in sent])
 
 def update_gui_callbacks():
     if app_state.viewer_data_dirty.is_set():
@@ -132,9 +551,42 @@ def update_gui_callbacks():
         _update_viewer_detailed_plot()
         app_state.viewer_data_dirty.clear()
     
-    with app_state.data_lock:
+    _update_diagnostics_table()
+    _update_replay_controls()
+    _update_viewer_ranking()
+    _update_console()
+    with instrumentation.span("kinematics.update"):
+        kinematics.process_pending()
+
+    with instrumentation.locked(app_state.data_lock, "data_lock"):
+        if app_state.stop_status_dirty and dpg.does_item_exist("stop_status_text"):
+            dpg.set_value("stop_status_text", app_state.stop_status)
+            app_state.stop_status_dirty = False
+        if app_state.viewer_playback_status_dirty:
+            for status_tag in ("viewer_playback_status_text", "wave_status_text"):
+                if dpg.does_item_exist(status_tag):
+                    dpg.set_value(status_tag, app_state.viewer_playback_status)
+            app_state.viewer_playback_status_dirty = False
         if app_state.x_data and app_state.y_data and dpg.does_item_exist("series_real_comp"):
             dpg.set_value("series_real_comp", [list(app_state.x_data), list(app_state.y_data)])
+            dpg.set_value("series_real_comp2", [list(app_state.x_data), list(app_state.y_data)])
+            if app_state.telemetry_pending_since_ns is not None:
+                instrumentation.record("serial.read_to_plot", time.perf_counter_ns() - app_state.telemetry_pending_since_ns)
+                app_state.telemetry_pending_since_ns = None
+        if dpg.does_item_exist("series_acceleration_real"):
+            for tag, data in (("series_velocity_real", app_state.velocity_data),
+                              ("series_acceleration_real", app_state.acceleration_data),
+                              ("series_acceleration_target", app_state.target_acceleration_data)):
+                if data:
+                    dpg.set_value(tag, [list(column) for column in zip(*data)])
+            if app_state.acceleration_data or app_state.target_acceleration_data:
+                dpg.fit_axis_data("y_axis_velocity")
+                dpg.fit_axis_data("y_axis_acceleration")
+        if app_state.expected_wave_data and dpg.does_item_exist("series_expected_comp2"):
+            expected_x, expected_y = zip(*app_state.expected_wave_data)
+            dpg.set_value("series_expected_comp2", [list(expected_x), list(expected_y)])
+            dpg.fit_axis_data("x_axis_comp2")
+            dpg.fit_axis_data("y_axis_comp2")
         if app_state.expected_wave_data and dpg.does_item_exist("series_expected_comp"):
             expected_x, expected_y = zip(*app_state.expected_wave_data)
             dpg.set_value("series_expected_comp", [list(expected_x), list(expected_y)])
@@ -143,12 +595,6 @@ def update_gui_callbacks():
             dpg.fit_axis_data("x_axis_comp")
             dpg.fit_axis_data("y_axis_comp")
         
-        if app_state.log_dirty:
-            if dpg.does_item_exist("console_recv_output"): dpg.set_value("console_recv_output", "\n".join(app_state.log_recv))
-            if dpg.does_item_exist("console_send_output"): dpg.set_value("console_send_output", "\n".join(app_state.log_sent))
-            if dpg.does_item_exist("console_recv_container"): dpg.set_y_scroll("console_recv_container", -1.0)
-            if dpg.does_item_exist("console_send_container"): dpg.set_y_scroll("console_send_container", -1.0)
-            app_state.log_dirty = False
 
 def update_plot_sizes():
     if dpg.does_item_exist("main_window"):
@@ -171,6 +617,11 @@ def create_gui():
                 dpg.add_plot_axis(dpg.mvXAxis, label="Time (s)", tag="x_axis_comp")
                 with dpg.plot_axis(dpg.mvYAxis, label="Position (steps)", tag="y_axis_comp"):
                     dpg.add_line_series([], [], label="Real", tag="series_real_comp")
+                with dpg.plot_axis(dpg.mvYAxis, label="Velocity (steps/s)", tag="y_axis_velocity"):
+                    dpg.add_line_series([], [], label="Velocity (encoder)", tag="series_velocity_real")
+                with dpg.plot_axis(dpg.mvYAxis, label="Acceleration (steps/s^2)", tag="y_axis_acceleration"):
+                    dpg.add_line_series([], [], label="Acceleration (encoder)", tag="series_acceleration_real")
+                    dpg.add_line_series([], [], label="Acceleration (target)", tag="series_acceleration_target")
             with dpg.plot(label="validation" , tag="validation"):
                 dpg.add_plot_legend()
                 dpg.add_plot_axis(dpg.mvXAxis, label="Time (s)", tag="x_axis_comp2")
@@ -182,10 +633,14 @@ def create_gui():
             dpg.add_combo(items=[], tag="ports_combo", width=150)
             dpg.add_button(label="Refresh", callback=refresh_ports_callback)
             dpg.add_text("Baud Rate")
-            dpg.add_combo(["9600", "57600", "115200", "921600"], tag="baud_rate_combo", default_value="115200", width=100)
+            dpg.add_combo(["9600", "57600", "115200", "921600"], tag="baud_rate_combo", default_value="921600", width=100)
             dpg.add_button(label="Connect", tag="connect_button", callback=connect_callback, width=100)
             dpg.add_button(label="Disconnect", tag="disconnect_button", callback=disconnect_callback, width=100, show=False)
             dpg.add_checkbox(label="ondas basicas", tag="checkbox_onda", callback=checkbox_callback)
+            dpg.add_button(label="EMERGENCY STOP (Esc)", tag="emergency_stop_button", callback=emergency_stop,
+                           width=180)
+            dpg.add_button(label="Release", callback=release_emergency_stop)
+            dpg.add_text("", tag="stop_status_text", color=(255, 90, 90))
         with dpg.tab_bar():
             with dpg.tab(label="Seismic Trace Viewer"):
                 with dpg.group(tag="t1", show=True):
@@ -195,9 +650,52 @@ def create_gui():
                             dpg.add_button(label="Load Data from 'sismic_records'", 
                                 callback=lambda: threading.Thread(target=sh.load_traces_from_folder_thread, daemon=True).start(), 
                                 width=-1, height=40)
+                            with dpg.group(horizontal=True):
+                                dpg.add_combo(["file order", "pga", "pgv", "arias", "significant_duration", "dominant_freq", "duration"],
+                                              tag="viewer_sort_combo", default_value="file order", width=150)
+                                dpg.add_checkbox(label="desc", tag="viewer_sort_desc", default_value=True)
+                                dpg.add_input_float(label="Min PGA", tag="viewer_min_pga_input", default_value=0.0, width=90, step=0)
+                                dpg.add_input_text(hint="Station", tag="viewer_station_input", width=70)
+                                dpg.add_button(label="Apply", callback=_viewer_apply_query)
+                            with dpg.group(horizontal=True):
+                                dpg.add_input_int(label="Playback amplitude (steps)", tag="viewer_amplitude_input",
+                                                  default_value=app_state.viewer_playback_amplitude, width=120,
+                                                  callback=_viewer_amplitude_callback, on_enter=True)
+                            with dpg.group(horizontal=True):
+                                dpg.add_input_float(label="Command rate (Hz, 0 = record)", tag="viewer_command_rate_input",
+                                                    default_value=app_state.viewer_command_rate, width=90, step=0,
+                                                    format="%.0f", callback=_viewer_resampling_callback, on_enter=True)
+                                dpg.add_input_float(label="Similitude scale", tag="viewer_similitude_input",
+                                                    default_value=app_state.viewer_similitude_scale, width=60, step=0,
+                                                    format="%.1f", callback=_viewer_resampling_callback, on_enter=True)
+                            with dpg.group(horizontal=True):
+                                dpg.add_checkbox(label="Strong motion only, padding (s):", tag="viewer_trim_enable",
+                                                 default_value=app_state.viewer_trim_strong_motion,
+                                                 callback=_viewer_trim_callback)
+                                dpg.add_input_float(label="before", tag="viewer_trim_pre_input",
+                                                    default_value=app_state.viewer_trim_pre_s, width=50, step=0,
+                                                    format="%.0f", callback=_viewer_trim_callback, on_enter=True)
+                                dpg.add_input_float(label="after", tag="viewer_trim_post_input",
+                                                    default_value=app_state.viewer_trim_post_s, width=50, step=0,
+                                                    format="%.0f", callback=_viewer_trim_callback, on_enter=True)
+                            with dpg.group(horizontal=True):
+                                dpg.add_button(label="Export List for Table",
+                                               callback=lambda: threading.Thread(
+                                                   target=sh.export_visible_traces,
+                                                   args=(dpg.get_value("viewer_export_csv"),), daemon=True).start())
+                                dpg.add_checkbox(label="also CSV", tag="viewer_export_csv")
+                            dpg.add_text("", tag="viewer_playback_status_text")
                             dpg.add_separator()
-                            with dpg.child_window(tag="viewer_file_tree", border=True):
-                                dpg.add_text("Click 'Load Data' to begin.")
+                            with dpg.child_window(tag="viewer_file_tree", border=True, no_scrollbar=True):
+                                dpg.add_text("Click 'Load Data' to begin.", tag="viewer_list_status")
+                                with dpg.group(horizontal=True):
+                                    with dpg.group(width=-30):
+                                        for slot in range(VIEWER_LIST_ROWS):
+                                            dpg.add_selectable(tag=f"viewer_row_{slot}", callback=_viewer_on_row_click,
+                                                               user_data=slot, show=False)
+                                    dpg.add_slider_int(tag="viewer_list_scroll", vertical=True, min_value=0, max_value=1,
+                                                       height=VIEWER_LIST_ROWS * 21, width=20, format="",
+                                                       callback=_viewer_on_scroll, show=False)
                         with dpg.group(width=-1):
                             dpg.add_text("Detailed Trace View")
                             dpg.add_separator()
@@ -206,13 +704,19 @@ def create_gui():
                 with dpg.group(tag="t2", show=False):
                     with dpg.group(horizontal=True):
                         with dpg.group(width=300):
-                            dpg.add_text("Sine Wave Generator")
+                            dpg.add_text("Excitation Generator")
+                            dpg.add_combo(excitation.KINDS, tag="wave_kind_combo", default_value="sine", label="Signal")
                             dpg.add_slider_int(label="Amplitude", tag="amplitude_slider", default_value=1600, min_value=100, max_value=10000)
                             dpg.add_slider_float(label="Frequency", tag="frequency_slider", default_value=0.5, min_value=0.1, max_value=5.0, format="%.2f Hz")
+                            dpg.add_input_float(label="f min (Hz)", tag="wave_fmin_input", default_value=0.2, step=0, format="%.2f")
+                            dpg.add_input_float(label="f max (Hz)", tag="wave_fmax_input", default_value=10.0, step=0, format="%.2f")
+                            dpg.add_input_float(label="Duration (s)", tag="wave_duration_input", default_value=30.0, step=0, format="%.1f")
+                            dpg.add_input_int(label="Command rate (Hz)", tag="wave_rate_input", default_value=50, step=0)
                             dpg.add_separator()
                             with dpg.group(horizontal=True):
                                 dpg.add_button(label="Start Wave", tag="start_wave_button", callback=start_wave_callback, width=-1)
                                 dpg.add_button(label="Stop Wave", tag="stop_wave_button", callback=stop_wave_callback, width=-1)
+                            dpg.add_text("", tag="wave_status_text")
                             dpg.add_separator()
                             dpg.add_text("Manual Control & Send Log")
             with dpg.tab(label="manual"):
@@ -220,15 +724,100 @@ def create_gui():
                     with dpg.group(width=400):
                         dpg.add_input_text(tag="command_input", hint="Command (e.g., m0)", on_enter=True, callback=send_manual_command_callback)
                         dpg.add_button(label="Send Command", tag="send_command_button", callback=send_manual_command_callback)
-                        with dpg.child_window(tag="console_send_container", height=-1, border=True):
-                            dpg.add_input_text(tag="console_send_output", multiline=True, readonly=True, width=-1, height=-1)
-                    with dpg.child_window(tag="console_recv_container", height=-1,width=-1, border=True):
-                        dpg.add_input_text(tag="console_recv_output", multiline=True, readonly=True, height=-1)
+                        dpg.add_combo(list(TELEMETRY_SAMPLING), tag="console_motion_combo", default_value="1 in 100",
+                                      label="Streamed commands", width=120)
+                        dpg.add_child_window(tag="console_send_container", height=-1, border=True)
+                    with dpg.group(width=-1):
+                        dpg.add_combo(list(TELEMETRY_SAMPLING), tag="console_telemetry_combo", default_value="1 in 100",
+                                      label="Telemetry lines", width=120)
+                        dpg.add_child_window(tag="console_recv_container", height=-1, width=-1, border=True)
             with dpg.tab(label="opciones"):
                 dpg.add_input_int(label="Speed (s)", tag="speed_input", default_value=50000)
                 dpg.add_input_int(label="Acceleration (a)", tag="accel_input", default_value=20000)
                 dpg.add_input_int(label="Commads per second", tag="commandsPerSecond_input", default_value=20000)
+                dpg.add_combo([str(hz) for hz in TELEMETRY_RATES_HZ], tag="telemetry_rate_combo",
+                              default_value=str(app_state.telemetry_rate_hz), label="Telemetry rate (Hz)", width=100,
+                              callback=lambda sender, app_data: set_telemetry_rate(int(app_data)))
+                dpg.add_input_float(label="Velocity/acceleration fit window (ms)", tag="kinematics_window_input",
+                                    default_value=kinematics.WINDOW_S * 1000, width=100, step=0, format="%.0f",
+                                    callback=_kinematics_window_callback, on_enter=True)
+                dpg.add_separator()
+                dpg.add_checkbox(label="Closed-loop correction (encoder feedback)", tag="position_loop_enable",
+                                 default_value=app_state.position_loop_enabled, callback=_position_loop_callback)
+                dpg.add_input_float(label="Kp", tag="position_loop_kp", default_value=app_state.position_loop_kp,
+                                    width=100, step=0, format="%.3f", callback=_position_loop_callback)
+                dpg.add_input_float(label="Ki (1/s)", tag="position_loop_ki", default_value=app_state.position_loop_ki,
+                                    width=100, step=0, format="%.3f", callback=_position_loop_callback)
+                dpg.add_input_int(label="Max correction (steps)", tag="position_loop_limit",
+                                  default_value=app_state.position_loop_limit, width=100, step=0,
+                                  callback=_position_loop_callback)
+                dpg.add_input_float(label="Table lag (ms)", tag="position_loop_delay_ms",
+                                    default_value=app_state.position_loop_delay_s * 1000, width=100, step=0,
+                                    format="%.0f", callback=_position_loop_callback)
+                dpg.add_separator()
+                dpg.add_checkbox(label="Reject playback outside the mapped envelope", tag="envelope_enforce",
+                                 default_value=app_state.envelope_enforce, callback=_envelope_enforce_callback)
+                dpg.add_text(_envelope_summary(), tag="envelope_summary_text")
+                dpg.add_separator()
+                dpg.add_checkbox(label="Backlash pre-compensation", tag="backlash_compensation_enable",
+                                 default_value=app_state.backlash_compensation, callback=_backlash_compensation_callback)
+                dpg.add_text(_backlash_model_summary(), tag="backlash_model_text")
+            with dpg.tab(label="replay"):
+                with dpg.group(horizontal=True):
+                    dpg.add_checkbox(label="Record session", tag="replay_record", callback=_replay_record_callback)
+                    dpg.add_text("Not recording.", tag="replay_record_text")
+                with dpg.group(horizontal=True):
+                    dpg.add_combo(items=session_log.list_sessions(), tag="replay_session_combo", width=300)
+                    dpg.add_button(label="Refresh", callback=_replay_refresh_callback)
+                    dpg.add_combo(list(REPLAY_SPEEDS), tag="replay_speed_combo", default_value="1x", width=70,
+                                  callback=_replay_speed_callback)
+                    dpg.add_button(label="Replay", callback=_replay_play_callback)
+                    dpg.add_button(label="Pause/Resume", callback=_replay_pause_callback)
+                    dpg.add_button(label="Stop", callback=_replay_stop_callback)
+                    dpg.add_button(label="Fit backlash", callback=_backlash_fit_callback)
+                dpg.add_slider_float(label="Seek (s)", tag="replay_seek_slider", min_value=0.0, max_value=1.0,
+                                     width=600, callback=_replay_seek_callback)
+                dpg.add_text("", tag="replay_position_text")
+                dpg.add_text("", tag="replay_status_text")
+            with dpg.tab(label="diagnostics"):
+                with dpg.group(horizontal=True):
+                    dpg.add_checkbox(label="Enable instrumentation", tag="diagnostics_enable",
+                                     default_value=instrumentation.ENABLED, callback=_diagnostics_enable_callback)
+                    dpg.add_button(label="Reset", callback=lambda: instrumentation.reset())
+                with dpg.group(horizontal=True):
+                    dpg.add_checkbox(label="Export snapshots to", tag="diagnostics_export", callback=_diagnostics_export_callback)
+                    dpg.add_input_text(tag="diagnostics_export_path", default_value=DIAGNOSTICS_EXPORT_FILE, width=250)
+                    dpg.add_input_float(label="every (s)", tag="diagnostics_export_interval", default_value=5.0,
+                                        width=90, step=0, min_value=0.5, min_clamped=True)
+                dpg.add_text("Counters: -", tag="diagnostics_counters_text")
+                with dpg.table(tag="diagnostics_table", header_row=True, borders_innerH=True, borders_outerH=True,
+                               borders_innerV=True, borders_outerV=True):
+                    dpg.add_table_column(label="Metric")
+                    dpg.add_table_column(label="Count")
+                    dpg.add_table_column(label="p50 (ms)")
+                    dpg.add_table_column(label="p99 (ms)")
+                    dpg.add_table_column(label="Max (ms)")
+                dpg.add_separator()
+                dpg.add_text("Device: - (polled with 'q' while instrumentation is enabled)", tag="diagnostics_device_text")
+                with dpg.plot(tag="device_stats_plot", height=250, width=-1):
+                    dpg.add_plot_legend()
+                    dpg.add_plot_axis(dpg.mvXAxis, label="Time (s)", tag="device_x_axis")
+                    with dpg.plot_axis(dpg.mvYAxis, label="commands/s", tag="device_y_rates"):
+                        dpg.add_line_series([], [], label="device cmd/s", tag="device_series_cmd")
+                        dpg.add_line_series([], [], label="host cmd/s", tag="device_series_host_cmd")
+                    with dpg.plot_axis(dpg.mvYAxis, label="us / entries", tag="device_y_micros"):
+                        dpg.add_line_series([], [], label="jitter max (us)", tag="device_series_jmax")
+                        dpg.add_line_series([], [], label="jitter mean (us)", tag="device_series_jmean")
+                        dpg.add_line_series([], [], label="stepper queue", tag="device_series_stq")
 
+    with dpg.theme(tag="emergency_stop_theme"):
+        with dpg.theme_component(dpg.mvButton):
+            dpg.add_theme_color(dpg.mvThemeCol_Button, (180, 20, 20))
+            dpg.add_theme_color(dpg.mvThemeCol_ButtonHovered, (220, 40, 40))
+    dpg.bind_item_theme("emergency_stop_button", "emergency_stop_theme")
+    with dpg.handler_registry():
+        dpg.add_mouse_wheel_handler(callback=_viewer_on_wheel)
+        dpg.add_key_press_handler(dpg.mvKey_Escape, callback=emergency_stop)
     with dpg.item_handler_registry(tag="window_resize_handler"):
         dpg.add_item_resize_handler(callback=update_plot_sizes)
     dpg.bind_item_handler_registry("main_window", "window_resize_handler")
@@ -238,17 +827,24 @@ def create_gui():
     update_ui_for_connection_state(False)
 
 def cleanup():
+    _replay_stop_callback()
+    session_log.recorder.stop()
+    instrumentation.stop_exporter()
     disconnect_serial()
     app_state.app_running = False
 
 def main():
     create_gui()
     threading.Thread(target=read_serial_thread, daemon=True).start()
+    threading.Thread(target=heartbeat_thread, daemon=True).start()
     dpg.show_viewport()
+    dpg.render_dearpygui_frame()   # window is on screen before any heavy import starts
+    sh.warm_up()                   # the viewer tab is shown at startup: load ObsPy/scipy in the background
 
     while dpg.is_dearpygui_running():
-        update_gui_callbacks()
-        dpg.render_dearpygui_frame()
+        with instrumentation.span("gui.frame"):
+            update_gui_callbacks()
+            dpg.render_dearpygui_frame()
 
     cleanup()
 
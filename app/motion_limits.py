@@ -0,0 +1,50 @@
+# motion_limits.py
+# Reads the speed/acceleration limit table written by the calibration engine
+# (utilities/python calibrador_pasivo.py) so playback never requests a speed the
+# table cannot sustain at the configured acceleration.
+
+import json
+import os
+
+LIMITS_FILE_NAME = "motion_limits.json"
+
+_table = None
+_table_mtime = None
+
+def get_limits_path():
+    """Gets the absolute path to the limit table next to the app modules."""
+    return os.path.join(os.path.dirname(os.path.abspath(__file__)), LIMITS_FILE_NAME)
+
+def load_limits():
+    """Returns the sorted [(acceleration, max_speed)] table, or [] if not calibrated yet."""
+    global _table, _table_mtime
+    path = get_limits_path()
+    try:
+        mtime = os.path.getmtime(path)
+    except OSError:
+        return []
+    if _table is None or mtime != _table_mtime:
+        with open(path) as f:
+            data = json.load(f)
+        _table = sorted((int(row['acceleration']), int(row['max_speed'])) for row in data.get('limits', []))
+        _table_mtime = mtime
+    return _table
+
+def max_speed_for_acceleration(acceleration):
+    """Highest calibrated speed that is reliable at this acceleration, or None if unknown.
+
+    Uses the first calibrated acceleration at or above the requested one, which is
+    the conservative choice since the reliable speed drops as acceleration rises.
+    Above the calibrated range the last (lowest) limit is used."""
+    table = load_limits()
+    for accel, max_speed in table:
+        if accel >= acceleration:
+            return max_speed
+    return table[-1][1] if table else None
+
+def clamp_speed(speed, acceleration):
+    """Returns (speed, limited) with speed reduced to the calibrated limit if needed."""
+    limit = max_speed_for_acceleration(acceleration)
+    if limit and speed > limit:
+        return limit, True
+    return speed, False
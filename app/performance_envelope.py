@@ -0,0 +1,101 @@
+# performance_envelope.py
+# Reads the operating-envelope map written by utilities/envelope_mapper.py and
+# rejects playback trajectories the table was not able to track.
+# The map holds sine-tracking results (gain, phase, THD) per frequency, amplitude,
+# command rate and speed/acceleration setting. Points only apply at the command
+# rate they were measured at (a rate that was not mapped is refused), speed and
+# acceleration settings at or below the current ones are trusted, and an
+# amplitude that tracked at some frequency is taken as feasible at every lower
+# frequency (speed and acceleration both drop).
+# A trajectory is split into octave bands with one FFT; the peak of each band is
+# compared with the largest feasible amplitude at the band's upper edge.
+
+import json
+import os
+
+import numpy as np
+
+ENVELOPE_FILE_NAME = "performance_envelope.json"
+MIN_BAND_HZ = 0.1
+SIGNIFICANT_STEPS = 2.0        # band peaks below this are ignored
+RATE_TOLERANCE = 1e-3          # relative; command rates closer than this are the same rate
+
+_points = None
+_points_mtime = None
+
+def get_envelope_path():
+    """Gets the absolute path to the envelope map next to the app modules."""
+    return os.path.join(os.path.dirname(os.path.abspath(__file__)), ENVELOPE_FILE_NAME)
+
+def load_envelope():
+    """Returns the list of mapped points, or [] if the envelope has not been mapped yet."""
+    global _points, _points_mtime
+    path = get_envelope_path()
+    try:
+        mtime = os.path.getmtime(path)
+    except OSError:
+        return []
+    if _points is None or mtime != _points_mtime:
+        with open(path) as f:
+            _points = json.load(f).get('points', [])
+        _points_mtime = mtime
+    return _points
+
+def _same_rate(mapped, command_rate):
+    return abs(mapped - command_rate) <= RATE_TOLERANCE * command_rate
+
+def mapped_rates():
+    """Sorted command rates (Hz) present in the map."""
+    return sorted({p['command_rate'] for p in load_envelope()})
+
+def amplitude_limits(command_rate, speed=None, acceleration=None):
+    """(frequencies, amplitudes) of the feasible points measured at this command rate
+    with settings at or below the given ones (None = any), or None when no mapped
+    point applies."""
+    usable = [p for p in load_envelope()
+              if _same_rate(p['command_rate'], command_rate)
+              and (speed is None or p['speed'] <= speed)
+              and (acceleration is None or p['acceleration'] <= acceleration)]
+    if not usable:
+        return None
+    feasible = [p for p in usable if p['feasible']]
+    return (np.array([p['frequency'] for p in feasible], dtype=np.float64),
+            np.array([p['amplitude'] for p in feasible], dtype=np.float64))
+
+def band_peaks(positions, sample_interval):
+    """(upper band edges in Hz, peak |displacement| in steps) per octave band."""
+    x = np.asarray(positions, dtype=np.float64)
+    x = x - x.mean()
+    nyquist = 0.5 / sample_interval
+    edges = MIN_BAND_HZ * 2.0 ** np.arange(int(np.ceil(np.log2(nyquist / MIN_BAND_HZ))) + 1)
+    edges[-1] = nyquist
+    spectrum = np.fft.rfft(x)
+    freqs = np.fft.rfftfreq(x.size, sample_interval)
+    band = np.searchsorted(edges, freqs, side="left")      # band k covers (edges[k-1], edges[k]]
+    peaks = np.zeros(edges.size)
+    for k in np.unique(band[1:]):
+        peaks[k] = np.max(np.abs(np.fft.irfft(np.where(band == k, spectrum, 0), x.size)))
+    return edges, peaks
+
+def check_trajectory(positions, sample_interval, speed=None, acceleration=None):
+    """Reasons why the trajectory is outside the mapped envelope; [] when it is
+    inside or there is no map for these settings. A command rate the map does not
+    cover is a violation: tracking measured at one rate says nothing about another."""
+    command_rate = 1.0 / sample_interval
+    rates = mapped_rates()
+    if rates and not any(_same_rate(rate, command_rate) for rate in rates):
+        return [f"command rate {command_rate:.0f} Hz not mapped (mapped: {', '.join(f'{r:g}' for r in rates)} Hz)"]
+    limits = amplitude_limits(command_rate, speed, acceleration)
+    if limits is None or len(positions) < 2:
+        return []
+    frequencies, amplitudes = limits
+    violations = []
+    for edge, peak in zip(*band_peaks(positions, sample_interval)):
+        if peak < SIGNIFICANT_STEPS:
+            continue
+        allowed = amplitudes[frequencies >= edge]
+        limit = allowed.max() if allowed.size else 0.0
+        if peak > limit:
+            violations.append(f"{peak:.0f} steps up to {edge:.1f} Hz "
+                              + (f"(mapped limit {limit:.0f})" if allowed.size else "(not mapped)"))
+    return violations
@@ -0,0 +1,112 @@
+# playback_cache.py
+# Speculative preparation of traces for playback.
+# When the operator selects a trace, the selected trace and its neighbours in the
+# list are prepared (processing, scaling, trajectory generation) in a small
+# worker pool. Results go into an LRU cache keyed by trace and playback
+# parameters, so pressing play can start motion immediately.
+
+import threading
+from collections import OrderedDict
+from concurrent.futures import CancelledError, ThreadPoolExecutor
+
+import app_state
+
+CACHE_SIZE = 8
+MAX_WORKERS = 2
+
+_cache = OrderedDict()          # key -> (scaled_positions, sample_interval)
+_pending = {}                   # key -> (future, cancel_event)
+_lock = threading.Lock()
+_executor = None
+
+def playback_params():
+    """Current parameters that change the prepared trajectory."""
+    import backlash
+    with app_state.data_lock:
+        compensate = app_state.backlash_compensation
+        params = (int(abs(app_state.viewer_playback_amplitude)), float(app_state.viewer_command_rate),
+                  float(app_state.viewer_similitude_scale))
+        trim_padding = trim_settings()
+    model = backlash.load_model() if compensate else None
+    return params + (float(model['width']) if model else 0.0, trim_padding)
+
+def trim_settings():
+    """(pre, post) padding in seconds of the strong-motion trim, None when playing whole records."""
+    if not app_state.viewer_trim_strong_motion:
+        return None
+    return (float(app_state.viewer_trim_pre_s), float(app_state.viewer_trim_post_s))
+
+def _key(trace_info, params):
+    import spectrum_handler
+    return (spectrum_handler.trace_key(trace_info),) + params
+
+def cache_key(trace_info):
+    """Key identifying the trace prepared with the current playback parameters."""
+    return _key(trace_info, playback_params())
+
+def _store(key, result):
+    with _lock:
+        _cache[key] = result
+        _cache.move_to_end(key)
+        while len(_cache) > CACHE_SIZE:
+            _cache.popitem(last=False)
+
+def _prepare(trace_info, params, key, cancel_event):
+    import seismic_handler as sh
+    try:
+        result = sh._prepare_trace_for_playback(trace_info['obspy_trace'], *params, cancel_event=cancel_event)
+        _store(key, result)
+        return result
+    finally:
+        with _lock:
+            if key in _pending and _pending[key][1] is cancel_event:
+                del _pending[key]
+
+def prefetch(trace_infos):
+    """Speculatively prepares the given traces; pending work for any other trace is cancelled."""
+    global _executor
+    params = playback_params()
+    wanted = [(_key(t, params), t) for t in trace_infos]
+    wanted_keys = {key for key, _ in wanted}
+    with _lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(max_workers=MAX_WORKERS, thread_name_prefix="prefetch")
+        for key, (future, cancel_event) in list(_pending.items()):
+            if key not in wanted_keys:
+                # Not started: dropped from the queue. Running: stops at its next stage.
+                future.cancel()
+                cancel_event.set()
+                _pending.pop(key)
+        for key, trace_info in wanted:
+            if key in _cache or key in _pending:
+                continue
+            cancel_event = threading.Event()
+            future = _executor.submit(_prepare, trace_info, params, key, cancel_event)
+            _pending[key] = (future, cancel_event)
+
+def get_prepared(trace_info):
+    """Returns (scaled_positions, sample_interval) for the trace, from the cache if possible.
+
+    Waits for an in-flight speculation of the same trace, otherwise prepares it here."""
+    params = playback_params()
+    key = _key(trace_info, params)
+    with _lock:
+        if key in _cache:
+            _cache.move_to_end(key)
+            return _cache[key]
+        pending = _pending.get(key)
+    if pending is not None:
+        try:
+            return pending[0].result()
+        except CancelledError:
+            pass
+    return _prepare(trace_info, params, key, None)
+
+def clear():
+    """Cancels all speculation and empties the cache (e.g. after a reload)."""
+    with _lock:
+        for future, cancel_event in _pending.values():
+            future.cancel()
+            cancel_event.set()
+        _pending.clear()
+        _cache.clear()
@@ -0,0 +1,74 @@
+# position_loop.py
+# Optional host-side outer position loop. The stepper runs open loop on the
+# firmware, so steps lost at high speed/acceleration leave a permanent offset.
+# While streaming, each command is compared with the encoder telemetry and a
+# bounded PI correction is added to the stepper target:
+#     e[k] = r[k - delay] - y[k]            (steps; r = reference, y = encoder)
+#     u[k] = clip(kp * e[k] + ki * I[k], -limit, limit)
+# The reference is delayed by the expected table lag so normal tracking lag is
+# not "corrected". Anti-windup: the integrator only accumulates while the output
+# is not saturated in the direction of the error, and is clamped to the limit.
+
+import time
+from collections import deque
+
+import numpy as np
+
+import app_state
+from drive_correction import degrees_to_steps
+
+STALE_TELEMETRY_S = 0.2     # no correction update on measurements older than this
+
+class PositionCorrector:
+    """Discrete PI correction of the stepper target from encoder feedback."""
+
+    def __init__(self, sample_interval, kp, ki, limit, delay_s, baseline_angle):
+        self.sample_interval = float(sample_interval)
+        self.kp = float(kp)
+        self.ki = float(ki)
+        self.limit = max(0.0, float(limit))
+        self.delay_samples = max(0, int(round(delay_s / self.sample_interval)))
+        self.baseline = float(degrees_to_steps(baseline_angle))
+        self.integral = 0.0
+        self.output = 0.0
+        self._references = deque(maxlen=self.delay_samples + 1)
+        self.errors = []
+        self.efforts = []
+
+    def update(self, reference, angle, angle_time, now=None):
+        """Returns the correction (steps) to add to this command's target."""
+        self._references.append(reference)
+        now = time.monotonic() if now is None else now
+        if angle is None or now - angle_time > STALE_TELEMETRY_S:
+            return int(round(self.output))      # hold the last correction
+        error = self._references[0] - (float(degrees_to_steps(angle)) - self.baseline)
+        unsaturated = abs(self.output) < self.limit or (error > 0) != (self.output > 0)
+        if unsaturated and self.ki:
+            self.integral += error * self.sample_interval
+            integral_limit = self.limit / abs(self.ki)
+            self.integral = min(max(self.integral, -integral_limit), integral_limit)
+        self.output = min(max(self.kp * error + self.ki * self.integral, -self.limit), self.limit)
+        self.errors.append(error)
+        self.efforts.append(self.output)
+        return int(round(self.output))
+
+    def summary(self):
+        """(rms error, max |error|, max |correction|) in steps over the run."""
+        if not self.errors:
+            return 0.0, 0.0, 0.0
+        errors = np.asarray(self.errors)
+        return (float(np.sqrt(np.mean(errors ** 2))), float(np.max(np.abs(errors))),
+                float(np.max(np.abs(self.efforts))))
+
+def from_settings(sample_interval):
+    """A corrector with the operator's settings, or None when the loop is off or
+    there is no recent telemetry to take the starting position from."""
+    with app_state.data_lock:
+        if not app_state.position_loop_enabled:
+            return None
+        settings = (app_state.position_loop_kp, app_state.position_loop_ki,
+                    app_state.position_loop_limit, app_state.position_loop_delay_s)
+        angle, angle_time = app_state.latest_angle, app_state.latest_angle_time
+    if angle is None or time.monotonic() - angle_time > STALE_TELEMETRY_S:
+        return None
+    return PositionCorrector(sample_interval, *settings, baseline_angle=angle)
@@ -0,0 +1,57 @@
+# resampling.py
+# Conversion of record samples to the table's command rate.
+# Records come at arbitrary sampling rates; playback streams one position command
+# per output sample. The rate ratio is approximated by a small fraction up/down
+# and applied with polyphase filtering (scipy.signal.resample_poly). The low-pass
+# design for each (up, down) pair is computed once and reused, so converting a
+# long record costs one upfirdn pass.
+# Similitude scaling for reduced-scale specimens (length scale 1:scale) compresses
+# time by sqrt(scale): the record is treated as sampled sqrt(scale) times faster.
+
+import math
+from fractions import Fraction
+from functools import lru_cache
+
+import numpy as np
+
+MAX_FACTOR = 64             # largest up or down factor; bounds the filter length
+KAISER_BETA = 5.0           # same window resample_poly designs by default
+HALF_LENGTH_PER_FACTOR = 10
+
+def rational_factors(rate_in, rate_out, max_factor=MAX_FACTOR):
+    """Returns (up, down) with up/down ~= rate_out/rate_in and both <= max_factor."""
+    if rate_in <= 0 or rate_out <= 0:
+        raise ValueError("Sampling rates must be positive.")
+    # Approximating the ratio below 1 bounds both terms by the denominator limit
+    if rate_out <= rate_in:
+        ratio = Fraction(rate_out / rate_in).limit_denominator(max_factor)
+        return (ratio.numerator, ratio.denominator) if ratio else (1, max_factor)
+    ratio = Fraction(rate_in / rate_out).limit_denominator(max_factor)
+    return (ratio.denominator, ratio.numerator) if ratio else (max_factor, 1)
+
+@lru_cache(maxsize=32)
+def filter_design(up, down):
+    """Low-pass FIR for resampling by up/down (cached; do not modify the result)."""
+    from scipy.signal import firwin
+    max_rate = max(up, down)
+    taps = firwin(2 * HALF_LENGTH_PER_FACTOR * max_rate + 1, 1.0 / max_rate, window=("kaiser", KAISER_BETA))
+    taps.setflags(write=False)
+    return taps
+
+def resample(data, rate_in, rate_out, similitude_scale=1.0):
+    """Resamples data to rate_out (Hz). rate_out <= 0 keeps the record's samples.
+
+    Returns (samples, sample_interval); sample_interval is the exact interval of
+    the returned samples, which can differ slightly from 1/rate_out when the rate
+    ratio is approximated."""
+    data = np.asarray(data, dtype=np.float64)
+    scale = float(similitude_scale) if similitude_scale and similitude_scale > 0 else 1.0
+    effective_rate = rate_in * math.sqrt(scale)
+    if rate_out is None or rate_out <= 0:
+        return data, 1.0 / effective_rate
+    up, down = rational_factors(effective_rate, rate_out)
+    if up == down:
+        return data, 1.0 / effective_rate
+    from scipy.signal import resample_poly
+    samples = resample_poly(data, up, down, window=filter_design(up, down), padtype="line")
+    return samples, down / (up * effective_rate)
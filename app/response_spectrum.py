@@ -0,0 +1,181 @@
+# response_spectrum.py
+# Elastic response spectra for record selection.
+# Oscillator coefficients for every period are computed in one vectorized pass
+# using the exact recursion for piecewise-linear excitation (Nigam-Jennings),
+# each oscillator is then run as a 2nd-order IIR section (sosfilt). Records of
+# the same length and sampling interval share those filters, so a batch of them
+# is stacked and each period is one 2-D filter call along the time axis.
+# Spectra are cached per (record, period grid, damping) in a bounded LRU so a
+# catalog can be ranked against a target spectrum quickly.
+
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+DEFAULT_PERIODS = np.logspace(-2, 1, 120)  # 0.01 s .. 10 s
+DEFAULT_DAMPING = 0.05
+MAX_WORKERS = 4
+BATCH_RECORDS = 64                 # records loaded per wave of batch_response_spectra
+MAX_BATCH_SAMPLES = 1 << 20        # samples per stacked filter call (8 MB)
+MAX_CACHE_ENTRIES = 4096           # one spectrum is ~1 kB on the default grid
+
+_cache = OrderedDict()
+_cache_lock = threading.Lock()
+
+def oscillator_coefficients(periods, dt, damping=DEFAULT_DAMPING):
+    """IIR coefficients (b, a), each of shape (n_periods, 3), mapping ground
+    acceleration to relative displacement of a damped linear oscillator."""
+    w = 2.0 * np.pi / np.asarray(periods, dtype=np.float64)
+    wd = w * np.sqrt(1.0 - damping ** 2)
+    e = np.exp(-damping * w * dt)
+    c, s = np.cos(wd * dt), np.sin(wd * dt)
+
+    # State transition Phi = expm(F*dt) for x = [u, v], F = [[0, 1], [-w^2, -2*z*w]]
+    a11 = e * (c + damping * w / wd * s)
+    a12 = e * s / wd
+    a21 = -w * w * e * s / wd
+    a22 = e * (c - damping * w / wd * s)
+
+    # F^-1 = [[-2z/w, -1/w^2], [1, 0]]; M1 = F^-1 (Phi - I)
+    fi11, fi12 = -2.0 * damping / w, -1.0 / (w * w)
+    m11 = fi11 * (a11 - 1.0) + fi12 * a21
+    m12 = fi11 * a12 + fi12 * (a22 - 1.0)
+    m21 = a11 - 1.0
+    m22 = a12
+    # Input matrix is G = [0, -1], so only the second column of each matrix is needed.
+    # Gamma1 = (M1 - F^-1 Phi + F^-1 M1 / dt) G ; Gamma0 = M1 G - Gamma1
+    g1u = -(m12 - (fi11 * a12 + fi12 * a22) + (fi11 * m12 + fi12 * m22) / dt)
+    g1v = -(m22 - a12 + m12 / dt)
+    g0u = -m12 - g1u
+    g0v = -m22 - g1v
+
+    b = np.stack([g1u,
+                  g0u - a22 * g1u + a12 * g1v,
+                  -a22 * g0u + a12 * g0v], axis=1)
+    a = np.stack([np.ones_like(w), -(a11 + a22), a11 * a22 - a12 * a21], axis=1)
+    return b, a
+
+def response_spectra(accels, dt, periods=DEFAULT_PERIODS, damping=DEFAULT_DAMPING):
+    """Pseudo-spectral acceleration of equal-length records, in the units of accels.
+
+    accels is (n_records, n_samples); returns an (n_records, n_periods) matrix.
+    Each period is a single second-order section filtered over all records (axis=-1)."""
+    from scipy import signal
+    accels = np.atleast_2d(np.asarray(accels, dtype=np.float64))
+    periods = np.asarray(periods, dtype=np.float64)
+    b, a = oscillator_coefficients(periods, dt, damping)
+    sections = np.concatenate([b, a], axis=1)[:, np.newaxis, :]
+    peak_disp = np.empty((accels.shape[0], periods.size))
+    for i in range(periods.size):
+        disp = signal.sosfilt(sections[i], accels, axis=-1)
+        peak_disp[:, i] = np.maximum(disp.max(axis=-1), -disp.min(axis=-1))
+    return (2.0 * np.pi / periods) ** 2 * peak_disp
+
+def response_spectrum(accel, dt, periods=DEFAULT_PERIODS, damping=DEFAULT_DAMPING):
+    """Returns (periods, psa): pseudo-spectral acceleration, in the units of accel."""
+    periods = np.asarray(periods, dtype=np.float64)
+    return periods, response_spectra(np.asarray(accel, dtype=np.float64)[np.newaxis, :], dt, periods, damping)[0]
+
+def _cache_key(key, periods, damping):
+    return (key, float(damping), periods.tobytes())
+
+def _cache_get(full_key):
+    """Cached spectrum or None; call with _cache_lock held."""
+    psa = _cache.get(full_key)
+    if psa is not None:
+        _cache.move_to_end(full_key)
+    return psa
+
+def _cache_put(full_key, psa):
+    """Stores a spectrum, evicting the least recently used; call with _cache_lock held."""
+    _cache[full_key] = psa
+    _cache.move_to_end(full_key)
+    if len(_cache) > MAX_CACHE_ENTRIES:
+        _cache.popitem(last=False)
+
+def cached_response_spectrum(key, accel_fn, periods=DEFAULT_PERIODS, damping=DEFAULT_DAMPING):
+    """Response spectrum of the record identified by key; accel_fn() -> (accel, dt) is
+    only called on a cache miss."""
+    periods = np.asarray(periods, dtype=np.float64)
+    full_key = _cache_key(key, periods, damping)
+    with _cache_lock:
+        psa = _cache_get(full_key)
+    if psa is not None:
+        return periods, psa
+    accel, dt = accel_fn()
+    _, psa = response_spectrum(accel, dt, periods, damping)
+    with _cache_lock:
+        _cache_put(full_key, psa)
+    return periods, psa
+
+def _batches(loaded):
+    """Groups (row, accel, dt) by record shape; yields (rows, stacked accels, dt) chunks."""
+    groups = {}
+    for row, accel, dt in loaded:
+        groups.setdefault((accel.size, float(dt)), []).append((row, accel))
+    for (size, dt), members in groups.items():
+        step = max(1, MAX_BATCH_SAMPLES // max(size, 1))
+        for lo in range(0, len(members), step):
+            chunk = members[lo:lo + step]
+            yield [row for row, _ in chunk], np.vstack([accel for _, accel in chunk]), dt
+
+def batch_response_spectra(records, periods=DEFAULT_PERIODS, damping=DEFAULT_DAMPING,
+                           max_workers=MAX_WORKERS):
+    """Computes (or fetches from cache) the spectra of many records.
+
+    records is a list of (key, accel_fn) pairs; returns an (n_records, n_periods) matrix
+    with NaN rows for records that failed. Misses are loaded in a thread pool, BATCH_RECORDS
+    at a time, and records of equal length and rate are filtered as one stack."""
+    periods = np.asarray(periods, dtype=np.float64)
+    matrix = np.full((len(records), periods.size), np.nan)
+    keys = [_cache_key(key, periods, damping) for key, _ in records]
+    with _cache_lock:
+        missing = []
+        for row, full_key in enumerate(keys):
+            psa = _cache_get(full_key)
+            if psa is not None:
+                matrix[row] = psa
+            else:
+                missing.append(row)
+
+    def load(row):
+        key, accel_fn = records[row]
+        try:
+            accel, dt = accel_fn()
+            return row, np.asarray(accel, dtype=np.float64), dt
+        except Exception as e:
+            print(f"ResponseSpectrum: Error computing {key}: {e}")
+            return None
+
+    with ThreadPoolExecutor(max_workers=max_workers) as pool:
+        for lo in range(0, len(missing), BATCH_RECORDS):
+            loaded = [item for item in pool.map(load, missing[lo:lo + BATCH_RECORDS]) if item is not None]
+            for rows, accels, dt in _batches(loaded):
+                psa = response_spectra(accels, dt, periods, damping)
+                matrix[rows] = psa
+                with _cache_lock:
+                    for row, values in zip(rows, psa):
+                        _cache_put(keys[row], values)
+    return matrix
+
+def rank_against_target(psa_matrix, periods, target_periods, target_psa, scale=True):
+    """Ranks records by log-space RMS misfit to a target spectrum.
+
+    The target is interpolated (log-log) onto the spectrum periods. With scale=True
+    each record gets the amplitude factor that minimizes its misfit. Returns
+    (order, misfits, scale_factors), order being best-first indices into the matrix."""
+    log_target = np.interp(np.log(periods), np.log(target_periods), np.log(target_psa))
+    with np.errstate(divide="ignore", invalid="ignore"):
+        residual = log_target[np.newaxis, :] - np.log(psa_matrix)
+    log_scale = np.nanmean(residual, axis=1) if scale else np.zeros(psa_matrix.shape[0])
+    misfits = np.sqrt(np.nanmean((residual - log_scale[:, np.newaxis]) ** 2, axis=1))
+    misfits[~np.isfinite(misfits)] = np.inf
+    order = np.argsort(misfits, kind="stable")
+    return order, misfits, np.exp(log_scale)
+
+def clear_cache():
+    """Drops every cached response spectrum."""
+    with _cache_lock:
+        _cache.clear()
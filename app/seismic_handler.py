@@ -5,21 +5,77 @@
 
 import dearpygui.dearpygui as dpg
 import numpy as np
-from obspy import read
 import os
 import threading
+import time
+from concurrent.futures import CancelledError
 
 import app_state
+import backlash
+import batch_export
+import catalog_index
+import drive_correction
+import excitation
+import instrumentation
+import kinematics
+import motion_limits
+import performance_envelope
+import playback_cache
+import position_loop
+import resampling
+import session_log
+import spectrum_handler
+import strong_motion
+from serial_handler import IDENTIFICATION_RATE_HZ, release_emergency_stop, send_command, set_telemetry_rate
 
 RECORDS_FOLDER_NAME = "sismic_records"
+CORRECTION_SETTLE_S = 0.5   # wait after each correction run before using its telemetry
+
+# ObsPy and scipy.signal take over a second to import, so they are loaded on
+# first use (or ahead of time by warm_up) instead of at application startup.
+_warm_up_lock = threading.Lock()
+_warm_up_started = False
+
+def _set_viewer_status(message: str) -> None:
+    """Updates the shared playback status message and marks it dirty."""
+    with app_state.data_lock:
+        app_state.viewer_playback_status = message
+        app_state.viewer_playback_status_dirty = True
+    print(f"Viewer: {message}")
 
 def get_records_folder_path():
     """Gets the absolute path to the sismic_records folder."""
     script_dir = os.path.dirname(os.path.abspath(__file__))
     return os.path.join(script_dir, RECORDS_FOLDER_NAME)
 
+def warm_up():
+    """Imports the processing stack in a background thread, once.
+
+    Called when the trace viewer is first shown so loading and filtering traces
+    do not pay the import cost; the GUI stays responsive meanwhile."""
+    global _warm_up_started
+    with _warm_up_lock:
+        if _warm_up_started:
+            return
+        _warm_up_started = True
+    threading.Thread(target=_warm_up_worker, daemon=True).start()
+
+def _warm_up_worker():
+    start = time.perf_counter()
+    try:
+        import obspy  # noqa: F401
+        import obspy.io.mseed.core  # noqa: F401  (MiniSEED reader used by read())
+        import obspy.signal.filter  # noqa: F401  (used by Trace.filter)
+        import scipy.fft  # noqa: F401
+        import scipy.signal  # noqa: F401
+    except ImportError as e:
+        print(f"Viewer: Warm-up import failed: {e}")
+        return
+    print(f"Viewer: Processing stack loaded in {time.perf_counter() - start:.2f} s.")
+
 def load_traces_from_folder_thread():
     """Loads all seismic data from the records folder into the viewer's state variables."""
+    from obspy import read
     print("Viewer: Starting data load...")
     folder_path = get_records_folder_path()
     
@@ -27,9 +83,10 @@ def load_traces_from_folder_thread():
     app_state.viewer_seismic_files.clear()
     app_state.viewer_all_traces.clear()
     app_state.viewer_selected_trace_index = None
+    app_state.viewer_visible_indices = None
 
     try:
-        files = [f for f in os.listdir(folder_path) if f.lower().endswith(('.mseed', '.msd', '.miniseed'))]
+        files = sorted(os.path.basename(p) for p in catalog_index.list_record_files(folder_path))
         if not files:
             print("Viewer: No seismic files found.")
             return
@@ -67,6 +124,69 @@ def load_traces_from_folder_thread():
         # Signal the GUI thread that it needs to redraw the file list
         app_state.viewer_data_dirty.set()
         print("Viewer: Data load finished.")
+        spectrum_handler.clear_cache()
+        spectrum_handler.precompute_catalog_spectra()
+        playback_cache.clear()
+        drive_correction.clear()        # drives were tuned against the records as previously loaded
+        try:
+            catalog_index.update_catalog(folder_path)
+        except Exception as e:
+            print(f"Viewer: Error updating catalog index: {e}")
+
+def query_catalog(filters=None, order_by=None, descending=False):
+    """Runs a catalog query and returns the matching loaded traces' global indices in order."""
+    rows = catalog_index.query_traces(get_records_folder_path(), filters, order_by, descending)
+    by_key = {(t['file_path'], t['id'], t['starttime']): t['global_index'] for t in app_state.viewer_all_traces}
+    indices = []
+    for row in rows:
+        index = by_key.get((row['file_path'], row['trace_id'], row['starttime']))
+        if index is not None:
+            indices.append(index)
+    return indices
+
+def export_visible_traces(write_csv=False):
+    """Exports the traces in the current list (query result, all loaded traces, or the
+    whole records folder if nothing is loaded) as table-ready trajectories."""
+    with app_state.data_lock:
+        amplitude = app_state.viewer_playback_amplitude
+        command_rate = app_state.viewer_command_rate
+        similitude_scale = app_state.viewer_similitude_scale
+        compensate = app_state.backlash_compensation
+        trim_padding = playback_cache.trim_settings()
+        indices = app_state.viewer_visible_indices
+        traces = app_state.viewer_all_traces
+        chosen = [traces[i] for i in indices] if indices is not None else list(traces)
+
+    model = backlash.load_model() if compensate else None
+    if chosen:
+        selection = {}
+        for trace_info in chosen:
+            selection.setdefault(trace_info['file_path'], set()).add((trace_info['id'], trace_info['starttime']))
+    else:
+        selection = {path: None for path in catalog_index.list_record_files(get_records_folder_path())}
+    if not selection:
+        _set_viewer_status("Export: No records to export.")
+        return
+
+    _set_viewer_status(f"Exporting {len(chosen) or 'all'} traces from {len(selection)} files...")
+    try:
+        summary = batch_export.export_traces(selection, amplitude, command_rate, similitude_scale,
+                                               model['width'] if model else 0.0, trim_padding, write_csv=write_csv)
+    except Exception as e:
+        _set_viewer_status(f"Export error: {e}")
+        return
+    _set_viewer_status(f"Exported {summary['traces']} traces in {summary['elapsed_s']:.1f} s "
+                       f"({summary['traces_per_s']:.1f} traces/s, {summary['bytes'] / 1e6:.1f} MB) "
+                       f"to {os.path.basename(summary['out_dir'])}"
+                       + (f", {len(summary['errors'])} errors" if summary['errors'] else ""))
+
+def strong_motion_span(trace_info):
+    """(start, end) seconds of the window playback keeps with the current trim
+    settings, or None when whole records are played."""
+    trim_padding = playback_cache.trim_settings()
+    if trim_padding is None:
+        return None
+    return strong_motion.trace_windows([trace_info['obspy_trace']], *trim_padding)[0]
 
 def process_selected_trace():
     """Processes the currently selected trace to get acceleration and displays it."""
@@ -86,8 +206,10 @@ def process_selected_trace():
     #print("Viewer: Detrend, filter, and differentiation complete.")
     # Visualization in a new window
     accel_data, times = trace_data.data, trace_data.times()
-    app_state.expected_wave_data = trace_data.tolist()
-    app_state.expected_wave_time = times.tolist()
+    with app_state.data_lock:
+        app_state.expected_wave_data.clear()
+        app_state.expected_wave_data.extend(zip(times.tolist(), accel_data.tolist()))
+        app_state.expected_wave_time = times.tolist()
     print("Viewer: Acceleration data ready.")
     # if dpg.does_item_exist("acceleration_window"):
     #     dpg.delete_item("acceleration_window")
@@ -109,4 +231,314 @@ def trace_filters(trace): ###### trace filte example function
     fmin, fmax = 0.1, 20
     trace.filter('bandpass', freqmin=fmin, freqmax=fmax, corners=4, zerophase=True)
     trace.differentiate()
-    return trace
\ No newline at end of file
+    return trace
+
+def _prepare_trace_for_playback(trace, amplitude, command_rate=0.0, similitude_scale=1.0, backlash_width=0.0,
+                                trim_padding=None, cancel_event=None):
+    """Generates the displacement sequence and sampling interval for playback.
+
+    With trim_padding = (pre, post) seconds only the strong-motion window is kept,
+    before integration so pre-event noise does not drift the displacement.
+    The displacement is resampled to command_rate (Hz; 0 keeps the record's rate)
+    with time compressed by sqrt(similitude_scale), and pre-compensated for a
+    drive backlash of backlash_width steps. cancel_event lets an abandoned
+    speculative preparation stop between stages."""
+    def check_cancelled():
+        if cancel_event is not None and cancel_event.is_set():
+            raise CancelledError()
+
+    record_interval = getattr(trace.stats, "delta", None)
+    if record_interval is None or not np.isfinite(record_interval) or record_interval <= 0:
+        record_interval = 0.01
+
+    working_trace = trace.copy()
+    working_trace.detrend("linear")
+    if trim_padding is not None and working_trace.stats.npts:
+        # Same window as the catalog: found on the record's band-passed acceleration
+        _, acc = strong_motion.record_acceleration(trace.data, record_interval)
+        start, end = strong_motion.strong_motion_window(acc, record_interval, *trim_padding)
+        working_trace.data = working_trace.data[start:end].copy()
+    working_trace.taper(max_percentage=0.05, type="hann")
+    check_cancelled()
+    working_trace.integrate(method='cumtrapz')
+    working_trace.integrate(method='cumtrapz')
+    check_cancelled()
+
+    data = working_trace.data.astype(np.float64)
+    if data.size == 0:
+        raise ValueError("Trace contains no samples.")
+
+    data, sample_interval = resampling.resample(data, 1.0 / record_interval, command_rate, similitude_scale)
+    check_cancelled()
+
+    max_abs = np.max(np.abs(data))
+    if not np.isfinite(max_abs) or max_abs == 0:
+        raise ValueError("Trace amplitude is zero.")
+
+    amplitude = max(int(abs(amplitude)), 1)
+    scaled = np.clip((data / max_abs) * amplitude, -amplitude, amplitude).astype(int)
+    if backlash_width > 0:
+        scaled = np.rint(backlash.precompensate(scaled, backlash_width)).astype(int)
+    return scaled, float(sample_interval)
+
+def prefetch_traces(indices):
+    """Speculatively prepares the traces at the given global indices for playback."""
+    traces = [app_state.viewer_all_traces[i] for i in indices if 0 <= i < len(app_state.viewer_all_traces)]
+    playback_cache.prefetch(traces)
+
+def _claim_selected_trace():
+    """Checks the table can play the selected trace and marks it running.
+
+    Returns the trace info, or None (with the reason in the status line)."""
+    if not (app_state.ser and app_state.ser.is_open):
+        _set_viewer_status("Error: Connect to the table first.")
+        return None
+
+    with app_state.data_lock:
+        selected_index = app_state.viewer_selected_trace_index
+        is_running = app_state.sismo_running
+        wave_running = app_state.wave_running
+        trace_info = None
+        if (selected_index is not None and
+                0 <= selected_index < len(app_state.viewer_all_traces)):
+            trace_info = app_state.viewer_all_traces[selected_index]
+
+    if trace_info is None:
+        _set_viewer_status("Error: Select a trace before playing.")
+        return None
+
+    if is_running:
+        _set_viewer_status("Playback already running.")
+        return None
+
+    if wave_running:
+        _set_viewer_status("Error: Stop the sine wave generator before playback.")
+        return None
+
+    with app_state.data_lock:
+        app_state.sismo_running = True
+    release_emergency_stop()
+    return trace_info
+
+def start_playback():
+    """Starts a background thread to play the selected seismic trace on the motor."""
+    trace_info = _claim_selected_trace()
+    if trace_info is None:
+        return
+    _set_viewer_status(f"Preparing {trace_info['id']} for playback...")
+    threading.Thread(target=_playback_worker, args=(trace_info,), daemon=True).start()
+
+def start_drive_correction(max_iterations):
+    """Runs iterative drive correction on the selected trace in a background thread."""
+    trace_info = _claim_selected_trace()
+    if trace_info is None:
+        return
+    _set_viewer_status(f"Preparing {trace_info['id']} for drive correction...")
+    threading.Thread(target=_drive_correction_worker, args=(trace_info, max(1, int(max_iterations))),
+                     daemon=True).start()
+
+def _drive_correction_worker(trace_info, max_iterations):
+    """Plays the trace repeatedly, updating the drive from the captured response.
+
+    The drive with the lowest measured tracking error is kept and used by later
+    playbacks of the same trace."""
+    key = playback_cache.cache_key(trace_info)
+    best = None
+    # Identification wants the highest rate the link carries; the monitoring rate is restored afterwards
+    set_telemetry_rate(IDENTIFICATION_RATE_HZ, remember=False)
+    try:
+        reference, sample_interval = playback_cache.get_prepared(trace_info)
+        corrector = drive_correction.DriveCorrector(reference, sample_interval)
+        for iteration in range(1, max_iterations + 1):
+            played = corrector.drive_positions()
+            with app_state.data_lock:
+                app_state.telemetry_capture = []
+                dropped_before = app_state.telemetry_dropped_samples
+            completed = stream_positions(played, sample_interval,
+                                         f"{trace_info['file_name']} (iteration {iteration}/{max_iterations})",
+                                         lambda: app_state.sismo_running)
+            time.sleep(CORRECTION_SETTLE_S)   # let the tail of the telemetry arrive
+            with app_state.data_lock:
+                captured, app_state.telemetry_capture = app_state.telemetry_capture, None
+                dropped = app_state.telemetry_dropped_samples - dropped_before
+            if not completed:
+                return
+            if dropped:
+                print(f"Viewer: Correction iteration {iteration}: the device dropped {dropped} encoder samples.")
+
+            times, angles = zip(*captured) if captured else ((), ())
+            response = drive_correction.response_on_grid(times, angles, len(reference), sample_interval)
+            ratio = corrector.update(response)
+            if best is None or ratio < best:
+                best = ratio
+                drive_correction.store_corrected(key, played, sample_interval, ratio)
+            print(f"Viewer: Correction iteration {iteration}: tracking error {ratio:.1%} of reference RMS.")
+            if corrector.converged():
+                break
+        _set_viewer_status(f"Drive correction done: error {corrector.history[0]:.1%} -> {best:.1%} "
+                           f"after {len(corrector.history)} runs.")
+    except Exception as exc:
+        _set_viewer_status(f"Error during drive correction: {exc}")
+    finally:
+        with app_state.data_lock:
+            app_state.telemetry_capture = None
+            app_state.sismo_running = False
+        set_telemetry_rate(app_state.telemetry_rate_hz, remember=False)
+
+def _playback_worker(trace_info):
+    """Worker routine that streams the processed trace to the motor."""
+    try:
+        try:
+            scaled_data, sample_interval = playback_cache.get_prepared(trace_info)
+        except Exception as exc:
+            _set_viewer_status(f"Error: {exc}")
+            send_command("m0")
+            return
+        label = trace_info['file_name']
+        corrected = drive_correction.get_corrected(playback_cache.cache_key(trace_info))
+        if corrected is not None:
+            scaled_data, sample_interval = corrected[0], corrected[1]
+            label += " (corrected drive)"
+        stream_positions(scaled_data, sample_interval, label, lambda: app_state.sismo_running)
+    finally:
+        with app_state.data_lock:
+            app_state.sismo_running = False
+
+def stream_positions(positions, sample_interval, label, keep_running):
+    """Streams position commands to the motor at one command per sample_interval.
+
+    Shared by trace playback and excitation signals. Resets the live plots,
+    applies the (calibration-clamped) speed and acceleration, then sends every
+    position against absolute deadlines so sleep overshoot and send time do not
+    accumulate into drift. keep_running() is polled before each command.
+    Always ends with the table commanded back to zero. With the closed loop
+    enabled, a bounded encoder-based correction is added to each target.
+    Trajectories outside the mapped operating envelope are refused when
+    app_state.envelope_enforce is set. Returns True if every sample was sent."""
+    total_samples = len(positions)
+    if total_samples == 0:
+        _set_viewer_status(f"Error: {label} produced no samples.")
+        send_command("m0")
+        return False
+
+    sample_interval = max(sample_interval, 0.001)
+
+    speed = acceleration = None
+    if dpg.does_item_exist("speed_input") and dpg.does_item_exist("accel_input"):
+        acceleration = dpg.get_value('accel_input')
+        speed, limited = motion_limits.clamp_speed(dpg.get_value('speed_input'), acceleration)
+        if limited:
+            print(f"Viewer: Speed limited to {speed} Hz by calibration table at a={acceleration}.")
+    if app_state.envelope_enforce:
+        violations = performance_envelope.check_trajectory(positions, sample_interval, speed, acceleration)
+        if violations:
+            _set_viewer_status(f"Rejected {label}: outside the mapped table envelope: {'; '.join(violations)}.")
+            return False
+
+    with app_state.data_lock:
+        app_state.expected_wave_data.clear()
+        app_state.x_data.clear()
+        app_state.y_data.clear()
+        app_state.velocity_data.clear()
+        app_state.acceleration_data.clear()
+        app_state.target_acceleration_data.clear()
+        app_state.plot_start_time = time.monotonic()
+    target_acceleration = kinematics.target_acceleration(positions, sample_interval).tolist()
+
+    if speed is not None:
+        send_command(f"s{speed}")
+        send_command(f"a{acceleration}")
+
+    corrector = position_loop.from_settings(sample_interval)
+    with app_state.data_lock:
+        loop_requested = app_state.position_loop_enabled
+    if loop_requested and corrector is None:
+        print("Viewer: Closed loop skipped, no recent encoder telemetry.")
+    _set_viewer_status(f"Playing {total_samples} samples from {label}"
+                       + (" (closed loop)..." if corrector is not None else "..."))
+
+    try:
+        start = time.perf_counter()
+        for index, raw_position in enumerate(positions):
+            if not keep_running():
+                _set_viewer_status("Playback stopped by user.")
+                return False
+
+            deadline = start + index * sample_interval
+            delay = deadline - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+
+            position = int(raw_position)
+            if corrector is not None:
+                correction = corrector.update(position, app_state.latest_angle, app_state.latest_angle_time)
+                send_command(f"m{position + correction}", stream=True)
+                if session_log.recorder.recording and corrector.errors:
+                    now = time.monotonic()
+                    session_log.recorder.record(session_log.KIND_TRACKING_ERROR, now, corrector.errors[-1])
+                    session_log.recorder.record(session_log.KIND_CORRECTION, now, corrector.efforts[-1])
+            else:
+                send_command(f"m{position}", stream=True)
+
+            lateness = time.perf_counter() - deadline
+            instrumentation.record("playback.lateness", lateness * 1e9)
+            if lateness > sample_interval:
+                instrumentation.count("playback.late_commands")
+
+            current_time = time.monotonic() - app_state.plot_start_time
+            with instrumentation.locked(app_state.data_lock, "data_lock"):
+                app_state.expected_wave_data.append((current_time, position))
+                app_state.target_acceleration_data.append((current_time, target_acceleration[index]))
+
+    except Exception as exc:
+        _set_viewer_status(f"Error during playback: {exc}")
+        return False
+    else:
+        if corrector is not None:
+            rms, peak, effort = corrector.summary()
+            _set_viewer_status(f"Playback finished. Closed loop: tracking error {rms:.1f} steps RMS "
+                               f"({peak:.0f} max), correction up to {effort:.0f} steps.")
+        else:
+            _set_viewer_status("Playback finished.")
+        return True
+    finally:
+        send_command("m0")
+
+def start_excitation(kind, amplitude, duration, rate, **params):
+    """Synthesizes (or reuses) an excitation signal and streams it to the motor in a background thread."""
+    if not (app_state.ser and app_state.ser.is_open):
+        _set_viewer_status("Error: Connect to the table first.")
+        return False
+    with app_state.data_lock:
+        if app_state.sismo_running or app_state.wave_running:
+            busy = True
+        else:
+            busy = False
+            app_state.wave_running = True
+    if busy:
+        _set_viewer_status("Error: Stop the running playback first.")
+        return False
+    release_emergency_stop()
+    threading.Thread(target=_excitation_worker, args=(kind, amplitude, duration, rate, params), daemon=True).start()
+    return True
+
+def _excitation_worker(kind, amplitude, duration, rate, params):
+    try:
+        try:
+            positions, sample_interval = excitation.get_excitation(kind, amplitude, duration, rate, **params)
+        except ValueError as exc:
+            _set_viewer_status(f"Error: {exc}")
+            return
+        stream_positions(positions, sample_interval, kind, lambda: app_state.wave_running)
+    finally:
+        with app_state.data_lock:
+            app_state.wave_running = False
+
+def stop_playback():
+    """Signals the playback thread to stop streaming commands."""
+    with app_state.data_lock:
+        was_running = app_state.sismo_running
+        app_state.sismo_running = False
+
+    if was_running:
+        _set_viewer_status("Stopping playback...")
@@ -3,11 +3,63 @@
 
 import serial
 import serial.tools.list_ports
+import threading
 import time
-import math
-import dearpygui.dearpygui as dpg
 
 import app_state # Import shared state
+import instrumentation
+import kinematics
+import log_ring
+import session_log
+from clock_sync import ClockSync
+
+# Maps the firmware's micros() stamps onto the host monotonic clock
+clock_sync = ClockSync()
+
+# After the first heartbeat the firmware halts a moving table when no command
+# arrives for 500 ms; the host sends 'h' whenever the link has been idle this long.
+HEARTBEAT_INTERVAL_S = 0.1
+
+# The firmware samples the encoder at 1 kHz and averages down to the requested rate.
+# Requests are capped to what the link carries: a "<micros>,<deg>" line is about
+# TELEMETRY_LINE_BYTES, 10 bits per byte, and only part of the link is budgeted.
+TELEMETRY_RATES_HZ = (100, 250, 500, 1000)
+IDENTIFICATION_RATE_HZ = 1000
+TELEMETRY_LINE_BYTES = 20
+TELEMETRY_LINK_SHARE = 0.6
+
+# With instrumentation enabled the firmware counters are polled ('q') this often
+DEVICE_STATS_INTERVAL_S = 1.0
+
+# Every write holds _write_lock for one line at most this long (pyserial write_timeout),
+# so an emergency stop waits at most this for the port
+WRITE_TIMEOUT_S = 0.1
+STOP_LOCK_TIMEOUT_S = 0.5
+
+_write_lock = threading.Lock()
+_stop_pending = threading.Event()   # set while an emergency stop owns the port: other writes are skipped
+_last_write = 0.0
+_stop_sent_ns = None            # perf_counter_ns of the last 'x', until its acknowledgement
+_commands_sent = 0              # host side of the commands/s comparison with the device
+_last_stats = (0.0, 0)          # (monotonic time, _commands_sent) at the previous stats line
+
+def _write(data):
+    """Writes one line; returns False (nothing written) while an emergency stop owns the port."""
+    global _last_write
+    if _stop_pending.is_set():
+        return False
+    with _write_lock:
+        if _stop_pending.is_set():
+            return False
+        app_state.ser.write(data)
+        _last_write = time.monotonic()
+    return True
+
+def _set_stop_status(message):
+    with app_state.data_lock:
+        app_state.stop_status = message
+        app_state.stop_status_dirty = True
+    log_ring.log_message(log_ring.KIND_INFO, message)
 
 def find_serial_ports():
     """Returns a list of available COM ports."""
@@ -19,10 +71,11 @@ def connect_serial(port, baud):
     if port == "No Ports Found":
         return False, "No serial ports available."
     try:
-        app_state.ser = serial.Serial(port, int(baud), timeout=1)
-        with app_state.data_lock:
-            app_state.log_recv.append(f"Conectado a {port} a {baud} baud.")
-            app_state.log_dirty = True
+        app_state.ser = serial.Serial(port, int(baud), timeout=1, write_timeout=WRITE_TIMEOUT_S)
+        app_state.serial_baud = int(baud)
+        clock_sync.reset()
+        log_ring.log_message(log_ring.KIND_INFO, f"Conectado a {port} a {baud} baud.")
+        set_telemetry_rate(app_state.telemetry_rate_hz, remember=False)
         return True, f"Conectado a {port}"
     except serial.SerialException as e:
         app_state.ser = None
@@ -34,30 +87,191 @@ def disconnect_serial():
     if app_state.ser and app_state.ser.is_open:
         app_state.ser.close()
         app_state.ser = None # Ensure the object is cleared
-        with app_state.data_lock:
-            app_state.log_recv.append("Desconectado.")
-            app_state.log_dirty = True
+        log_ring.log_message(log_ring.KIND_INFO, "Desconectado.")
     print("Serial connection closed.")
 
 
-def send_command(command):
-    """Sends a command to the serial port if it is connected."""
+def send_command(command, stream=False):
+    """Sends a command to the serial port if it is connected.
+
+    Motion commands are dropped while an emergency stop is latched. stream=True
+    marks one command of a streamed trajectory: it is logged to the motion ring
+    instead of the operator's message ring."""
+    ring = log_ring.motion if stream else log_ring.messages
+    if app_state.emergency_stop_latched and command.startswith('m'):
+        ring.append(log_ring.KIND_SEND_ERROR, f"SKIPPED (emergency stop): {command}")
+        return
+    global _commands_sent
     if app_state.ser and app_state.ser.is_open:
         try:
             full_command = command + '\n'
-            app_state.ser.write(full_command.encode("utf-8"))
-            with app_state.data_lock:
-                app_state.log_sent.append(f"[{time.strftime('%H:%M:%S')}] >> {command}")
-                app_state.log_dirty = True
+            with instrumentation.span("serial.send_command"):
+                written = _write(full_command.encode("utf-8"))
+            if not written:
+                ring.append(log_ring.KIND_SEND_ERROR, f"SKIPPED (emergency stop): {command}")
+                return
+            _commands_sent += 1
+            if session_log.recorder.recording and command.startswith('m'):
+                try:
+                    session_log.recorder.record(session_log.KIND_COMMAND, time.monotonic(), int(command[1:]))
+                except ValueError:
+                    pass
+            ring.append(log_ring.KIND_SENT, command)
         except serial.SerialException as e:
-            with app_state.data_lock:
-                app_state.log_sent.append(f"ERROR: {e}")
-                app_state.log_dirty = True
+            log_ring.log_message(log_ring.KIND_SEND_ERROR, f"ERROR: {e}")
     else:
+        log_ring.log_message(log_ring.KIND_SEND_ERROR, f"SKIPPED (not connected): {command}")
+
+
+def max_telemetry_rate(baud):
+    """Highest rate in TELEMETRY_RATES_HZ whose lines fit in the budgeted share of the link."""
+    budget = baud / 10 / TELEMETRY_LINE_BYTES * TELEMETRY_LINK_SHARE
+    fitting = [hz for hz in TELEMETRY_RATES_HZ if hz <= budget]
+    return fitting[-1] if fitting else TELEMETRY_RATES_HZ[0]
+
+def set_telemetry_rate(hz, remember=True):
+    """Asks the firmware for encoder telemetry at hz (averaged on the device), capped
+    to what the connected baud rate carries. Returns the rate requested.
+
+    remember=False changes the rate temporarily without replacing the operator's choice."""
+    hz = max(1, min(int(hz), IDENTIFICATION_RATE_HZ))
+    if remember:
         with app_state.data_lock:
-            app_state.log_sent.append(f"SKIPPED (not connected): {command}")
-            app_state.log_dirty = True
+            app_state.telemetry_rate_hz = hz
+    limit = max_telemetry_rate(app_state.serial_baud)
+    if hz > limit:
+        log_ring.log_message(log_ring.KIND_INFO, f"Telemetry {hz} Hz does not fit {app_state.serial_baud} baud: "
+                                                 f"using {limit} Hz.")
+        hz = limit
+    send_command(f"r{hz}")
+    return hz
+
+def emergency_stop():
+    """Halts the table by the shortest path available.
 
+    Streaming loops are stopped and motion commands are blocked. Other writers
+    are shut out first, then the stop waits for the line in flight (bounded by
+    WRITE_TIMEOUT_S) so 'x' never lands inside another command. Output still
+    queued in the driver is discarded and 'x' is written ahead of anything else.
+    The firmware stops the stepper without deceleration and answers "!x,...".
+    The round trip is reported as the stop latency."""
+    global _stop_sent_ns, _last_write
+    with app_state.data_lock:
+        app_state.sismo_running = False
+        app_state.wave_running = False
+        app_state.emergency_stop_latched = True
+    ser = app_state.ser
+    if not (ser and ser.is_open):
+        _set_stop_status("EMERGENCY STOP: not connected.")
+        return False
+    _stop_pending.set()
+    if not _write_lock.acquire(timeout=STOP_LOCK_TIMEOUT_S):
+        # Writes stay blocked, so the armed firmware watchdog halts a moving table
+        _set_stop_status("EMERGENCY STOP: serial port busy, stop not sent (watchdog will halt the table).")
+        return False
+    try:
+        ser.reset_output_buffer()
+        _stop_sent_ns = time.perf_counter_ns()
+        # The leading newline ends a command the driver had partly sent before the reset
+        ser.write(b"\nx\n")
+        ser.flush()
+        _last_write = time.monotonic()
+    except serial.SerialException as e:
+        _set_stop_status(f"EMERGENCY STOP write failed: {e}")
+        return False
+    finally:
+        _write_lock.release()
+        _stop_pending.clear()
+    _set_stop_status("EMERGENCY STOP sent, waiting for the table...")
+    return True
+
+def release_emergency_stop():
+    """Clears the host and firmware stop latches so motion commands are accepted again."""
+    with app_state.data_lock:
+        latched = app_state.emergency_stop_latched
+        app_state.emergency_stop_latched = False
+    _stop_pending.clear()     # left set when a stop could not get the port
+    if app_state.ser and app_state.ser.is_open:
+        send_command("c")
+    if latched:
+        _set_stop_status("Emergency stop released.")
+
+def heartbeat_thread():
+    """Keeps the firmware watchdog fed while the link is otherwise idle, and polls
+    the firmware counters while instrumentation is enabled."""
+    last_poll = 0.0
+    while app_state.app_running:
+        ser = app_state.ser
+        now = time.monotonic()
+        if ser and ser.is_open:
+            try:
+                if instrumentation.ENABLED and now - last_poll >= DEVICE_STATS_INTERVAL_S:
+                    _write(b"q\n")
+                    last_poll = now
+                elif now - _last_write >= HEARTBEAT_INTERVAL_S:
+                    _write(b"h\n")
+            except (serial.SerialException, AttributeError):   # disconnected meanwhile
+                pass
+        time.sleep(HEARTBEAT_INTERVAL_S / 2)
+
+def parse_device_stats(line):
+    """Parses "#q,key=value,..." into {key: int}; malformed fields are skipped."""
+    stats = {}
+    for field in line.split(',')[1:]:
+        key, _, value = field.partition('=')
+        try:
+            stats[key] = int(value)
+        except ValueError:
+            pass
+    return stats
+
+def _handle_device_stats(line):
+    global _last_stats
+    stats = parse_device_stats(line)
+    now = time.monotonic()
+    previous_time, previous_sent = _last_stats
+    _last_stats = (now, _commands_sent)
+    if previous_time:
+        stats['host_cmd'] = round((_commands_sent - previous_sent) / max(now - previous_time, 1e-3))
+    for key, value in stats.items():
+        instrumentation.gauge(f"device.{key}", value)
+    with app_state.data_lock:
+        app_state.device_stats_history.append((now, stats))
+
+def _handle_device_event(line, received_ns):
+    """Lines starting with '!' report stops as "!<reason>,<micros>,<stop us>": reason x
+    acknowledges an emergency stop, w is a watchdog halt. "!d,<micros>,<n>" reports
+    n encoder samples dropped on the device because the link could not keep up."""
+    global _stop_sent_ns
+    fields = line[1:].split(',')
+    if fields[0] == 'x':
+        device_us = fields[2] if len(fields) > 2 else "?"
+        if _stop_sent_ns is None:
+            _set_stop_status(f"Table stopped (device {device_us} us).")
+            return
+        latency_ns = received_ns - _stop_sent_ns
+        _stop_sent_ns = None
+        instrumentation.record("serial.stop_latency", latency_ns)
+        _set_stop_status(f"Table STOPPED: acknowledged in {latency_ns / 1e6:.1f} ms "
+                         f"(device stop {device_us} us).")
+    elif fields[0] == 'd':
+        try:
+            dropped = int(fields[2])
+        except (IndexError, ValueError):
+            return
+        with app_state.data_lock:
+            app_state.telemetry_dropped_samples += dropped
+        instrumentation.count("device.dropped_samples", dropped)
+        log_ring.log_message(log_ring.KIND_INFO, f"Device dropped {dropped} encoder samples: "
+                                                 f"lower the telemetry rate or raise the baud rate.")
+    elif fields[0] == 'w':
+        with app_state.data_lock:
+            app_state.sismo_running = False
+            app_state.wave_running = False
+            app_state.emergency_stop_latched = True
+        _set_stop_status("Table halted by the firmware watchdog: no host commands received.")
+    else:
+        log_ring.log_message(log_ring.KIND_RECEIVED, line)
 
 def read_serial_thread():
     """Background thread to continuously read data from the serial port."""
@@ -68,40 +282,49 @@ def read_serial_thread():
             try:
                 line = app_state.ser.readline().decode("utf-8").strip()
                 if line:
-                    with app_state.data_lock:
-                        app_state.log_recv.append(f"[{time.strftime('%H:%M:%S')}] << {line}")
-                        app_state.log_dirty = True
+                    received_ns = time.perf_counter_ns()
+                    if line[0] == '!':
+                        _handle_device_event(line, received_ns)
+                        continue
+                    if line.startswith('#q'):
+                        _handle_device_stats(line)
+                        continue
                     try:
-                        angle = float(line)
-                        with app_state.data_lock:
-                            if prev_angle is not None:
-                                if prev_angle > 300 and angle < 60: turns += 1
-                                elif prev_angle < 60 and angle > 300: turns -= 1
-                            prev_angle = angle
-                            absolute_angle = (turns * 360) + angle
-                            current_time = time.time() - app_state.plot_start_time
+                        # Telemetry is "<device micros>,<degrees>" (older firmware: "<degrees>")
+                        if ',' in line:
+                            device_us, angle = line.split(',', 1)
+                            sample_time = clock_sync.update(int(device_us), time.monotonic())
+                            angle = float(angle)
+                        else:
+                            angle = float(line)
+                            sample_time = time.monotonic()
+                        if prev_angle is not None:
+                            if prev_angle > 300 and angle < 60: turns += 1
+                            elif prev_angle < 60 and angle > 300: turns -= 1
+                        prev_angle = angle
+                        absolute_angle = (turns * 360) + angle
+                        app_state.latest_angle_time = time.monotonic()
+                        app_state.latest_angle = absolute_angle
+                        log_ring.telemetry.append(log_ring.KIND_TELEMETRY, line)
+                        session_log.recorder.record(session_log.KIND_TELEMETRY, sample_time, absolute_angle)
+                        if app_state.replay_running:
+                            continue
+                        with instrumentation.locked(app_state.data_lock, "data_lock"):
+                            current_time = sample_time - app_state.plot_start_time
                             app_state.x_data.append(current_time)
                             app_state.y_data.append(absolute_angle)
+                            kinematics.feed(current_time, absolute_angle)
+                            if app_state.telemetry_capture is not None:
+                                app_state.telemetry_capture.append((current_time, absolute_angle))
+                            if instrumentation.ENABLED and app_state.telemetry_pending_since_ns is None:
+                                app_state.telemetry_pending_since_ns = received_ns
                             if len(app_state.x_data) > app_state.max_points:
                                 app_state.x_data.pop(0)
                                 app_state.y_data.pop(0)
                     except ValueError:
-                        pass
+                        # Not telemetry: firmware messages go to the console
+                        log_ring.log_message(log_ring.KIND_RECEIVED, line)
             except (serial.SerialException, UnicodeDecodeError):
                 time.sleep(0.5)
         else:
             time.sleep(0.5)
-
-def wave_generator_thread():
-    """Background thread to generate a sine wave and send motor commands."""
-    amplitude = dpg.get_value("amplitude_slider")
-    frequency = dpg.get_value("frequency_slider")
-    start_time = time.time()
-    
-    while app_state.wave_running:
-        elapsed_time = time.time() - start_time
-        target_pos = amplitude * math.sin(2 * math.pi * frequency * elapsed_time)
-        send_command(f"m{int(target_pos)}")
-        time.sleep(0.02)
-    
-    send_command("m0")
\ No newline at end of file
@@ -0,0 +1,229 @@
+# session_log.py
+# Records telemetry and position commands of a test session to a binary file
+# and replays a recorded session into the live plot consumers.
+# Sessions are stored as fixed-size records (time, kind, value) sorted by time,
+# so a replay opens them as a numpy memmap and seeks with a binary search over
+# the time column instead of scanning the file. Replay runs at 1x, Nx or as fast
+# as possible; replayed telemetry also goes through the live kinematics estimate.
+
+import os
+import threading
+import time
+
+import numpy as np
+
+import app_state
+import kinematics
+
+SESSIONS_FOLDER_NAME = "sessions"
+FILE_MAGIC = b"SHAKESESSION0001"          # 16-byte header, format version included
+RECORD_DTYPE = np.dtype([('t', '<f8'), ('kind', 'u1'), ('value', '<f8')])
+KIND_TELEMETRY = 0                        # value = absolute encoder angle (deg)
+KIND_COMMAND = 1                          # value = commanded position (steps)
+KIND_TRACKING_ERROR = 2                   # value = closed-loop tracking error (steps)
+KIND_CORRECTION = 3                       # value = closed-loop correction added to the target (steps)
+
+FLUSH_INTERVAL_S = 0.5
+REPLAY_TICK_S = 0.02
+REPLAY_MAX_CHUNK = 20000                  # records per tick when replaying as fast as possible
+REPLAY_CONTEXT_RECORDS = 4 * 500          # records fed to the plots after a seek
+REPLAY_STOP_TIMEOUT_S = 1.0
+
+def get_sessions_folder_path():
+    """Gets the absolute path to the folder holding recorded sessions."""
+    return os.path.join(os.path.dirname(os.path.abspath(__file__)), SESSIONS_FOLDER_NAME)
+
+def list_sessions():
+    """Returns the recorded session file names, newest first."""
+    folder = get_sessions_folder_path()
+    if not os.path.isdir(folder):
+        return []
+    return sorted((f for f in os.listdir(folder) if f.endswith(".session")), reverse=True)
+
+class SessionRecorder:
+    """Buffers samples in memory and appends them to the session file in batches."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._buffer = []
+        self._file = None
+        self._start = None
+        self._last_t = 0.0
+        self._stop = None
+        self.path = None
+
+    @property
+    def recording(self):
+        return self._file is not None
+
+    def start(self, name=None):
+        """Opens a new session file; times are stored relative to this call."""
+        self.stop()
+        folder = get_sessions_folder_path()
+        os.makedirs(folder, exist_ok=True)
+        name = name or time.strftime("session-%Y%m%d-%H%M%S.session")
+        path = os.path.join(folder, name)
+        f = open(path, "wb")
+        f.write(FILE_MAGIC)
+        with self._lock:
+            self._buffer = []
+            self._start = time.monotonic()
+            self._last_t = 0.0
+            self._file = f
+            self.path = path
+        self._stop = threading.Event()
+        threading.Thread(target=self._flush_loop, args=(self._stop,), daemon=True).start()
+        print(f"Session: Recording to {path}")
+        return path
+
+    def record(self, kind, host_time, value):
+        """Adds one sample stamped with a host monotonic time."""
+        if self._file is None:
+            return
+        with self._lock:
+            if self._file is not None:
+                self._buffer.append((host_time - self._start, kind, value))
+
+    def _flush(self):
+        with self._lock:
+            batch, self._buffer = self._buffer, []
+            f = self._file
+            if not batch or f is None:
+                return
+            records = np.array(batch, dtype=RECORD_DTYPE)
+            # Telemetry is stamped with the device time mapped to the host clock,
+            # commands with their send time: sort the batch and keep the file
+            # monotonic across batches so the time index stays valid.
+            records.sort(order='t', kind='stable')
+            np.maximum(records['t'], self._last_t, out=records['t'])
+            self._last_t = float(records['t'][-1])
+            records.tofile(f)
+            f.flush()
+
+    def _flush_loop(self, stop):
+        while not stop.wait(FLUSH_INTERVAL_S):
+            self._flush()
+
+    def stop(self):
+        """Writes any buffered samples and closes the session file."""
+        if self._stop is not None:
+            self._stop.set()
+            self._stop = None
+        if self._file is None:
+            return
+        self._flush()
+        with self._lock:
+            f, self._file = self._file, None
+        f.close()
+        print(f"Session: Recording saved to {self.path}")
+
+recorder = SessionRecorder()
+
+def open_session(path):
+    """Memory-maps a session file as a RECORD_DTYPE array (read-only)."""
+    with open(path, "rb") as f:
+        if f.read(len(FILE_MAGIC)) != FILE_MAGIC:
+            raise ValueError(f"{os.path.basename(path)} is not a session recording.")
+    count = (os.path.getsize(path) - len(FILE_MAGIC)) // RECORD_DTYPE.itemsize
+    if count == 0:
+        return np.empty(0, dtype=RECORD_DTYPE)
+    return np.memmap(path, dtype=RECORD_DTYPE, mode="r", offset=len(FILE_MAGIC), shape=(count,))
+
+class SessionReplay:
+    """Feeds a recorded session into app_state's plot buffers from a background thread.
+
+    speed is a real-time factor (1.0, 10.0, ...) or None for as fast as possible."""
+
+    _active = None                      # the replay that owns app_state.replay_running
+
+    def __init__(self, path):
+        self.path = path
+        self.records = open_session(path)
+        self.times = self.records['t']
+        self.duration = float(self.times[-1]) if self.records.size else 0.0
+        self.speed = 1.0
+        self.paused = False
+        self._position = 0
+        self._seek_to = 0.0
+        self._stop = threading.Event()
+        self._thread = None
+
+    def index_of(self, t):
+        """Index of the first record at or after time t (binary search on the time column)."""
+        return int(np.searchsorted(self.times, t, side="left"))
+
+    def seek(self, t):
+        """Requests a jump to session time t; applied by the replay thread on its next tick."""
+        self._seek_to = min(max(float(t), 0.0), self.duration)
+
+    def start(self, speed=1.0):
+        self.speed = speed
+        self._stop.clear()
+        with app_state.data_lock:
+            SessionReplay._active = self
+            app_state.replay_running = True
+            app_state.replay_duration = self.duration
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def set_speed(self, speed):
+        """Changes the replay rate, continuing from the current position."""
+        self.speed = speed
+        self.seek(app_state.replay_position)
+
+    def stop(self, timeout=REPLAY_STOP_TIMEOUT_S):
+        """Stops the replay thread and waits for it, so a new replay never shares the plot buffers."""
+        self._stop.set()
+        if self._thread is not None and self._thread is not threading.current_thread():
+            self._thread.join(timeout)
+
+    def _feed(self, start, end, reset=False):
+        # Only the tail matters: the plot buffers are bounded deques
+        chunk = np.asarray(self.records[max(start, end - REPLAY_CONTEXT_RECORDS):end])
+        telemetry = chunk[chunk['kind'] == KIND_TELEMETRY]
+        commands = chunk[chunk['kind'] == KIND_COMMAND]
+        with app_state.data_lock:
+            if reset:
+                app_state.x_data.clear()
+                app_state.y_data.clear()
+                app_state.expected_wave_data.clear()
+                app_state.velocity_data.clear()
+                app_state.acceleration_data.clear()
+            app_state.x_data.extend(telemetry['t'].tolist())
+            app_state.y_data.extend(telemetry['value'].tolist())
+            app_state.expected_wave_data.extend(zip(commands['t'].tolist(), commands['value'].tolist()))
+            if end > 0:
+                app_state.replay_position = float(self.times[end - 1])
+        # Estimated by the GUI frame like live telemetry; a seek or a skipped span
+        # shows up as a time jump and restarts the estimate
+        kinematics.feed_batch(telemetry['t'].tolist(), telemetry['value'].tolist())
+
+    def _run(self):
+        n = self.records.size
+        anchor_wall = anchor_t = 0.0
+        try:
+            while not self._stop.is_set():
+                if self._seek_to is not None:
+                    target, self._seek_to = self._seek_to, None
+                    self._position = self.index_of(target)
+                    self._feed(max(0, self._position - REPLAY_CONTEXT_RECORDS), self._position, reset=True)
+                    anchor_wall, anchor_t = time.monotonic(), target
+                if self.paused or self._position >= n:
+                    anchor_wall, anchor_t = time.monotonic(), app_state.replay_position
+                    time.sleep(REPLAY_TICK_S)
+                    continue
+
+                if self.speed is None:
+                    end = min(self._position + REPLAY_MAX_CHUNK, n)
+                else:
+                    target = anchor_t + (time.monotonic() - anchor_wall) * self.speed
+                    end = int(np.searchsorted(self.times, target, side="right"))
+                if end > self._position:
+                    self._feed(self._position, end)
+                    self._position = end
+                time.sleep(0.001 if self.speed is None else REPLAY_TICK_S)
+        finally:
+            with app_state.data_lock:
+                if SessionReplay._active is self:
+                    SessionReplay._active = None
+                    app_state.replay_running = False
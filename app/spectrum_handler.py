@@ -0,0 +1,162 @@
+# spectrum_handler.py
+# Spectral analysis service for the seismic trace viewer.
+# Computes one-sided amplitude spectra (rfft), Welch PSDs and response spectra
+# (see response_spectrum.py),
+# caches them per (trace, window, params) and can precompute the whole catalog
+# in a background pool so spectra are ready when the user opens a trace.
+# The cache is a bounded LRU; a spectrum already being computed is not started
+# again, later requests wait on the first one's Future.
+
+import threading
+from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor
+
+import numpy as np
+
+import app_state
+import response_spectrum as rs
+
+DEFAULT_LOG_BINS = 256
+DEFAULT_PERIODS = rs.DEFAULT_PERIODS
+DEFAULT_DAMPING = rs.DEFAULT_DAMPING
+MAX_WORKERS = 4
+MAX_CACHE_ENTRIES = 1024           # log-binned spectra are a few kB each
+
+_cache = OrderedDict()
+_in_flight = {}                    # key -> Future of the computation in progress
+_cache_lock = threading.Lock()
+_executor = None
+
+def trace_key(trace_info):
+    """Returns a hashable key that identifies a trace independently of its list position."""
+    return (trace_info['file_path'], trace_info['id'], trace_info['starttime'])
+
+def amplitude_spectrum(data, sampling_rate, window="hann"):
+    """One-sided amplitude spectrum using rfft with next-fast-length zero padding."""
+    from scipy import signal
+    from scipy.fft import next_fast_len, rfft, rfftfreq
+    data = np.asarray(data, dtype=np.float64)
+    if data.size == 0:
+        return np.empty(0), np.empty(0)
+    data = data - data.mean()
+    if window:
+        data = data * signal.get_window(window, data.size)
+    nfft = next_fast_len(data.size, real=True)
+    amps = np.abs(rfft(data, n=nfft)) * (2.0 / data.size)
+    freqs = rfftfreq(nfft, 1.0 / sampling_rate)
+    return freqs, amps
+
+def welch_psd(data, sampling_rate, segment_seconds=10.0, window="hann"):
+    """Power spectral density estimated with Welch's averaged periodogram."""
+    from scipy import signal
+    from scipy.fft import next_fast_len
+    data = np.asarray(data, dtype=np.float64)
+    nperseg = min(data.size, max(16, int(segment_seconds * sampling_rate)))
+    return signal.welch(data, fs=sampling_rate, window=window, nperseg=nperseg,
+                        nfft=next_fast_len(nperseg, real=True), detrend="linear")
+
+def log_bin(freqs, values, n_bins=DEFAULT_LOG_BINS):
+    """Averages a spectrum into log-spaced frequency bins for display (DC is dropped)."""
+    mask = freqs > 0
+    freqs, values = freqs[mask], values[mask]
+    if freqs.size == 0:
+        return np.empty(0), np.empty(0)
+    edges = np.geomspace(freqs[0], freqs[-1], n_bins + 1)
+    idx = np.clip(np.searchsorted(edges, freqs, side="right") - 1, 0, n_bins - 1)
+    counts = np.bincount(idx, minlength=n_bins)
+    sums = np.bincount(idx, weights=values, minlength=n_bins)
+    centers = np.sqrt(edges[:-1] * edges[1:])
+    filled = counts > 0
+    return centers[filled], sums[filled] / counts[filled]
+
+def _acceleration(trace_info):
+    """Processed acceleration record (same pipeline as the shaking table processing)."""
+    import seismic_handler as sh
+    trace = sh.trace_filters(trace_info['obspy_trace'].copy())
+    return trace.data.astype(np.float64), trace.stats.delta
+
+def _cached(key, compute):
+    with _cache_lock:
+        if key in _cache:
+            _cache.move_to_end(key)
+            return _cache[key]
+        future = _in_flight.get(key)
+        owner = future is None
+        if owner:
+            future = _in_flight[key] = Future()
+    if not owner:
+        return future.result()
+    try:
+        result = compute()
+    except BaseException as e:
+        with _cache_lock:
+            del _in_flight[key]
+        future.set_exception(e)
+        raise
+    with _cache_lock:
+        _cache[key] = result
+        if len(_cache) > MAX_CACHE_ENTRIES:
+            _cache.popitem(last=False)
+        del _in_flight[key]
+    future.set_result(result)
+    return result
+
+def get_trace_spectrum(trace_info, window="hann", n_bins=DEFAULT_LOG_BINS):
+    """Returns (freqs, amps) of the log-binned amplitude spectrum of the raw trace, cached."""
+    key = (trace_key(trace_info), "fft", window, n_bins)
+    def compute():
+        freqs, amps = amplitude_spectrum(trace_info['data'], trace_info['sampling_rate'], window)
+        return log_bin(freqs, amps, n_bins)
+    return _cached(key, compute)
+
+def get_trace_psd(trace_info, segment_seconds=10.0, window="hann", n_bins=DEFAULT_LOG_BINS):
+    """Returns (freqs, psd) of the log-binned Welch PSD of the raw trace, cached."""
+    key = (trace_key(trace_info), "welch", segment_seconds, window, n_bins)
+    def compute():
+        freqs, psd = welch_psd(trace_info['data'], trace_info['sampling_rate'], segment_seconds, window)
+        return log_bin(freqs, psd, n_bins)
+    return _cached(key, compute)
+
+def get_trace_response_spectrum(trace_info, damping=DEFAULT_DAMPING, periods=DEFAULT_PERIODS):
+    """Returns (periods, psa) of the processed acceleration of a trace, cached."""
+    return rs.cached_response_spectrum(trace_key(trace_info), lambda: _acceleration(trace_info),
+                                       periods, damping)
+
+def rank_catalog(target_periods, target_psa, damping=DEFAULT_DAMPING, scale=True):
+    """Ranks every loaded trace against a target spectrum, best match first.
+
+    Returns a list of (trace_info, misfit, scale_factor)."""
+    traces = list(app_state.viewer_all_traces)
+    records = [(trace_key(t), (lambda t=t: _acceleration(t))) for t in traces]
+    matrix = rs.batch_response_spectra(records, DEFAULT_PERIODS, damping)
+    order, misfits, scales = rs.rank_against_target(matrix, DEFAULT_PERIODS, target_periods,
+                                                    target_psa, scale)
+    return [(traces[i], misfits[i], scales[i]) for i in order]
+
+def clear_cache():
+    """Drops every cached spectrum (e.g. after the records folder is reloaded)."""
+    with _cache_lock:
+        _cache.clear()
+    rs.clear_cache()
+
+def _compute_all(trace_info):
+    try:
+        get_trace_spectrum(trace_info)
+        get_trace_psd(trace_info)
+        get_trace_response_spectrum(trace_info)
+    except Exception as e:
+        print(f"Spectrum: Error precomputing {trace_info['id']}: {e}")
+
+def submit(fn, *args):
+    """Runs fn(*args) on the viewer's background spectrum pool; returns its Future."""
+    global _executor
+    if _executor is None:
+        _executor = ThreadPoolExecutor(max_workers=MAX_WORKERS, thread_name_prefix="spectrum")
+    return _executor.submit(fn, *args)
+
+def precompute_catalog_spectra():
+    """Submits spectrum computation for every loaded trace to the background pool."""
+    traces = list(app_state.viewer_all_traces)
+    futures = [submit(_compute_all, trace_info) for trace_info in traces]
+    print(f"Spectrum: Precomputing spectra for {len(futures)} traces.")
+    return futures
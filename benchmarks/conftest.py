@@ -0,0 +1,148 @@
+# conftest.py
+# Shared fixtures for the host-side benchmark suite.
+# Everything runs on a plain Linux box: the serial port is replaced by an
+# in-memory fake and the records folder by synthetic MiniSEED files.
+#
+# Run and store results (JSON under .benchmarks/, one file per run):
+#     python -m pytest benchmarks --benchmark-autosave
+# Compare two stored runs:
+#     pytest-benchmark compare 0001 0002
+# Or write a single JSON file:
+#     python -m pytest benchmarks --benchmark-json=bench_output.json
+
+import os
+import sys
+import threading
+import time
+
+import numpy as np
+import pytest
+
+APP_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "app")
+sys.path.insert(0, os.path.abspath(APP_DIR))
+
+import app_state  # noqa: E402
+
+try:
+    import pytest_benchmark  # noqa: F401
+except ImportError:
+    collect_ignore_glob = ["test_*.py"]
+
+SEED = 1234
+
+class FakeSerial:
+    """In-memory stand-in for serial.Serial.
+
+    readline() serves the given lines (then stops the app loop once drained);
+    write() records (monotonic time, bytes) for timing analysis."""
+
+    def __init__(self, lines=(), stop_when_drained=True):
+        self._lines = list(lines)
+        self._pos = 0
+        self.stop_when_drained = stop_when_drained
+        self.is_open = True
+        self.writes = []
+        self._lock = threading.Lock()
+
+    def readline(self):
+        if self._pos < len(self._lines):
+            line = self._lines[self._pos]
+            self._pos += 1
+            return line
+        if self.stop_when_drained:
+            app_state.app_running = False
+        else:
+            time.sleep(0.001)
+        return b""
+
+    def write(self, data):
+        with self._lock:
+            self.writes.append((time.monotonic(), data))
+        return len(data)
+
+    def reset_input_buffer(self):
+        pass
+
+    def reset_output_buffer(self):
+        pass
+
+    def flush(self):
+        pass
+
+    def close(self):
+        self.is_open = False
+
+def make_telemetry_lines(n=20000, timestamped=True):
+    """Encoder telemetry as the firmware prints it: a 1 kHz wandering angle."""
+    rng = np.random.default_rng(SEED)
+    angles = np.cumsum(rng.normal(0, 2.0, n)) % 360.0
+    if timestamped:
+        return [f"{1000 * i},{a:.2f}\r\n".encode() for i, a in enumerate(angles)]
+    return [f"{a:.2f}\r\n".encode() for a in angles]
+
+@pytest.fixture
+def telemetry_lines():
+    return make_telemetry_lines()
+
+@pytest.fixture
+def fake_serial_factory(monkeypatch):
+    """Installs a FakeSerial as app_state.ser and restores the app flags afterwards."""
+    def install(lines=(), stop_when_drained=True):
+        fake = FakeSerial(lines, stop_when_drained)
+        app_state.ser = fake
+        app_state.app_running = True
+        return fake
+    yield install
+    app_state.ser = None
+    app_state.app_running = True
+    app_state.sismo_running = False
+    app_state.emergency_stop_latched = False
+
+def make_synthetic_trace(duration_s=120.0, sampling_rate=100.0, station="SYN", channel="BHZ"):
+    """A reproducible velocity-like record: windowed band-limited noise burst."""
+    from obspy import Trace, UTCDateTime
+    rng = np.random.default_rng(SEED)
+    n = int(duration_s * sampling_rate)
+    t = np.arange(n) / sampling_rate
+    envelope = np.exp(-((t - duration_s / 3) / (duration_s / 8)) ** 2)
+    data = (np.convolve(rng.normal(0, 1, n), np.ones(5) / 5, mode="same") * envelope * 1e6).astype(np.int32)
+    trace = Trace(data=data)
+    trace.stats.network, trace.stats.station, trace.stats.channel = "XX", station, channel
+    trace.stats.sampling_rate = sampling_rate
+    trace.stats.starttime = UTCDateTime(2020, 1, 1)
+    return trace
+
+@pytest.fixture(scope="session")
+def synthetic_records_folder(tmp_path_factory):
+    """Folder with a few MiniSEED files of three components each."""
+    from obspy import Stream
+    folder = tmp_path_factory.mktemp("sismic_records")
+    for i in range(4):
+        stream = Stream([make_synthetic_trace(station=f"S{i:02d}", channel=ch) for ch in ("BHE", "BHN", "BHZ")])
+        stream.write(str(folder / f"synthetic-{i:02d}.miniseed"), format="MSEED")
+    return str(folder)
+
+@pytest.fixture
+def synthetic_trace():
+    return make_synthetic_trace()
+
+@pytest.fixture
+def dpg_context():
+    """A Dear PyGui context holding the items update_gui_callbacks writes to (no viewport)."""
+    import dearpygui.dearpygui as dpg
+    dpg.create_context()
+    with dpg.window(tag="main_window"):
+        with dpg.plot(tag="monitor"):
+            dpg.add_plot_axis(dpg.mvXAxis, tag="x_axis_comp")
+            with dpg.plot_axis(dpg.mvYAxis, tag="y_axis_comp"):
+                dpg.add_line_series([], [], tag="series_real_comp")
+        with dpg.plot(tag="validation"):
+            dpg.add_plot_axis(dpg.mvXAxis, tag="x_axis_comp2")
+            with dpg.plot_axis(dpg.mvYAxis, tag="y_axis_comp2"):
+                dpg.add_line_series([], [], tag="series_expected_comp2")
+                dpg.add_line_series([], [], tag="series_real_comp2")
+        dpg.add_combo(["off", "1 in 100", "1 in 10", "all"], tag="console_telemetry_combo", default_value="all")
+        dpg.add_child_window(tag="console_recv_container")
+        dpg.add_child_window(tag="console_send_container")
+    yield dpg
+    dpg.destroy_context()
@@ -0,0 +1,33 @@
+# test_bench_gui.py
+# Data marshaling from app_state into the Dear PyGui series in update_gui_callbacks.
+
+import app_state
+import log_ring
+import main
+
+def _fill_state():
+    with app_state.data_lock:
+        app_state.x_data.clear(); app_state.y_data.clear(); app_state.expected_wave_data.clear()
+        for i in range(app_state.max_points):
+            app_state.x_data.append(i * 0.001)
+            app_state.y_data.append(float(i % 360))
+            app_state.expected_wave_data.append((i * 0.01, i))
+
+def test_update_gui_callbacks_full_buffers(benchmark, dpg_context):
+    _fill_state()
+    benchmark(main.update_gui_callbacks)
+    assert len(dpg_context.get_value("series_real_comp")[0]) == app_state.max_points
+
+def test_console_refresh(benchmark, dpg_context):
+    """One throttled console refresh: 250 ms of 1 kHz telemetry sampled 1 in 10, plus commands."""
+    dpg_context.set_value("console_telemetry_combo", "1 in 10")
+    counter = iter(range(10 ** 9))
+    def run():
+        for _ in range(250):
+            i = next(counter)
+            log_ring.telemetry.append(log_ring.KIND_TELEMETRY, f"{i},{i % 360:.2f}")
+            if i % 10 == 0:
+                log_ring.motion.append(log_ring.KIND_SENT, f"m{i}")
+        main._console_last_refresh = 0.0
+        main._update_console()
+    benchmark(run)
@@ -0,0 +1,96 @@
+# test_bench_playback.py
+# Playback timing accuracy against a fake port: how far each command write
+# lands from its ideal schedule (start + i * sample_interval), the per-command
+# cost of the closed-loop correction, of the backlash fit/pre-compensation and of
+# the operating-envelope check.
+
+import json
+
+import numpy as np
+
+import app_state
+import backlash
+import performance_envelope
+import playback_cache
+import position_loop
+import seismic_handler as sh
+from conftest import make_synthetic_trace
+
+def test_playback_timing_accuracy(benchmark, fake_serial_factory, monkeypatch):
+    trace = make_synthetic_trace(duration_s=2.0, sampling_rate=100.0)
+    trace_info = {'id': trace.id, 'file_name': 'synthetic', 'file_path': 'synthetic',
+                  'starttime': str(trace.stats.starttime), 'obspy_trace': trace, 'data': trace.data}
+    monkeypatch.setattr(sh.dpg, "does_item_exist", lambda tag: False)
+
+    def run():
+        fake = fake_serial_factory(stop_when_drained=False)
+        app_state.sismo_running = True
+        sh._playback_worker(trace_info)
+        return fake
+
+    playback_cache.clear()
+    fake = benchmark.pedantic(run, rounds=3)
+
+    stamps = np.array([t for t, data in fake.writes if data.startswith(b"m")])[:-1]  # drop final m0
+    lateness_ms = (stamps - stamps[0] - np.arange(stamps.size) * trace.stats.delta) * 1e3
+    benchmark.extra_info.update({
+        'commands': int(stamps.size),
+        'lateness_p50_ms': float(np.percentile(lateness_ms, 50)),
+        'lateness_p99_ms': float(np.percentile(lateness_ms, 99)),
+        'lateness_max_ms': float(lateness_ms.max()),
+        'interval_jitter_ms': float(np.std(np.diff(stamps)) * 1e3),
+    })
+    assert stamps.size == trace.stats.npts
+
+def test_position_loop_update(benchmark):
+    """10k closed-loop updates against a table that loses steps in one direction."""
+    reference = (800 * np.sin(2 * np.pi * 0.5 * np.arange(10000) * 0.01)).astype(int)
+
+    def run():
+        corrector = position_loop.PositionCorrector(0.01, 0.3, 2.0, 400, 0.0, baseline_angle=0.0)
+        missed = 0
+        for position in reference.tolist():
+            actual = position + corrector.output - missed
+            missed += 1 if position > 0 else 0
+            corrector.update(position, actual * 360.0 / 3200, 0.0, now=0.0)
+        return corrector, missed
+
+    corrector, missed = benchmark.pedantic(run, rounds=3)
+    rms, peak, effort = corrector.summary()
+    benchmark.extra_info.update({'updates': reference.size, 'error_rms_steps': rms, 'correction_max_steps': effort})
+    assert effort <= 400
+    assert abs(corrector.errors[-1]) < missed
+
+def test_backlash_fit(benchmark):
+    """Fit of a 60 s sweep through a 24-step backlash with 30 ms lag, then pre-compensation."""
+    interval = 0.005
+    t = np.arange(12000) * interval
+    commanded = np.rint(600 * np.sin(2 * np.pi * 0.2 * t) * np.sin(2 * np.pi * 0.05 * t))
+    lag = int(0.03 / interval)
+    measured = 0.98 * backlash.play_operator(commanded, 24.0)
+    measured = np.concatenate([np.full(lag, measured[0]), measured[:-lag]])
+    measured += np.random.default_rng(1234).normal(0, 1.0, t.size)
+
+    model = benchmark.pedantic(backlash.fit, args=(commanded, measured, interval), rounds=3)
+    benchmark.extra_info.update({k: model[k] for k in ('width', 'lag_s', 'residual_rms')})
+    assert abs(model['width'] - 24.0) < 2.0
+    assert abs(model['lag_s'] - 0.03) < 0.011
+    compensated = backlash.precompensate(commanded, model['width'])
+    played = backlash.play_operator(compensated, 24.0)
+    assert np.abs(played - commanded).mean() < np.abs(backlash.play_operator(commanded, 24.0) - commanded).mean() / 3
+
+def test_envelope_check(benchmark, tmp_path, monkeypatch):
+    """Octave-band check of an hour-long 100 Hz trajectory against a mapped envelope."""
+    points = [dict(speed=600000, acceleration=200000, command_rate=100, frequency=f, amplitude=a,
+                   feasible=a <= 1600 / f) for f in (1.0, 5.0, 20.0) for a in (10, 50, 200, 800, 1600)]
+    path = tmp_path / "performance_envelope.json"
+    path.write_text(json.dumps({'points': points}))
+    monkeypatch.setattr(performance_envelope, "get_envelope_path", lambda: str(path))
+
+    t = np.arange(360000) * 0.01
+    slow = 700 * np.sin(2 * np.pi * 0.3 * t)
+    violations = benchmark(performance_envelope.check_trajectory, slow, 0.01, 600000, 200000)
+    assert violations == []
+    fast = slow + 300 * np.sin(2 * np.pi * 8.0 * t)
+    assert performance_envelope.check_trajectory(fast, 0.01, 600000, 200000)
+    assert performance_envelope.check_trajectory(fast, 0.01, 300000, 200000) == []    # no map for these settings
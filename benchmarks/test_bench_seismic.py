@@ -0,0 +1,68 @@
+# test_bench_seismic.py
+# MiniSEED loading and trace processing for the viewer and playback.
+
+import pytest
+
+import numpy as np
+
+import app_state
+import seismic_handler as sh
+import strong_motion
+
+@pytest.fixture
+def records_folder(monkeypatch, synthetic_records_folder):
+    monkeypatch.setattr(sh, "get_records_folder_path", lambda: synthetic_records_folder)
+    # Background services triggered by a load are benchmarked on their own
+    monkeypatch.setattr(sh.spectrum_handler, "precompute_catalog_spectra", lambda: [])
+    monkeypatch.setattr(sh.catalog_index, "update_catalog", lambda folder: (0, 0))
+    return synthetic_records_folder
+
+def test_load_traces_from_folder(benchmark, records_folder):
+    benchmark.pedantic(sh.load_traces_from_folder_thread, rounds=5)
+    assert len(app_state.viewer_all_traces) == 12
+
+def test_process_selected_trace(benchmark, records_folder):
+    sh.load_traces_from_folder_thread()
+    app_state.viewer_selected_trace_index = 0
+    benchmark(sh.process_selected_trace)
+    assert app_state.expected_wave_data
+
+def test_prepare_trace_for_playback(benchmark, synthetic_trace):
+    positions, interval = benchmark(sh._prepare_trace_for_playback, synthetic_trace, 1600)
+    assert len(positions) == synthetic_trace.stats.npts
+    assert interval == pytest.approx(synthetic_trace.stats.delta)
+
+def test_prepare_trace_resampled(benchmark, synthetic_trace):
+    # Odd rate ratio (approximated as a fraction) with similitude time compression
+    positions, interval = benchmark(sh._prepare_trace_for_playback, synthetic_trace, 1600, 137.0, 4.0)
+    duration = synthetic_trace.stats.npts * synthetic_trace.stats.delta / 2.0
+    assert interval == pytest.approx(1 / 137.0, rel=0.01)
+    assert len(positions) * interval == pytest.approx(duration, rel=0.01)
+    assert abs(positions).max() == 1600
+
+def test_prepare_trace_trimmed(benchmark, synthetic_trace):
+    # The synthetic burst peaks at 40 s of 120 s: pre-event and coda are dropped
+    positions, interval = benchmark(sh._prepare_trace_for_playback, synthetic_trace, 1600, 0.0, 1.0, 0.0, (5.0, 10.0))
+    duration = len(positions) * interval
+    benchmark.extra_info['played_s'] = duration
+    assert 20.0 < duration < 0.6 * synthetic_trace.stats.npts * synthetic_trace.stats.delta
+
+def test_strong_motion_windows_batch(benchmark):
+    """Windows of 60 ten-minute 100 Hz records in one call."""
+    rng = np.random.default_rng(1234)
+    t = np.arange(60000) * 0.01
+    onsets = rng.uniform(100, 400, 60)
+    records = rng.normal(0, 0.01, (60, t.size)) + rng.normal(0, 1, (60, t.size)) * np.exp(
+        -((t - onsets[:, None] - 20) / 15) ** 2) * (t > onsets[:, None])
+    start, end = benchmark(strong_motion.strong_motion_window, records, 0.01, 0.0, 0.0)
+    assert np.all(np.abs(start * 0.01 - onsets) < 5.0)
+    assert np.all((end - start) * 0.01 < 80.0)
+
+def test_catalog_update_cold(benchmark, synthetic_records_folder, tmp_path):
+    import shutil
+    def setup():
+        folder = tmp_path / "catalog"
+        shutil.rmtree(folder, ignore_errors=True)
+        shutil.copytree(synthetic_records_folder, folder)
+        return (str(folder),), {}
+    benchmark.pedantic(sh.catalog_index.update_catalog, setup=setup, rounds=3)
@@ -0,0 +1,88 @@
+# test_bench_serial.py
+# Telemetry and stats-line parsing in read_serial_thread, command writes in send_command,
+# the emergency stop path and the live velocity/acceleration estimate.
+
+import numpy as np
+
+import app_state
+import kinematics
+import log_ring
+import serial_handler
+from conftest import make_telemetry_lines
+
+def _reset_plot_state():
+    with app_state.data_lock:
+        app_state.x_data.clear()
+        app_state.y_data.clear()
+    kinematics._pending.clear()
+    log_ring.telemetry.clear()
+    log_ring.messages.clear()
+    serial_handler.clock_sync.reset()
+
+def test_read_serial_thread_timestamped(benchmark, fake_serial_factory, telemetry_lines):
+    def setup():
+        _reset_plot_state()
+        fake_serial_factory(telemetry_lines)
+    benchmark.pedantic(serial_handler.read_serial_thread, setup=setup, rounds=5)
+    benchmark.extra_info['lines'] = len(telemetry_lines)
+    assert len(app_state.y_data) == app_state.max_points
+
+def test_read_serial_thread_legacy_lines(benchmark, fake_serial_factory):
+    lines = make_telemetry_lines(timestamped=False)
+    def setup():
+        _reset_plot_state()
+        fake_serial_factory(lines)
+    benchmark.pedantic(serial_handler.read_serial_thread, setup=setup, rounds=5)
+    benchmark.extra_info['lines'] = len(lines)
+
+def test_send_command(benchmark, fake_serial_factory):
+    fake = fake_serial_factory()
+    counter = iter(range(10 ** 9))
+    benchmark(lambda: serial_handler.send_command(f"m{next(counter)}"))
+    assert fake.writes
+
+def test_emergency_stop(benchmark, fake_serial_factory):
+    """Host side of the stop path: from the call to 'x' written, then the acknowledgement."""
+    fake = fake_serial_factory()
+    benchmark(serial_handler.emergency_stop)
+    assert fake.writes[-1][1] == b"\nx\n"
+    serial_handler.send_command("m100")
+    assert fake.writes[-1][1] == b"\nx\n"      # motion is blocked while latched
+
+    fake_serial_factory([b"!x,123456,12\r\n"])
+    serial_handler.read_serial_thread()
+    assert "acknowledged" in app_state.stop_status
+    serial_handler.release_emergency_stop()
+    serial_handler.send_command("m100")
+    assert app_state.ser.writes[-1][1] == b"m100\n"
+
+def test_device_stats_line(benchmark, fake_serial_factory):
+    line = "#q,t=5000000,win=1000,loop=183000,cmd=512,ovf=0,jmax=41,jmean=3,spk=2,stq=7,drop=0"
+    stats = benchmark(serial_handler.parse_device_stats, line)
+    assert stats["cmd"] == 512 and stats["stq"] == 7 and "t" in stats
+    app_state.device_stats_history.clear()
+    fake_serial_factory([(line + "\r\n").encode()])
+    serial_handler.read_serial_thread()
+    assert app_state.device_stats_history[-1][1]["loop"] == 183000
+
+def test_kinematics_batches(benchmark):
+    """20 s of 1 kHz telemetry drained in GUI-frame sized batches (17 samples)."""
+    t = np.arange(20000) * 0.001
+    angles = 45.0 * np.sin(2 * np.pi * 2.0 * t)
+    samples = list(zip(t.tolist(), angles.tolist()))
+
+    def run():
+        kinematics.estimator.reset()
+        with app_state.data_lock:
+            app_state.acceleration_data.clear()
+        for i in range(0, len(samples), 17):
+            for sample in samples[i:i + 17]:
+                kinematics.feed(*sample)
+            kinematics.process_pending()
+
+    benchmark.pedantic(run, rounds=3)
+    times, estimated = np.array(app_state.acceleration_data).T
+    expected = -kinematics.degrees_to_steps(45.0) * (2 * np.pi * 2.0) ** 2 * np.sin(2 * np.pi * 2.0 * times)
+    error = np.sqrt(np.mean((estimated - expected) ** 2)) / np.abs(expected).max()
+    benchmark.extra_info.update({'samples': t.size, 'acceleration_rel_rms_error': float(error)})
+    assert error < 0.15
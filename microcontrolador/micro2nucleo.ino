@@ -11,14 +11,23 @@ FastAccelStepperEngine engine;
 FastAccelStepper *stepper = nullptr;
 AS5600 encoder;
 const int CPR = 4096;             // cuentas por vuelta del AS5600
-const uint32_t SAMPLE_MS = 5;     // muestreo del encoder (ms)
+const uint32_t SAMPLE_MS = 1;     // muestreo del encoder (ms); se promedia antes de enviar
 int MAX_ACCEPTABLE_DELTA = 1500;  // umbral para rechazar spikes (ajustable)
 volatile int32_t position_counts = 0;  // acumulador de delta en cuentas (puede ser negativo)
 volatile int16_t last_raw = -1;
 
+// Muestreo y envio desacoplados (ver micro2nucleoV2): el encoder encola en el
+// nucleo 0 y la tarea de transmision promedia y envia desde el nucleo 1.
+struct EncoderSample {
+  int32_t counts;
+};
+const uint32_t SAMPLE_RATE_HZ = 1000 / SAMPLE_MS;
+const UBaseType_t SAMPLE_QUEUE_LENGTH = 256;
+QueueHandle_t sampleQueue = nullptr;
+volatile uint32_t telemetryDecimation = 5;     // 200 Hz por defecto, como antes (r<hz> lo cambia)
+
 void readEncoderTask(void *param) {
   TickType_t lastWake = xTaskGetTickCount();
-  int32_t countsCopy;
   for (;;) {
     vTaskDelayUntil(&lastWake, pdMS_TO_TICKS(SAMPLE_MS));
     int16_t raw = encoder.rawAngle();  // 0..4095
@@ -33,12 +42,36 @@ void readEncoderTask(void *param) {
     if (abs(delta) <= MAX_ACCEPTABLE_DELTA) {
       position_counts += delta;
     }
-    countsCopy = position_counts;
-    float absoluteDeg = (countsCopy * 360.0f) / (float)CPR;  // grados absolutos (puede ser >360)
-    Serial.println(absoluteDeg);
     last_raw = raw;
+    EncoderSample sample = {position_counts};
+    xQueueSend(sampleQueue, &sample, 0);   // cola llena: se pierde la muestra, el muestreo no espera
+  }
+}
+
+void telemetryTxTask(void *param) {
+  char batch[256];
+  size_t used = 0;
+  EncoderSample sample;
+  int64_t countsSum = 0;
+  uint32_t averaged = 0;
+  for (;;) {
+    TickType_t wait = used > 0 ? 0 : portMAX_DELAY;
+    if (xQueueReceive(sampleQueue, &sample, wait) == pdTRUE) {
+      countsSum += sample.counts;
+      averaged++;
+      if (averaged >= telemetryDecimation) {
+        float absoluteDeg = ((float)countsSum / averaged * 360.0f) / (float)CPR;  // grados absolutos (puede ser >360)
+        int n = snprintf(batch + used, sizeof(batch) - used, "%.2f\r\n", absoluteDeg);
+        if (n > 0) used += n;
+        countsSum = 0;
+        averaged = 0;
+      }
+    }
+    if (used > 0 && (used > sizeof(batch) - 32 || uxQueueMessagesWaiting(sampleQueue) == 0)) {
+      Serial.write((const uint8_t *)batch, used);
+      used = 0;
+    }
   }
-  //vTaskDelay(pdMS_TO_TICKS(5));  // cada 5 ms
 }
 
 void setup() {
@@ -63,7 +96,7 @@ void setup() {
     while (1);
   }
   Serial.println("Sistema inicializado. Listo para recibir comandos.");
-  Serial.println("Comandos: m<pos>, s<vel>, a<acel>, e<0/1>");
+  Serial.println("Comandos: m<pos>, s<vel>, a<acel>, e<0/1>, r<hz> (telemetria)");
   
   if (!encoder.detectMagnet()) {
     Serial.println("ADVERTENCIA: No se detecta iman");
@@ -79,7 +112,9 @@ void setup() {
       Serial.println("Intensidad óptima");
     }
   }
+  sampleQueue = xQueueCreate(SAMPLE_QUEUE_LENGTH, sizeof(EncoderSample));
   xTaskCreatePinnedToCore(readEncoderTask, "EncTask", 4096, NULL, 2, NULL, 0);
+  xTaskCreatePinnedToCore(telemetryTxTask, "TxTask", 4096, NULL, 1, NULL, 1);
 }
 
 void loop() {
@@ -93,6 +128,10 @@ void loop() {
       stepper->setSpeedInHz(data);
     } else if (command.startsWith("a")) {
       stepper->setAcceleration(data);
-    } 
+    } else if (command.startsWith("r")) {
+      // r<hz>: frecuencia de telemetria
+      data = constrain(data, 1, (int)SAMPLE_RATE_HZ);
+      telemetryDecimation = SAMPLE_RATE_HZ / data;
+    }
   }
 }
\ No newline at end of file
@@ -0,0 +1,83 @@
+# conftest.py
+# Shared fixtures for the host-side unit tests (correctness only; timing lives
+# in benchmarks/). The app modules are imported flat, as the app itself does.
+#
+# Run:
+#     python -m pytest tests
+
+import os
+import sys
+import threading
+
+import numpy as np
+import pytest
+
+APP_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "app")
+sys.path.insert(0, os.path.abspath(APP_DIR))
+
+import app_state  # noqa: E402
+
+class FakeSerial:
+    """In-memory stand-in for serial.Serial: readline() serves the given lines and
+    then stops the app loop, write() records the bytes written."""
+
+    def __init__(self, lines=()):
+        self._lines = list(lines)
+        self.is_open = True
+        self.writes = []
+        self._lock = threading.Lock()
+
+    def readline(self):
+        if self._lines:
+            return self._lines.pop(0)
+        app_state.app_running = False
+        return b""
+
+    def write(self, data):
+        with self._lock:
+            self.writes.append(data)
+        return len(data)
+
+    def reset_input_buffer(self):
+        pass
+
+    def reset_output_buffer(self):
+        pass
+
+    def flush(self):
+        pass
+
+    def close(self):
+        self.is_open = False
+
+@pytest.fixture
+def fake_serial(monkeypatch):
+    """Installs FakeSerial instances as app_state.ser and restores the app flags afterwards."""
+    def install(lines=()):
+        fake = FakeSerial(lines)
+        app_state.ser = fake
+        app_state.app_running = True
+        return fake
+    yield install
+    app_state.ser = None
+    app_state.app_running = True
+    app_state.sismo_running = False
+    app_state.emergency_stop_latched = False
+
+def make_trace(data, sampling_rate=100.0, station="SYN", channel="BHZ"):
+    """An ObsPy trace holding data."""
+    from obspy import Trace, UTCDateTime
+    trace = Trace(data=np.asarray(data))
+    trace.stats.network, trace.stats.station, trace.stats.channel = "XX", station, channel
+    trace.stats.sampling_rate = sampling_rate
+    trace.stats.starttime = UTCDateTime(2020, 1, 1)
+    return trace
+
+@pytest.fixture
+def burst_trace():
+    """120 s velocity-like record with a noise burst centred at 40 s."""
+    rng = np.random.default_rng(1234)
+    t = np.arange(12000) * 0.01
+    envelope = np.exp(-((t - 40.0) / 15.0) ** 2)
+    data = np.convolve(rng.normal(0, 1, t.size), np.ones(5) / 5, mode="same") * envelope * 1e6
+    return make_trace(data.astype(np.int32))
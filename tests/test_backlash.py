@@ -0,0 +1,60 @@
+# test_backlash.py
+# Play operator against a per-sample reference loop, fit of a synthetic sweep
+# and the pre-compensation inverse.
+
+import numpy as np
+import pytest
+
+import backlash
+
+def _play_loop(x, width, initial):
+    p = initial
+    out = []
+    for value in x:
+        p = min(max(p, value - width / 2.0), value + width / 2.0)
+        out.append(p)
+    return np.array(out)
+
+@pytest.mark.parametrize("width", [0.5, 7.0, 40.0])
+def test_play_operator_matches_loop(width):
+    x = np.cumsum(np.random.default_rng(7).normal(0, 3.0, 5000))
+    np.testing.assert_allclose(backlash.play_operator(x, width), _play_loop(x, width, x[0]), atol=1e-9)
+    np.testing.assert_allclose(backlash.play_operator(x, width, initial=x[0] + width),
+                               _play_loop(x, width, x[0] + width), atol=1e-9)
+
+def test_play_operator_zero_width_is_identity():
+    x = np.array([0.0, 3.0, -2.0, 5.0])
+    np.testing.assert_array_equal(backlash.play_operator(x, 0.0), x)
+    assert backlash.play_operator(np.empty(0), 10.0).size == 0
+
+def test_motion_direction_holds_through_stops():
+    x = np.array([0, 1, 2, 2, 2, 1, 0, 0, 1])
+    np.testing.assert_array_equal(backlash.motion_direction(x), [1, 1, 1, 1, 1, -1, -1, -1, 1])
+
+def _sweep(width=24.0, lag_s=0.03, interval=0.005):
+    t = np.arange(12000) * interval
+    commanded = np.rint(600 * np.sin(2 * np.pi * 0.2 * t) * np.sin(2 * np.pi * 0.05 * t))
+    lag = int(round(lag_s / interval))
+    measured = 0.98 * backlash.play_operator(commanded, width)
+    measured = np.concatenate([np.full(lag, measured[0]), measured[:-lag]])
+    measured += np.random.default_rng(1234).normal(0, 1.0, t.size)
+    return commanded, measured, interval
+
+def test_fit_recovers_width_and_lag():
+    commanded, measured, interval = _sweep()
+    model = backlash.fit(commanded, measured, interval)
+    assert model['width'] == pytest.approx(24.0, abs=2.0)
+    assert model['lag_s'] == pytest.approx(0.03, abs=0.011)
+    assert model['gain'] == pytest.approx(0.98, abs=0.02)
+    assert model['residual_rms'] < model['residual_rms_without_backlash']
+
+def test_fit_rejects_one_way_sweeps():
+    ramp = np.arange(100.0)
+    with pytest.raises(ValueError):
+        backlash.fit(ramp, ramp, 0.005)
+
+def test_precompensate_cancels_backlash():
+    commanded, _, _ = _sweep()
+    played = backlash.play_operator(backlash.precompensate(commanded, 24.0), 24.0)
+    uncompensated = backlash.play_operator(commanded, 24.0)
+    assert np.abs(played - commanded).mean() < np.abs(uncompensated - commanded).mean() / 3
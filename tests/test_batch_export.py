@@ -0,0 +1,75 @@
+# test_batch_export.py
+# Export campaign round trip: manifest entries, .npz and .csv contents against
+# the playback preparation of the same traces.
+
+import json
+import os
+
+import numpy as np
+import pytest
+
+import batch_export
+import seismic_handler as sh
+
+def _write_record(path, stations):
+    from obspy import Stream, Trace, UTCDateTime
+    traces = []
+    for i, station in enumerate(stations):
+        rng = np.random.default_rng(i)
+        t = np.arange(3000) * 0.01
+        trace = Trace(data=(rng.normal(0, 1e5, t.size) * np.exp(-((t - 12.0) / 5.0) ** 2)).astype(np.int32))
+        trace.stats.network, trace.stats.station, trace.stats.channel = "XX", station, "BHZ"
+        trace.stats.sampling_rate = 100.0
+        trace.stats.starttime = UTCDateTime(2020, 1, 1)
+        traces.append(trace)
+    Stream(traces).write(path, format="MSEED")
+
+@pytest.fixture
+def campaign(tmp_path):
+    records = tmp_path / "records"
+    records.mkdir()
+    _write_record(str(records / "one.mseed"), ["AAA", "BBB"])
+    _write_record(str(records / "two.mseed"), ["CCC"])
+    (records / "broken.mseed").write_bytes(b"not miniseed")
+    selection = {str(records / "one.mseed"): {("XX.BBB..BHZ", "2020-01-01T00:00:00.000000Z")},
+                 str(records / "two.mseed"): None,
+                 str(records / "broken.mseed"): None}
+    summary = batch_export.export_traces(selection, 1600, command_rate=200.0, write_csv=True,
+                                         out_dir=str(tmp_path / "out"), max_workers=1)
+    with open(os.path.join(summary['out_dir'], "manifest.json")) as f:
+        return summary, json.load(f)
+
+def test_manifest_round_trip(campaign):
+    from obspy import read
+    summary, manifest = campaign
+    out_dir = summary['out_dir']
+    assert summary['traces'] == 2 and len(summary['errors']) == 1 and "broken.mseed" in summary['errors'][0]
+    assert manifest['errors'] == summary['errors']
+    assert manifest['amplitude'] == 1600 and manifest['command_rate'] == 200.0
+    assert sorted(e['trace_id'] for e in manifest['traces']) == ["XX.BBB..BHZ", "XX.CCC..BHZ"]
+
+    for entry in manifest['traces']:
+        displacement, velocity, acceleration, metadata = batch_export.load_export(
+            os.path.join(out_dir, entry['files'][0]))
+        assert metadata == {k: v for k, v in entry.items() if k not in ('files', 'bytes')}
+        source = os.path.join(os.path.dirname(out_dir), "records", entry['source_file'])
+        trace = read(source).select(id=entry['trace_id'])[0]
+        expected, interval = sh._prepare_trace_for_playback(trace, 1600, 200.0)
+        np.testing.assert_array_equal(displacement, expected)
+        assert metadata['sample_interval'] == pytest.approx(interval)
+        assert metadata['samples'] == displacement.size
+        expected_velocity, expected_acceleration = batch_export.table_trajectory(expected, interval)
+        np.testing.assert_allclose(velocity, expected_velocity, rtol=1e-6)
+        np.testing.assert_allclose(acceleration, expected_acceleration, rtol=1e-6)
+        assert metadata['peak_velocity'] == pytest.approx(np.abs(expected_velocity).max())
+
+        table = np.loadtxt(os.path.join(out_dir, entry['files'][1]), delimiter=",", skiprows=1)
+        np.testing.assert_array_equal(table[:, 1], displacement)
+        assert table[1, 0] == pytest.approx(interval, abs=1e-6)
+        assert entry['bytes'] == sum(os.path.getsize(os.path.join(out_dir, f)) for f in entry['files'])
+
+def test_trajectory_derivatives():
+    t = np.arange(1000) * 0.01
+    velocity, acceleration = batch_export.table_trajectory(100 * t ** 2, 0.01)
+    np.testing.assert_allclose(velocity[1:-1], 200 * t[1:-1])
+    np.testing.assert_allclose(acceleration[2:-2], 200.0)
@@ -0,0 +1,81 @@
+# test_calibration.py
+# Boundary search of the passive calibrator against a simulated table whose
+# motor stalls above a known speed limit.
+
+import importlib.util
+import os
+
+import pytest
+
+CALIBRATOR_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "utilities",
+                               "python calibrador_pasivo.py")
+
+@pytest.fixture(scope="module")
+def calibrator():
+    pytest.importorskip("serial")
+    spec = importlib.util.spec_from_file_location("calibrador_pasivo", CALIBRATOR_PATH)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+class SimulatedTable:
+    """Stands in for ESP32Monitor: moves complete while the speed is within
+    limit(accel), above it the motor loses steps and stops short."""
+
+    def __init__(self, calibrator, limit):
+        self.limit = limit
+        self.degrees_per_step = 360.0 / calibrator.STEPS_PER_REVOLUTION
+        self.speed = self.accel = 0
+        self.angle = 0.0
+
+    def send_command(self, command):
+        kind, value = command[0], int(command[1:])
+        if kind == "s":
+            self.speed = value
+        elif kind == "a":
+            self.accel = value
+        elif kind == "m":
+            target = value * self.degrees_per_step
+            if self.speed <= self.limit(self.accel):
+                self.angle = target
+            else:
+                self.angle += 0.5 * (target - self.angle)
+
+    def get_latest_angle(self):
+        return self.angle
+
+    def wait_for_stop(self, after_command=False):
+        return self.angle
+
+@pytest.mark.parametrize("limit_speed", [512345, 777777, 1093000])
+def test_bisection_finds_the_limit(calibrator, limit_speed):
+    table = SimulatedTable(calibrator, lambda accel: limit_speed)
+    engine = calibrator.CalibrationEngine(table)
+    found = engine.max_speed_for_accel(300000)
+    assert limit_speed - calibrator.SPEED_RESOLUTION < found <= limit_speed
+    # Far fewer moves than the exhaustive grid over the speed range
+    grid = (calibrator.SPEED_END - calibrator.SPEED_START) // calibrator.SPEED_RESOLUTION + 1
+    assert engine.moves < grid / 4
+
+def test_hint_near_the_limit_saves_moves(calibrator):
+    limit_speed = 800500
+    blind = calibrator.CalibrationEngine(SimulatedTable(calibrator, lambda accel: limit_speed))
+    hinted = calibrator.CalibrationEngine(SimulatedTable(calibrator, lambda accel: limit_speed))
+    for found in (blind.max_speed_for_accel(300000), hinted.max_speed_for_accel(300000, hint=790000)):
+        assert limit_speed - calibrator.SPEED_RESOLUTION < found <= limit_speed
+    assert hinted.moves < blind.moves
+
+def test_unreachable_start_speed_gives_zero(calibrator):
+    for hint in (None, 700000):
+        table = SimulatedTable(calibrator, lambda accel: calibrator.SPEED_START - 1)
+        assert calibrator.CalibrationEngine(table).max_speed_for_accel(300000, hint=hint) == 0
+
+def test_boundary_following_over_accelerations(calibrator):
+    # Limit falls linearly with acceleration; every level is found within the resolution
+    limit = lambda accel: 1150000 - accel // 2
+    table = SimulatedTable(calibrator, limit)
+    engine = calibrator.CalibrationEngine(table)
+    results = {}
+    for accel in range(calibrator.ACCEL_START, calibrator.ACCEL_END + 1, calibrator.ACCEL_STEP):
+        results[accel] = engine.max_speed_for_accel(accel, hint=calibrator.predict_next_limit(results))
+        assert limit(accel) - calibrator.SPEED_RESOLUTION < results[accel] <= limit(accel)
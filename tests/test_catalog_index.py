@@ -0,0 +1,74 @@
+# test_catalog_index.py
+# Incremental catalog updates over a records folder and the query API.
+
+import os
+
+import numpy as np
+import pytest
+
+import catalog_index
+
+def _write_record(path, station, amplitude):
+    from obspy import Stream, Trace, UTCDateTime
+    rng = np.random.default_rng(sum(map(ord, station)))
+    t = np.arange(6000) * 0.01
+    data = rng.normal(0, 1, t.size) * np.exp(-((t - 20.0) / 8.0) ** 2) * amplitude
+    trace = Trace(data=data.astype(np.int32))
+    trace.stats.network, trace.stats.station, trace.stats.channel = "XX", station, "BHZ"
+    trace.stats.sampling_rate = 100.0
+    trace.stats.starttime = UTCDateTime(2020, 1, 1)
+    Stream([trace]).write(path, format="MSEED")
+
+@pytest.fixture
+def records_folder(tmp_path):
+    for station, amplitude in (("AAA", 1e5), ("BBB", 1e6), ("CCC", 1e7)):
+        _write_record(str(tmp_path / f"{station}.mseed"), station, amplitude)
+    (tmp_path / "notes.txt").write_text("not a record")
+    return str(tmp_path)
+
+def _pga(folder, station):
+    return catalog_index.query_traces(folder, {'station': station})[0]['pga']
+
+def test_only_changed_files_are_reindexed(records_folder):
+    assert catalog_index.update_catalog(records_folder, max_workers=1) == (3, 0)
+    assert catalog_index.update_catalog(records_folder, max_workers=1) == (0, 0)
+    pga_a, pga_b = _pga(records_folder, "AAA"), _pga(records_folder, "BBB")
+
+    # Rewrite one file with ten times the amplitude and a new mtime, remove another
+    path_a = os.path.join(records_folder, "AAA.mseed")
+    _write_record(path_a, "AAA", 1e6)
+    stat = os.stat(path_a)
+    os.utime(path_a, (stat.st_atime, stat.st_mtime + 10))
+    os.remove(os.path.join(records_folder, "CCC.mseed"))
+
+    assert catalog_index.update_catalog(records_folder, max_workers=1) == (1, 1)
+    assert _pga(records_folder, "AAA") == pytest.approx(10 * pga_a, rel=1e-3)
+    assert _pga(records_folder, "BBB") == pga_b
+    stations = [row['station'] for row in catalog_index.query_traces(records_folder, order_by='station')]
+    assert stations == ["AAA", "BBB"]
+
+def test_query_filters_and_ordering(records_folder):
+    catalog_index.update_catalog(records_folder, max_workers=1)
+    rows = catalog_index.query_traces(records_folder, order_by='pga', descending=True)
+    assert [row['station'] for row in rows] == ["CCC", "BBB", "AAA"]
+    strong = catalog_index.query_traces(records_folder, {'pga': (rows[1]['pga'], None)})
+    assert {row['station'] for row in strong} == {"BBB", "CCC"}
+    assert len(catalog_index.query_traces(records_folder, order_by='pga', limit=1)) == 1
+    with pytest.raises(ValueError):
+        catalog_index.query_traces(records_folder, {'file_path': "x"})
+
+def test_index_from_another_version_is_rebuilt(records_folder):
+    import sqlite3
+    catalog_index.update_catalog(records_folder, max_workers=1)
+    pga = _pga(records_folder, "AAA")
+    # An index written by an older version: same columns, measures computed differently
+    conn = sqlite3.connect(catalog_index.get_catalog_path(records_folder))
+    with conn:
+        conn.execute("UPDATE traces SET pga = pga * 2")
+    conn.execute(f"PRAGMA user_version = {catalog_index.CATALOG_VERSION - 1}")
+    conn.close()
+    assert catalog_index.update_catalog(records_folder, max_workers=1) == (3, 0)
+    assert _pga(records_folder, "AAA") == pga
+    conn = sqlite3.connect(catalog_index.get_catalog_path(records_folder))
+    assert conn.execute("PRAGMA user_version").fetchone()[0] == catalog_index.CATALOG_VERSION
+    conn.close()
@@ -0,0 +1,42 @@
+# test_clock_sync.py
+# Device-to-host clock mapping: minimum-delay offset, drift, wrap and restart.
+
+import numpy as np
+import pytest
+
+from clock_sync import DEVICE_WRAP_US, ClockSync
+
+def _feed(sync, device_us, host_s):
+    return np.array([sync.update(d, h) for d, h in zip(device_us.tolist(), host_s.tolist())])
+
+def test_offset_is_the_minimum_delay():
+    rng = np.random.default_rng(11)
+    device_s = np.arange(20000) * 0.001
+    delays = 0.0005 + rng.exponential(0.003, device_s.size)      # transport only ever adds delay
+    sync = ClockSync()
+    mapped = _feed(sync, np.rint(device_s * 1e6).astype(np.int64), 100.0 + device_s + delays)
+    assert sync.offset == pytest.approx(100.0 + 0.0005, abs=2e-4)
+    # Once fitted, the mapped times are the send times up to the minimum delay, not the jittery arrivals
+    steady = slice(2000, None)
+    assert np.max(np.abs(mapped[steady] - (100.0 + device_s[steady]))) < 1e-3
+
+def test_drift_is_tracked():
+    device_s = np.arange(0, 60, 0.01)
+    host_s = 5.0 + device_s * (1 + 50e-6)                          # host clock 50 ppm fast
+    sync = ClockSync()
+    _feed(sync, np.rint(device_s * 1e6).astype(np.int64), host_s)
+    assert sync.drift_ppm == pytest.approx(50.0, abs=1.0)
+
+def test_counter_wrap_is_unwrapped():
+    sync = ClockSync()
+    before = sync.update(DEVICE_WRAP_US - 1000, 10.0)
+    after = sync.update(1000, 10.002)
+    assert after - before == pytest.approx(0.002, abs=1e-6)
+
+def test_device_restart_resets_state():
+    sync = ClockSync()
+    for i in range(3000):
+        sync.update(10_000_000 + i * 1000, 1.0 + i * 0.001)
+    assert sync.offset is not None
+    sync.update(500, 50.0)                                         # big step back, no wrap
+    assert sync.offset is None
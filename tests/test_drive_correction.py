@@ -0,0 +1,78 @@
+# test_drive_correction.py
+# Transfer function estimate and drive updates against a known linear table model.
+
+import numpy as np
+import pytest
+
+import drive_correction
+
+DT = 0.01
+
+def _table(drive):
+    """Second-order low-pass at 8 Hz (damping 0.3) behind a two-sample delay."""
+    from scipy import signal
+    b, a = signal.bilinear(*_table_analog(), fs=1 / DT)
+    return signal.lfilter(b, a, np.concatenate([np.zeros(2), drive[:-2]]))
+
+def _table_analog():
+    w = 2 * np.pi * 8.0
+    return [w * w], [1.0, 2 * 0.3 * w, w * w]
+
+def _table_response_at(freqs):
+    from scipy import signal
+    b, a = signal.bilinear(*_table_analog(), fs=1 / DT)
+    _, h = signal.freqz(b, a, worN=freqs, fs=1 / DT)
+    return h * np.exp(-2j * np.pi * freqs * 2 * DT)
+
+def _band_limited(n, f_max, seed):
+    spectrum = np.fft.rfft(np.random.default_rng(seed).normal(size=n))
+    spectrum[np.fft.rfftfreq(n, DT) > f_max] = 0
+    signal = np.fft.irfft(spectrum, n)
+    return 500 * signal / np.abs(signal).max()
+
+def test_h1_estimate_matches_the_known_system():
+    drive = _band_limited(20000, 45.0, 1)
+    response = _table(drive) + np.random.default_rng(2).normal(0, 5.0, drive.size)   # sensor noise
+    corrector = drive_correction.DriveCorrector(drive, DT)
+    corrector._accumulate(drive, response)
+    freqs, h, coherence = corrector.transfer_function()
+    band = (freqs > 0.5) & (freqs < 20.0)
+    expected = _table_response_at(freqs[band])
+    np.testing.assert_allclose(np.abs(h[band]), np.abs(expected), rtol=0.05)
+    phase_error = np.angle(h[band] / expected)
+    assert np.max(np.abs(phase_error)) < 0.05
+    assert coherence[band].min() > 0.8
+
+def test_regularized_inverse_converges_on_the_known_system():
+    reference = _band_limited(4000, 10.0, 3)
+    corrector = drive_correction.DriveCorrector(reference, DT, gain=0.8)
+    for _ in range(5):
+        corrector.update(_table(corrector.drive))
+    assert corrector.history[0] > 0.3                    # the plain reference tracks poorly
+    assert corrector.history[-1] < 0.1 * corrector.history[0]
+    assert all(np.diff(corrector.history) < 0)
+
+def test_incoherent_band_is_left_untouched():
+    # The table only responds up to 5 Hz; above that the capture is pure noise
+    from scipy import signal
+    reference = _band_limited(4000, 20.0, 4)
+    b, a = signal.butter(6, 5.0, fs=1 / DT)
+    response = signal.filtfilt(b, a, reference) + np.random.default_rng(5).normal(0, 20.0, reference.size)
+    corrector = drive_correction.DriveCorrector(reference, DT, gain=1.0)
+    corrector.update(response)
+    change = np.abs(np.fft.rfft(corrector.drive - reference))
+    freqs = np.fft.rfftfreq(reference.size, DT)
+    limit = drive_correction.DRIVE_LIMIT_FACTOR * np.abs(reference).max()
+    assert np.abs(corrector.drive).max() <= limit
+    assert np.sum(change[freqs > 12.0] ** 2) < 0.01 * np.sum(change ** 2)
+
+def test_rejects_short_records():
+    with pytest.raises(ValueError, match="too short"):
+        drive_correction.DriveCorrector(np.ones(10), DT)
+
+def test_converges_on_a_gain_error():
+    reference = 500 * np.sin(2 * np.pi * 1.0 * np.arange(2000) * DT)
+    corrector = drive_correction.DriveCorrector(reference, DT, gain=1.0)
+    ratios = [corrector.update(0.8 * corrector.drive) for _ in range(4)]
+    assert ratios[0] == pytest.approx(0.2, rel=0.01)
+    assert ratios[-1] < 0.02
@@ -0,0 +1,70 @@
+# test_excitation.py
+# Length, peak and spectral content of the synthesized excitations.
+
+import numpy as np
+import pytest
+
+import excitation
+
+RATE = 500.0
+
+def _spectrum(positions):
+    amps = np.abs(np.fft.rfft(positions - positions.mean()))
+    return np.fft.rfftfreq(positions.size, 1.0 / RATE), amps
+
+def _band_energy(freqs, amps, f_min, f_max):
+    band = (freqs >= f_min) & (freqs <= f_max)
+    return np.sum(amps[band] ** 2) / np.sum(amps ** 2)
+
+@pytest.mark.parametrize("kind", excitation.KINDS)
+def test_length_and_peak(kind):
+    positions = excitation.synthesize(kind, 1600, 8.0, RATE, frequency=2.0, f_min=1.0, f_max=20.0)
+    assert positions.size == 4000 and positions.dtype == np.int64
+    assert np.abs(positions).max() == 1600
+    if kind != "step train":
+        assert abs(positions[0]) <= 1 and abs(positions[-1]) <= 16      # faded in and out
+
+def test_sine_frequency():
+    freqs, amps = _spectrum(excitation.synthesize("sine", 1000, 10.0, RATE, frequency=3.0))
+    assert freqs[np.argmax(amps)] == pytest.approx(3.0)
+
+@pytest.mark.parametrize("kind", ["linear chirp", "log chirp", "multisine", "noise"])
+def test_broadband_content_stays_in_band(kind):
+    freqs, amps = _spectrum(excitation.synthesize(kind, 1000, 20.0, RATE, f_min=2.0, f_max=15.0).astype(float))
+    assert _band_energy(freqs, amps, 1.5, 16.0) > 0.97
+    # The band is covered, not just one tone
+    assert _band_energy(freqs, amps, 2.0, 5.0) > 0.05 and _band_energy(freqs, amps, 10.0, 15.0) > 0.05
+
+def test_log_chirp_spends_equal_time_per_octave():
+    t = excitation.time_vector(16.0, RATE)
+    signal = excitation.log_chirp(t, 1.0, 16.0, 16.0)
+    crossings = np.flatnonzero(np.diff(np.signbit(signal)))
+    # Four octaves in 16 s: the zero-crossing rate doubles every 4 s
+    per_octave = np.histogram(t[crossings], bins=[0, 4, 8, 12, 16])[0]
+    np.testing.assert_allclose(per_octave[1:] / per_octave[:-1], 2.0, rtol=0.05)
+
+def test_multisine_has_low_crest_factor():
+    signal = excitation.schroeder_multisine(10000, RATE, 1.0, 20.0)
+    crest = np.max(np.abs(signal)) / np.sqrt(np.mean(signal ** 2))
+    assert crest < 2.0
+
+def test_step_train_levels():
+    positions = excitation.synthesize("step train", 100, 2.0, RATE, frequency=1.0)
+    # 0.25 s per level: 0, +100, 0, -100, repeated
+    levels = positions[::int(0.25 * RATE)]
+    assert levels.tolist() == [0, 100, 0, -100, 0, 100, 0, -100]
+
+def test_invalid_requests_are_rejected():
+    with pytest.raises(ValueError):
+        excitation.synthesize("sine", 100, 1.0, RATE, frequency=RATE / 2)
+    with pytest.raises(ValueError):
+        excitation.synthesize("log chirp", 100, 1.0, RATE, f_min=0.0)
+    with pytest.raises(ValueError):
+        excitation.synthesize("square", 100, 1.0, RATE)
+
+def test_noise_is_repeatable_and_cached():
+    first, interval = excitation.get_excitation("noise", 500, 4.0, RATE, seed=3)
+    again, _ = excitation.get_excitation("noise", 500, 4.0, RATE, seed=3)
+    assert again is first and interval == 1 / RATE
+    np.testing.assert_array_equal(excitation.synthesize("noise", 500, 4.0, RATE, seed=3), first)
+    assert not np.array_equal(excitation.synthesize("noise", 500, 4.0, RATE, seed=4), first)
@@ -0,0 +1,58 @@
+# test_fdsn_fetcher.py
+# FDSN fetcher against the local stand-in server: output records and the
+# content cache serving a repeated fetch without touching the network.
+
+import os
+import sys
+import threading
+
+import pytest
+
+UTILITIES_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "utilities")
+sys.path.insert(0, os.path.abspath(UTILITIES_DIR))
+
+import fdsn_fetcher  # noqa: E402
+import fdsn_standin_server  # noqa: E402
+
+EVENTS = [
+    {"name": "first", "time": "2021-07-29T06:15:49", "pre": 30, "post": 90,
+     "stations": ["IU.COL", "IU.ANMO"], "channel": "BH?"},
+    {"name": "second", "time": "2022-01-01T00:00:00", "pre": 10, "post": 50,
+     "stations": ["IU.ANMO"], "channel": "BH?"},
+    {"name": "no-data", "time": "2022-01-01T00:00:00", "stations": ["XX.NONE"]},
+]
+
+@pytest.fixture
+def standin():
+    server = fdsn_standin_server.make_server(port=0, stations=["IU.ANMO"])
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield f"http://127.0.0.1:{server.server_address[1]}"
+    server.shutdown()
+    server.server_close()
+
+def _requests():
+    with fdsn_standin_server.StandinHandler.count_lock:
+        return fdsn_standin_server.StandinHandler.request_count
+
+def test_second_fetch_is_served_from_the_cache(standin, tmp_path):
+    from obspy import read
+    cache_dir = str(tmp_path / "cache")
+    before = _requests()
+    first = fdsn_fetcher.ContentCache(cache_dir)
+    written = fdsn_fetcher.fetch_events(EVENTS, standin, str(tmp_path / "out1"), workers=4, cache=first)
+    # 4 waveform queries (one without data for IU.COL, one for XX.NONE) and 2 station queries
+    assert first.misses == _requests() - before == 6 and first.hits == 0
+    assert [os.path.basename(p) for p in written] == ["first_IU.ANMO.mseed", "second_IU.ANMO.mseed"]
+    stream = read(written[0])
+    assert len(stream) == 3 and stream[0].data.dtype.kind == "f"
+    assert 1e-7 < abs(stream[0].data).max() < 1e-2                     # m/s, response removed
+
+    # A new process-level cache reads the index from disk: no request reaches the server
+    before = _requests()
+    second = fdsn_fetcher.ContentCache(cache_dir)
+    again = fdsn_fetcher.fetch_events(EVENTS, standin, str(tmp_path / "out2"), workers=4, cache=second)
+    assert _requests() == before
+    assert second.misses == 0 and second.hits == 6
+    for path_a, path_b in zip(written, again):
+        assert open(path_a, "rb").read() == open(path_b, "rb").read()
@@ -0,0 +1,68 @@
+# test_instrumentation.py
+# Histogram percentiles against exact ones, and the disabled fast path.
+
+import numpy as np
+import pytest
+
+import instrumentation
+
+@pytest.fixture
+def enabled():
+    instrumentation.reset()
+    instrumentation.enable(True)
+    yield
+    instrumentation.enable(False)
+    instrumentation.reset()
+
+def test_small_values_are_exact():
+    hist = instrumentation.Histogram()
+    for value in range(1, 11):
+        hist.record(value)
+    assert hist.percentile(50) == 5
+    assert hist.percentile(100) == 10
+    assert instrumentation.Histogram().percentile(99) == 0
+
+def test_percentiles_within_bucket_resolution():
+    # Log-normal latencies from ~10 us to ~10 ms
+    values = np.random.default_rng(2).lognormal(np.log(2e5), 1.2, 20000).astype(np.int64)
+    hist = instrumentation.Histogram()
+    for value in values:
+        hist.record(value)
+    resolution = 1.0 / (1 << instrumentation.SUB_BUCKET_BITS)
+    for p in (50, 90, 99, 99.9):
+        exact = np.percentile(values, p, method="inverted_cdf")
+        assert exact <= hist.percentile(p) <= exact * (1 + resolution)
+    assert hist.percentile(100) == hist.max == values.max()
+    assert hist.total == values.sum() and hist.count == values.size
+
+def test_huge_values_land_in_the_last_bucket():
+    hist = instrumentation.Histogram()
+    hist.record(1 << 60)
+    hist.record(-5)                                      # clamped to zero
+    assert hist.counts[-1] == 1 and hist.counts[0] == 1
+    assert hist.percentile(100) == 1 << 60
+
+def test_snapshot_in_milliseconds(enabled):
+    for value_ns in (1_000_000, 2_000_000, 3_000_000):
+        instrumentation.record("loop", value_ns)
+    instrumentation.count("lines", 3)
+    instrumentation.gauge("device.loop", 183000)
+    with instrumentation.span("block"):
+        pass
+    snap = instrumentation.snapshot()
+    loop = snap['histograms']['loop']
+    assert loop['count'] == 3 and loop['mean_ms'] == pytest.approx(2.0)
+    assert 2.0 <= loop['p50_ms'] <= 2.0 * 1.0625 and loop['max_ms'] == 3.0
+    assert snap['histograms']['block']['count'] == 1
+    assert snap['counters'] == {'lines': 3} and snap['gauges'] == {'device.loop': 183000}
+
+def test_disabled_records_nothing():
+    instrumentation.reset()
+    instrumentation.enable(False)
+    instrumentation.record("loop", 5)
+    instrumentation.count("lines")
+    with instrumentation.span("block"):
+        pass
+    lock = object()
+    assert instrumentation.locked(lock, "lock") is lock
+    assert instrumentation.snapshot()['histograms'] == {} and instrumentation.snapshot()['counters'] == {}
@@ -0,0 +1,70 @@
+# test_kinematics.py
+# Savitzky-Golay derivative taps and the batched velocity/acceleration estimator.
+
+import numpy as np
+import pytest
+
+import app_state
+import kinematics
+
+@pytest.mark.parametrize("window", [5, 9, 40])
+def test_derivative_filters_exact_on_cubics(window):
+    # The newest sample is tau = 0: for p(tau) = 2 - 3 tau + 0.5 tau^2 + 0.1 tau^3,
+    # p'(0) = -3 and p''(0) = 1
+    tau = np.arange(window, dtype=np.float64) - (window - 1)
+    p = 2 - 3 * tau + 0.5 * tau ** 2 + 0.1 * tau ** 3
+    velocity, acceleration = kinematics.derivative_filters(window) @ p
+    assert velocity == pytest.approx(-3.0)
+    assert acceleration == pytest.approx(1.0)
+
+def _sine(duration_s=20.0, rate=1000.0, freq=2.0, amplitude_deg=45.0):
+    t = np.arange(int(duration_s * rate)) / rate
+    return t, amplitude_deg * np.sin(2 * np.pi * freq * t)
+
+def test_estimator_tracks_sine_acceleration():
+    t, angles = _sine()
+    estimator = kinematics.KinematicsEstimator()
+    times, velocity, acceleration = estimator.update(t, kinematics.degrees_to_steps(angles))
+    omega = 2 * np.pi * 2.0
+    amplitude = kinematics.degrees_to_steps(45.0)
+    expected_v = amplitude * omega * np.cos(omega * times)
+    expected_a = -amplitude * omega ** 2 * np.sin(omega * times)
+    assert np.sqrt(np.mean((velocity - expected_v) ** 2)) / np.abs(expected_v).max() < 0.02
+    assert np.sqrt(np.mean((acceleration - expected_a) ** 2)) / np.abs(expected_a).max() < 0.15
+
+def test_estimator_batches_match_one_batch():
+    t, angles = _sine(duration_s=2.0)
+    positions = kinematics.degrees_to_steps(angles)
+    whole = kinematics.KinematicsEstimator().update(t, positions)
+    estimator = kinematics.KinematicsEstimator()
+    parts = [estimator.update(t[i:i + 17], positions[i:i + 17]) for i in range(0, t.size, 17)]
+    for k in range(3):
+        np.testing.assert_allclose(np.concatenate([part[k] for part in parts]), whole[k], rtol=1e-6, atol=1e-6)
+
+def test_estimator_restarts_after_gap():
+    estimator = kinematics.KinematicsEstimator()
+    t = np.arange(200) * 0.001
+    estimator.update(t, np.zeros_like(t))
+    times, _, _ = estimator.update(t + 10.0, np.zeros_like(t))
+    window = int(round(kinematics.WINDOW_S / 0.001))
+    assert times.size == t.size - (window - 1)
+    assert times[0] == pytest.approx(10.0 + (window - 1) * 0.001)
+
+def test_process_pending_fills_app_state():
+    kinematics._pending.clear()
+    kinematics.estimator.reset()
+    with app_state.data_lock:
+        app_state.velocity_data.clear()
+        app_state.acceleration_data.clear()
+    t, angles = _sine(duration_s=0.5)
+    for sample in zip(t.tolist(), angles.tolist()):
+        kinematics.feed(*sample)
+    count = kinematics.process_pending()
+    assert count > 0
+    assert len(app_state.acceleration_data) == min(count, app_state.acceleration_data.maxlen)
+    assert not kinematics._pending
+
+def test_target_acceleration_of_parabola():
+    t = np.arange(100) * 0.01
+    np.testing.assert_allclose(kinematics.target_acceleration(3.0 * t ** 2, 0.01)[2:-2], 6.0)
+    assert kinematics.target_acceleration([1.0, 2.0], 0.01).tolist() == [0.0, 0.0]
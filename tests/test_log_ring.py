@@ -0,0 +1,50 @@
+# test_log_ring.py
+# Console rings: sampling, wrap-around, and streamed commands kept apart from
+# the operator's messages.
+
+import pytest
+
+import log_ring
+import serial_handler
+
+@pytest.fixture
+def rings():
+    for ring in (log_ring.messages, log_ring.motion, log_ring.telemetry):
+        ring.clear()
+    yield log_ring
+    for ring in (log_ring.messages, log_ring.motion, log_ring.telemetry):
+        ring.clear()
+
+def test_since_returns_new_events_and_wraps():
+    ring = log_ring.LogRing(8)
+    for i in range(5):
+        ring.append(log_ring.KIND_INFO, i)
+    head, events = ring.since(0)
+    assert head == 5 and [e[3] for e in events] == [0, 1, 2, 3, 4]
+    for i in range(5, 20):
+        ring.append(log_ring.KIND_INFO, i)
+    head, events = ring.since(head)
+    assert head == 20 and [e[3] for e in events] == list(range(12, 20))   # the rest was overwritten
+
+def test_since_samples_and_limits():
+    ring = log_ring.LogRing(1000)
+    for i in range(1000):
+        ring.append(log_ring.KIND_TELEMETRY, i)
+    _, events = ring.since(0, every=100)
+    assert [e[0] for e in events] == list(range(0, 1000, 100))
+    _, events = ring.since(0, limit=3, every=10)
+    assert [e[3] for e in events] == [970, 980, 990]
+    ring.clear()
+    assert ring.since(1000) == (0, [])
+
+def test_streamed_commands_keep_operator_messages(rings, fake_serial):
+    fake = fake_serial()
+    serial_handler.send_command("s1200000")
+    for position in range(2 * log_ring.messages.capacity):
+        serial_handler.send_command(f"m{position}", stream=True)
+    serial_handler.send_command("m0")                       # typed by the operator
+    _, messages = log_ring.messages.since(0)
+    assert [e[3] for e in messages] == ["s1200000", "m0"]
+    head, motion = log_ring.motion.since(0, limit=1)
+    assert head == 2 * log_ring.messages.capacity and motion[0][3] == f"m{head - 1}"
+    assert len(fake.writes) == head + 2
@@ -0,0 +1,47 @@
+# test_performance_envelope.py
+# Octave-band check of trajectories against the mapped operating envelope.
+
+import json
+
+import numpy as np
+import pytest
+
+import performance_envelope
+
+@pytest.fixture
+def envelope(tmp_path, monkeypatch):
+    """A map measured at 100 Hz commands: amplitude * frequency <= 1600 tracked."""
+    points = [dict(speed=600000, acceleration=200000, command_rate=100, frequency=f, amplitude=a,
+                   feasible=a <= 1600 / f) for f in (1.0, 5.0, 20.0) for a in (10, 50, 200, 800, 1600)]
+    path = tmp_path / "performance_envelope.json"
+    path.write_text(json.dumps({'points': points}))
+    monkeypatch.setattr(performance_envelope, "get_envelope_path", lambda: str(path))
+    return points
+
+T = np.arange(60000) * 0.01
+SLOW = 700 * np.sin(2 * np.pi * 0.3 * T)
+FAST = SLOW + 300 * np.sin(2 * np.pi * 8.0 * T)
+
+def test_band_peaks_split_components():
+    edges, peaks = performance_envelope.band_peaks(FAST, 0.01)
+    assert peaks[np.searchsorted(edges, 0.3)] == pytest.approx(700, rel=0.02)
+    assert peaks[np.searchsorted(edges, 8.0)] == pytest.approx(300, rel=0.02)
+
+def test_trajectory_inside_envelope(envelope):
+    assert performance_envelope.check_trajectory(SLOW, 0.01, 600000, 200000) == []
+
+def test_trajectory_outside_envelope(envelope):
+    violations = performance_envelope.check_trajectory(FAST, 0.01, 600000, 200000)
+    assert len(violations) == 1 and "12.8 Hz" in violations[0]
+
+def test_unmapped_settings_are_not_checked(envelope):
+    assert performance_envelope.check_trajectory(FAST, 0.01, 300000, 200000) == []
+
+def test_unmapped_command_rate_is_refused(envelope):
+    # Tracking at 100 Hz commands says nothing about 250 Hz commands
+    violations = performance_envelope.check_trajectory(SLOW, 0.004, 600000, 200000)
+    assert violations and "not mapped" in violations[0]
+
+def test_no_map_means_no_check(tmp_path, monkeypatch):
+    monkeypatch.setattr(performance_envelope, "get_envelope_path", lambda: str(tmp_path / "missing.json"))
+    assert performance_envelope.check_trajectory(FAST, 0.01) == []
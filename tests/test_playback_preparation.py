@@ -0,0 +1,33 @@
+# test_playback_preparation.py
+# Record -> displacement commands: scaling, resampling to the command rate and
+# strong-motion trimming.
+
+import numpy as np
+import pytest
+
+import seismic_handler as sh
+
+def test_record_rate_and_amplitude(burst_trace):
+    positions, interval = sh._prepare_trace_for_playback(burst_trace, 1600)
+    assert len(positions) == burst_trace.stats.npts
+    assert interval == pytest.approx(burst_trace.stats.delta)
+    assert np.abs(positions).max() == 1600
+
+def test_resampled_with_similitude(burst_trace):
+    positions, interval = sh._prepare_trace_for_playback(burst_trace, 1600, 137.0, 4.0)
+    duration = burst_trace.stats.npts * burst_trace.stats.delta / 2.0
+    assert interval == pytest.approx(1 / 137.0, rel=0.01)
+    assert len(positions) * interval == pytest.approx(duration, rel=0.01)
+    assert np.abs(positions).max() == 1600
+
+def test_trimmed_to_strong_motion(burst_trace):
+    # The burst is centred at 40 s of 120 s: pre-event and coda are dropped
+    positions, interval = sh._prepare_trace_for_playback(burst_trace, 1600, 0.0, 1.0, 0.0, (5.0, 10.0))
+    start, end = sh.strong_motion.trace_windows([burst_trace], 5.0, 10.0)[0]
+    assert len(positions) * interval == pytest.approx(end - start, abs=interval)
+    assert 20.0 < end - start < 0.6 * burst_trace.stats.npts * burst_trace.stats.delta
+
+def test_silent_trace_is_rejected(burst_trace):
+    burst_trace.data[:] = 0
+    with pytest.raises(ValueError):
+        sh._prepare_trace_for_playback(burst_trace, 1600)
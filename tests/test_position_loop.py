@@ -0,0 +1,48 @@
+# test_position_loop.py
+# Bounded PI correction of the stepper target from encoder feedback.
+
+import numpy as np
+import pytest
+
+import position_loop
+
+STEP_DEG = 360.0 / 3200
+
+def test_compensates_lost_steps_within_limit():
+    """A table that loses one step per command while moving forward."""
+    reference = (800 * np.sin(2 * np.pi * 0.5 * np.arange(10000) * 0.01)).astype(int)
+    corrector = position_loop.PositionCorrector(0.01, 0.3, 2.0, 400, 0.0, baseline_angle=0.0)
+    missed = 0
+    for position in reference.tolist():
+        actual = position + corrector.output - missed
+        missed += 1 if position > 0 else 0
+        corrector.update(position, actual * STEP_DEG, 0.0, now=0.0)
+    rms, peak, effort = corrector.summary()
+    assert effort <= 400
+    assert abs(corrector.errors[-1]) < missed
+    assert peak <= missed
+
+def test_output_is_clipped_and_integrator_bounded():
+    corrector = position_loop.PositionCorrector(0.01, 1.0, 5.0, 50, 0.0, baseline_angle=0.0)
+    for _ in range(1000):
+        correction = corrector.update(1000, 0.0, 0.0, now=0.0)
+    assert correction == 50
+    assert corrector.integral <= 50 / 5.0
+
+def test_reference_is_delayed():
+    corrector = position_loop.PositionCorrector(0.01, 1.0, 0.0, 1000, 0.03, baseline_angle=0.0)
+    errors = [corrector.update(reference, 0.0, 0.0, now=0.0) for reference in (10, 20, 30, 40, 50)]
+    # Three samples of delay: the error uses the reference sent three commands earlier
+    assert errors == [10, 10, 10, 10, 20]
+
+def test_stale_telemetry_holds_last_correction():
+    corrector = position_loop.PositionCorrector(0.01, 1.0, 0.0, 1000, 0.0, baseline_angle=0.0)
+    assert corrector.update(10, 0.0, 0.0, now=0.0) == 10
+    assert corrector.update(500, 0.0, 0.0, now=position_loop.STALE_TELEMETRY_S + 1.0) == 10
+    assert corrector.update(500, None, 0.0, now=0.0) == 10
+    assert len(corrector.errors) == 1
+
+def test_baseline_angle_is_the_zero():
+    corrector = position_loop.PositionCorrector(0.01, 1.0, 0.0, 1000, 0.0, baseline_angle=90.0)
+    assert corrector.update(0, 90.0, 0.0, now=0.0) == 0
+    assert corrector.errors[-1] == pytest.approx(0.0)
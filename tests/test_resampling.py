@@ -0,0 +1,40 @@
+# test_resampling.py
+# Rate conversion to the command rate and similitude time compression.
+
+import numpy as np
+import pytest
+
+import resampling
+
+@pytest.mark.parametrize("rate_in, rate_out", [(100.0, 137.0), (200.0, 100.0), (40.0, 250.0), (100.0, 33.3)])
+def test_rational_factors_are_bounded_and_close(rate_in, rate_out):
+    up, down = resampling.rational_factors(rate_in, rate_out)
+    assert 1 <= up <= resampling.MAX_FACTOR and 1 <= down <= resampling.MAX_FACTOR
+    assert up / down == pytest.approx(rate_out / rate_in, rel=0.01)
+
+def test_rational_factors_reject_bad_rates():
+    with pytest.raises(ValueError):
+        resampling.rational_factors(0.0, 100.0)
+
+@pytest.mark.parametrize("rate_out", [137.0, 250.0, 60.0])
+def test_passband_gain_is_one(rate_out):
+    rate_in, freq = 100.0, 2.0
+    t = np.arange(6000) / rate_in
+    samples, interval = resampling.resample(np.sin(2 * np.pi * freq * t), rate_in, rate_out)
+    assert interval == pytest.approx(1.0 / rate_out, rel=0.01)
+    out_t = np.arange(samples.size) * interval
+    core = slice(samples.size // 10, -samples.size // 10)
+    # Least-squares amplitude and phase of the 2 Hz component
+    design = np.column_stack([np.sin(2 * np.pi * freq * out_t), np.cos(2 * np.pi * freq * out_t)])[core]
+    coefficients, *_ = np.linalg.lstsq(design, samples[core], rcond=None)
+    assert np.hypot(*coefficients) == pytest.approx(1.0, abs=0.01)
+    assert abs(coefficients[1]) < 0.01        # no delay
+    assert samples.size * interval == pytest.approx(t.size / rate_in, rel=0.01)
+
+def test_keeps_record_rate_and_compresses_time():
+    data = np.arange(100.0)
+    samples, interval = resampling.resample(data, 100.0, 0.0)
+    np.testing.assert_array_equal(samples, data)
+    assert interval == pytest.approx(0.01)
+    samples, interval = resampling.resample(data, 100.0, 0.0, similitude_scale=4.0)
+    assert interval == pytest.approx(0.005)
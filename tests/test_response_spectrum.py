@@ -0,0 +1,83 @@
+# test_response_spectrum.py
+# Oscillator recursion against a continuous-time simulation, batching, the
+# spectrum cache and ranking.
+
+import numpy as np
+import pytest
+
+import response_spectrum as rs
+
+def _lsim_peak_displacement(accel, dt, period, damping):
+    from scipy import signal
+    w = 2 * np.pi / period
+    # u'' + 2 z w u' + w^2 u = -a(t); lsim interpolates the input linearly between
+    # samples, the same excitation the Nigam-Jennings recursion is exact for
+    system = signal.StateSpace([[0.0, 1.0], [-w * w, -2 * damping * w]], [[0.0], [-1.0]], [[1.0, 0.0]], [[0.0]])
+    t = np.arange(accel.size) * dt
+    _, displacement, _ = signal.lsim(system, accel, t)
+    return np.max(np.abs(displacement))
+
+def test_matches_lsim():
+    dt = 0.01
+    accel = np.random.default_rng(5).normal(size=2000) * np.hanning(2000)
+    periods = np.array([0.05, 0.2, 1.0, 4.0])
+    _, psa = rs.response_spectrum(accel, dt, periods, 0.05)
+    expected = np.array([_lsim_peak_displacement(accel, dt, T, 0.05) for T in periods]) * (2 * np.pi / periods) ** 2
+    np.testing.assert_allclose(psa, expected, rtol=1e-6)
+
+def test_rigid_oscillator_follows_ground():
+    # At very short periods the PSA tends to the peak ground acceleration
+    t = np.arange(4000) * 0.01
+    accel = np.sin(2 * np.pi * 0.5 * t)
+    _, psa = rs.response_spectrum(accel, 0.01, [0.01], 0.05)
+    assert psa[0] == pytest.approx(1.0, rel=0.02)
+
+def test_batched_spectra_match_single_records():
+    rng = np.random.default_rng(9)
+    accels = [rng.normal(size=n) for n in (1500, 1500, 1500, 900)]
+    records = [(("record", i), (lambda a=a: (a, 0.01))) for i, a in enumerate(accels)]
+    records.append((("broken",), lambda: 1 / 0))
+    rs.clear_cache()
+    matrix = rs.batch_response_spectra(records, max_workers=2)
+    for row, accel in enumerate(accels):
+        np.testing.assert_allclose(matrix[row], rs.response_spectrum(accel, 0.01)[1], rtol=1e-12)
+    assert np.isnan(matrix[-1]).all()
+    # Second call is served from the cache without loading the records
+    cached = rs.batch_response_spectra([(("record", 0), lambda: 1 / 0)])
+    np.testing.assert_array_equal(cached[0], matrix[0])
+    rs.clear_cache()
+
+@pytest.mark.filterwarnings("ignore:Mean of empty slice")      # the failed record's NaN row
+def test_rank_against_target_scales_and_orders():
+    periods = rs.DEFAULT_PERIODS
+    target = np.exp(-np.log(periods) ** 2)
+    matrix = np.vstack([3.0 * target, target * (1 + 0.5 * np.sin(periods)), np.full(periods.size, np.nan)])
+    order, misfits, scales = rs.rank_against_target(matrix, periods, periods, target)
+    assert order.tolist() == [0, 1, 2]
+    assert misfits[0] == pytest.approx(0.0, abs=1e-12)
+    assert scales[0] == pytest.approx(1 / 3.0)
+    assert misfits[2] == np.inf
+
+def test_cache_tells_period_grids_apart():
+    # Same size and end points, different interior periods
+    accel = np.random.default_rng(3).normal(size=1000)
+    log_grid = np.logspace(-1, 0, 5)
+    linear_grid = np.linspace(0.1, 1.0, 5)
+    rs.clear_cache()
+    _, psa_log = rs.cached_response_spectrum("record", lambda: (accel, 0.01), log_grid)
+    _, psa_linear = rs.cached_response_spectrum("record", lambda: (accel, 0.01), linear_grid)
+    np.testing.assert_allclose(psa_linear, rs.response_spectrum(accel, 0.01, linear_grid)[1])
+    assert not np.allclose(psa_log, psa_linear)
+    rs.clear_cache()
+
+def test_cache_evicts_least_recently_used(monkeypatch):
+    monkeypatch.setattr(rs, "MAX_CACHE_ENTRIES", 2)
+    accel = np.random.default_rng(4).normal(size=500)
+    periods = np.array([0.1, 1.0])
+    rs.clear_cache()
+    for key in ("a", "b"):
+        rs.cached_response_spectrum(key, lambda: (accel, 0.01), periods)
+    rs.cached_response_spectrum("a", lambda: 1 / 0, periods)              # hit, a is now newest
+    rs.batch_response_spectra([("c", lambda: (accel, 0.01))], periods)
+    assert [full_key[0] for full_key in rs._cache] == ["a", "c"]
+    rs.clear_cache()
@@ -0,0 +1,81 @@
+# test_serial_handler.py
+# Emergency stop path, telemetry rate budget and device report lines.
+
+import threading
+
+import pytest
+
+import app_state
+import serial_handler
+
+def test_emergency_stop_latches_and_releases(fake_serial):
+    fake = fake_serial()
+    assert serial_handler.emergency_stop()
+    assert fake.writes[-1] == b"\nx\n"
+    assert app_state.emergency_stop_latched
+    serial_handler.send_command("m100")
+    assert fake.writes[-1] == b"\nx\n"                # motion is blocked while latched
+
+    fake_serial([b"!x,123456,12\r\n"])
+    serial_handler.read_serial_thread()
+    assert "acknowledged" in app_state.stop_status
+    serial_handler.release_emergency_stop()
+    assert app_state.ser.writes == [b"c\n"]               # clears the firmware latch too
+    serial_handler.send_command("m100")
+    assert app_state.ser.writes[-1] == b"m100\n"
+
+def test_emergency_stop_never_writes_without_the_port(fake_serial):
+    fake = fake_serial()
+    holder_ready, release = threading.Event(), threading.Event()
+
+    def hold_port():
+        with serial_handler._write_lock:
+            holder_ready.set()
+            release.wait(5.0)
+
+    holder = threading.Thread(target=hold_port)
+    holder.start()
+    holder_ready.wait(5.0)
+    try:
+        assert not serial_handler.emergency_stop()
+        assert fake.writes == []
+        assert "busy" in app_state.stop_status
+        serial_handler.send_command("h")               # other writers stay shut out
+        assert fake.writes == []
+    finally:
+        release.set()
+        holder.join()
+    serial_handler.release_emergency_stop()
+    assert fake.writes == [b"c\n"]
+
+@pytest.mark.parametrize("baud, rate", [(9600, 100), (115200, 250), (921600, 1000)])
+def test_max_telemetry_rate_fits_the_link(baud, rate):
+    assert serial_handler.max_telemetry_rate(baud) == rate
+    bytes_per_s = rate * serial_handler.TELEMETRY_LINE_BYTES
+    assert bytes_per_s <= baud / 10 or rate == serial_handler.TELEMETRY_RATES_HZ[0]
+
+def test_set_telemetry_rate_is_capped(fake_serial, monkeypatch):
+    fake = fake_serial()
+    monkeypatch.setattr(app_state, "serial_baud", 115200)
+    monkeypatch.setattr(app_state, "telemetry_rate_hz", 250)
+    assert serial_handler.set_telemetry_rate(1000) == 250
+    assert fake.writes[-1] == b"r250\n"
+    assert app_state.telemetry_rate_hz == 1000            # the operator's choice is kept
+
+def test_dropped_samples_report_is_counted(fake_serial, monkeypatch):
+    monkeypatch.setattr(app_state, "telemetry_dropped_samples", 0)
+    fake_serial([b"!d,5000000,17\r\n", b"!d,6000000,3\r\n"])
+    serial_handler.read_serial_thread()
+    assert app_state.telemetry_dropped_samples == 20
+
+def test_device_stats_line():
+    line = "#q,t=5000000,win=1000,loop=183000,cmd=512,ovf=0,jmax=41,jmean=3,spk=2,stq=7,drop=0,bad,x=y"
+    stats = serial_handler.parse_device_stats(line)
+    assert stats["cmd"] == 512 and stats["stq"] == 7 and stats["t"] == 5000000
+    assert "bad" not in stats and "x" not in stats
+
+def test_device_stats_line_is_stored(fake_serial):
+    app_state.device_stats_history.clear()
+    fake_serial([b"#q,t=1,loop=183000\r\n"])
+    serial_handler.read_serial_thread()
+    assert app_state.device_stats_history[-1][1]["loop"] == 183000
@@ -0,0 +1,105 @@
+# test_session_log.py
+# Session recording to the binary format, memory-mapped reading and replay.
+
+import time
+
+import numpy as np
+import pytest
+
+import app_state
+import session_log
+
+@pytest.fixture
+def sessions_folder(tmp_path, monkeypatch):
+    monkeypatch.setattr(session_log, "get_sessions_folder_path", lambda: str(tmp_path))
+    return tmp_path
+
+def _write_session(folder, n=5000, interval=0.001, name="test.session"):
+    records = np.zeros(n, dtype=session_log.RECORD_DTYPE)
+    records['t'] = np.arange(n) * interval
+    records['kind'] = np.where(np.arange(n) % 2, session_log.KIND_COMMAND, session_log.KIND_TELEMETRY)
+    records['value'] = np.arange(n)
+    path = folder / name
+    with open(path, "wb") as f:
+        f.write(session_log.FILE_MAGIC)
+        records.tofile(f)
+    return str(path)
+
+def test_recorder_writes_sorted_records(sessions_folder):
+    recorder = session_log.SessionRecorder()
+    path = recorder.start("run.session")
+    start = recorder._start
+    # Telemetry stamped with earlier device-mapped times arrives after the command
+    recorder.record(session_log.KIND_COMMAND, start + 0.010, 5.0)
+    recorder.record(session_log.KIND_TELEMETRY, start + 0.008, 1.5)
+    recorder._flush()
+    recorder.record(session_log.KIND_TELEMETRY, start + 0.009, 2.5)   # older than the flushed batch
+    recorder.stop()
+    records = session_log.open_session(path)
+    assert records['t'] == pytest.approx([0.008, 0.010, 0.010])
+    assert records['kind'].tolist() == [session_log.KIND_TELEMETRY, session_log.KIND_COMMAND,
+                                        session_log.KIND_TELEMETRY]
+    assert records['value'].tolist() == [1.5, 5.0, 2.5]
+    assert session_log.list_sessions() == ["run.session"]
+
+def test_open_session_rejects_other_files(sessions_folder):
+    path = sessions_folder / "bogus.session"
+    path.write_bytes(b"not a session file at all")
+    with pytest.raises(ValueError):
+        session_log.open_session(str(path))
+
+def test_index_of_is_a_binary_search(sessions_folder):
+    replay = session_log.SessionReplay(_write_session(sessions_folder))
+    assert replay.duration == pytest.approx(4.999)
+    assert replay.index_of(0.0) == 0
+    assert replay.index_of(1.0005) == 1001
+    assert replay.index_of(99.0) == replay.records.size
+
+def test_replay_feeds_plot_buffers(sessions_folder):
+    replay = session_log.SessionReplay(_write_session(sessions_folder))
+    replay.start(speed=None)
+    deadline = time.monotonic() + 5.0
+    while app_state.replay_position < replay.duration and time.monotonic() < deadline:
+        time.sleep(0.01)
+    replay.stop()
+    assert app_state.replay_position == pytest.approx(replay.duration)
+    assert list(app_state.y_data)[-1] == 4998.0            # last telemetry record
+    assert not app_state.replay_running
+
+def test_stopped_replay_does_not_clear_a_new_one(sessions_folder):
+    path = _write_session(sessions_folder)
+    first = session_log.SessionReplay(path)
+    first.start(speed=1.0)
+    first.stop()
+    assert not first._thread.is_alive()
+    second = session_log.SessionReplay(path)
+    second.start(speed=1.0)
+    time.sleep(0.05)
+    assert app_state.replay_running
+    second.stop()
+    assert not app_state.replay_running
+
+def test_replayed_telemetry_feeds_kinematics(sessions_folder):
+    # Table moving at a constant 90 deg/s, telemetry at 1 kHz
+    records = np.zeros(3000, dtype=session_log.RECORD_DTYPE)
+    records['t'] = np.arange(records.size) * 0.001
+    records['kind'] = session_log.KIND_TELEMETRY
+    records['value'] = 90.0 * records['t']
+    path = sessions_folder / "ramp.session"
+    with open(path, "wb") as f:
+        f.write(session_log.FILE_MAGIC)
+        records.tofile(f)
+    session_log.kinematics.estimator.reset()
+    session_log.kinematics._pending.clear()
+    replay = session_log.SessionReplay(str(path))
+    replay.start(speed=None)
+    deadline = time.monotonic() + 5.0
+    while app_state.replay_running and time.monotonic() < deadline:
+        if app_state.replay_position >= replay.duration:
+            replay.stop()
+        time.sleep(0.01)
+    assert session_log.kinematics.process_pending() > 0
+    velocity = np.array([v for _, v in app_state.velocity_data])
+    expected = session_log.kinematics.degrees_to_steps(90.0)
+    np.testing.assert_allclose(velocity, expected, rtol=1e-6)
+    assert app_state.velocity_data[-1][0] == pytest.approx(replay.duration)
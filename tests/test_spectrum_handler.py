@@ -0,0 +1,93 @@
+# test_spectrum_handler.py
+# Spectrum cache: LRU bound, one computation per key under concurrency, and
+# failures reaching every caller waiting on them.
+
+import threading
+import time
+
+import numpy as np
+import pytest
+
+import spectrum_handler
+
+@pytest.fixture(autouse=True)
+def empty_cache():
+    spectrum_handler.clear_cache()
+    yield
+    spectrum_handler.clear_cache()
+
+def _wait_in_flight(key, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while key not in spectrum_handler._in_flight:
+        assert time.monotonic() < deadline, "computation never started"
+        time.sleep(0.001)
+
+def test_amplitude_spectrum_peak():
+    t = np.arange(4000) * 0.01
+    freqs, amps = spectrum_handler.amplitude_spectrum(3.0 * np.sin(2 * np.pi * 5.0 * t), 100.0, window=None)
+    assert freqs[np.argmax(amps)] == pytest.approx(5.0, abs=freqs[1])
+    assert amps.max() == pytest.approx(3.0, rel=0.01)
+
+def test_least_recently_used_entry_is_evicted(monkeypatch):
+    monkeypatch.setattr(spectrum_handler, "MAX_CACHE_ENTRIES", 3)
+    for key in range(3):
+        spectrum_handler._cached(key, lambda key=key: key * 10)
+    spectrum_handler._cached(0, lambda: pytest.fail("hit recomputed"))     # 0 is now the newest
+    spectrum_handler._cached(3, lambda: 30)
+    assert list(spectrum_handler._cache) == [2, 0, 3]
+    assert spectrum_handler._cached(1, lambda: "recomputed") == "recomputed"
+    assert len(spectrum_handler._cache) == 3
+
+def test_concurrent_callers_compute_once():
+    calls, release = [], threading.Event()
+
+    def compute():
+        calls.append(threading.current_thread().name)
+        release.wait(5.0)
+        return object()
+
+    results = [None] * 6
+
+    def caller(i):
+        results[i] = spectrum_handler._cached("key", compute)
+
+    threads = [threading.Thread(target=caller, args=(i,)) for i in range(6)]
+    threads[0].start()
+    _wait_in_flight("key")
+    for thread in threads[1:]:
+        thread.start()
+    time.sleep(0.05)
+    release.set()
+    for thread in threads:
+        thread.join(5.0)
+    assert len(calls) == 1
+    assert all(result is results[0] for result in results)
+    assert "key" not in spectrum_handler._in_flight
+
+def test_failure_reaches_waiting_callers():
+    release = threading.Event()
+    errors = []
+
+    def compute():
+        release.wait(5.0)
+        raise RuntimeError("bad record")
+
+    def caller():
+        try:
+            spectrum_handler._cached("key", compute)
+        except RuntimeError as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=caller) for _ in range(4)]
+    threads[0].start()
+    _wait_in_flight("key")
+    for thread in threads[1:]:
+        thread.start()
+    time.sleep(0.05)
+    release.set()
+    for thread in threads:
+        thread.join(5.0)
+    assert len(errors) == 4 and all(str(e) == "bad record" for e in errors)
+    # Nothing is cached for the failed key, the next request computes again
+    assert "key" not in spectrum_handler._cache and "key" not in spectrum_handler._in_flight
+    assert spectrum_handler._cached("key", lambda: 1) == 1
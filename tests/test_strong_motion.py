@@ -0,0 +1,68 @@
+# test_strong_motion.py
+# Arias intensity, STA/LTA, strong-motion windows and their agreement with the
+# catalog's intensity measures.
+
+import numpy as np
+import pytest
+
+import catalog_index
+import strong_motion
+
+def test_arias_intensity_of_constant_acceleration():
+    dt, a = 0.01, 2.0
+    cumulative = strong_motion.arias_intensity(np.full(1000, a), dt)
+    assert cumulative[-1] == pytest.approx(np.pi / (2 * strong_motion.GRAVITY) * a * a * 10.0)
+    assert np.all(np.diff(cumulative) > 0)
+
+def test_significant_window_of_box():
+    acc = np.zeros(1000)
+    acc[200:400] = 1.0
+    arias, i_low, i_high = strong_motion.significant_window(acc, 0.01)
+    assert arias > 0
+    assert (i_low, i_high) == (209, 389)
+    assert strong_motion.significant_window(np.zeros(10), 0.01)[1:] == (0, 0)
+
+def test_sta_lta_matches_moving_averages():
+    energy_source = np.random.default_rng(3).normal(size=500)
+    ratio = strong_motion.sta_lta(energy_source, 5, 50)
+    energy = energy_source ** 2
+    for j in (49, 120, 499):
+        expected = energy[j - 4:j + 1].mean() / energy[j - 49:j + 1].mean()
+        assert ratio[j] == pytest.approx(expected)
+    assert np.all(ratio[:49] == 0)
+
+def test_windows_of_batched_records():
+    rng = np.random.default_rng(1234)
+    t = np.arange(60000) * 0.01
+    onsets = rng.uniform(100, 400, 20)
+    records = rng.normal(0, 0.01, (20, t.size)) + rng.normal(0, 1, (20, t.size)) * np.exp(
+        -((t - onsets[:, None] - 20) / 15) ** 2) * (t > onsets[:, None])
+    start, end = strong_motion.strong_motion_window(records, 0.01, 0.0, 0.0)
+    assert np.all(np.abs(start * 0.01 - onsets) < 5.0)
+    assert np.all((end - start) * 0.01 < 80.0)
+    one = strong_motion.strong_motion_window(records[3], 0.01, 0.0, 0.0)
+    assert (int(one[0]), int(one[1])) == (start[3], end[3])
+
+def test_padding_is_clipped_to_record():
+    acc = np.zeros(1000)
+    acc[10:990] = 1.0
+    start, end = strong_motion.strong_motion_window(acc, 0.01, 5.0, 10.0)
+    assert (start, end) == (0, 1000)
+
+def test_record_acceleration_matches_obspy_pipeline(burst_trace):
+    # The catalog used ObsPy's detrend / bandpass / differentiate; the batch version must agree
+    expected = burst_trace.copy()
+    expected.detrend('linear')
+    expected.filter('bandpass', freqmin=0.1, freqmax=20.0, corners=4, zerophase=True)
+    velocity, acceleration = strong_motion.record_acceleration(burst_trace.data, burst_trace.stats.delta)
+    np.testing.assert_allclose(velocity, expected.data, rtol=0, atol=1e-9 * np.abs(expected.data).max())
+    expected.differentiate()
+    np.testing.assert_allclose(acceleration, expected.data, rtol=0, atol=1e-9 * np.abs(expected.data).max())
+
+def test_catalog_and_playback_windows_agree(burst_trace):
+    measures = catalog_index.intensity_measures(burst_trace)
+    window = strong_motion.trace_windows([burst_trace], 0.0, 0.0)[0]
+    assert window == pytest.approx((measures['window_start'], measures['window_end']))
+    assert measures['window_end'] - measures['window_start'] >= measures['significant_duration']
+    # The burst is centred at 40 s
+    assert measures['window_start'] < 40.0 < measures['window_end']
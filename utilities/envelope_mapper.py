@@ -0,0 +1,279 @@
+"""
+Mapa de la envolvente de operacion de la mesa (generalizacion de stress_test.py).
+
+- Barre frecuencia x amplitud x frecuencia de comandos x (velocidad, aceleracion)
+  del motor. En cada punto se envia una senoidal corta con plazos absolutos y se
+  registran los comandos y la telemetria del encoder en buffers numpy
+  preasignados (sin listas que crecen sin limite).
+- El analisis de cada punto es vectorizado: un ajuste por minimos cuadrados de
+  la fundamental y sus armonicos (columnas seno/coseno) al comando y a la
+  respuesta da ganancia, fase y distorsion armonica (THD) de una vez, asi el
+  barrido queda limitado por el tiempo de mesa y no por el calculo.
+- Los puntos que exigen mas velocidad o aceleracion que la configurada se marcan
+  como inviables sin moverse, y dentro de una misma frecuencia se dejan de probar
+  amplitudes mayores despues del primer fallo.
+- El resultado se guarda en app/performance_envelope.json; la aplicacion
+  (app/performance_envelope.py) lo usa para rechazar reproducciones inviables.
+
+Uso:
+    python utilities/envelope_mapper.py [--port COM4] [--baud 921600] [--out archivo.json]
+"""
+import argparse
+import itertools
+import json
+import math
+import os
+import threading
+import time
+
+import numpy as np
+import serial
+
+# --- CONFIGURACION ---
+SERIAL_PORT = 'COM4'
+BAUD_RATE = 921600    # micro2nucleoV2
+
+STEPS_PER_REVOLUTION = 3200   # igual que app/drive_correction.py
+
+# Ejes del barrido
+FREQUENCIES_HZ = (0.5, 1.0, 2.0, 5.0, 10.0, 20.0, 35.6)
+AMPLITUDES_STEPS = (10, 50, 200, 800, 1600)
+COMMAND_RATES_HZ = (100, 250, 500)
+MOTOR_SETTINGS = ((600000, 200000), (1200000, 500000))   # (velocidad, aceleracion)
+
+# Cada punto: ciclos minimos, duracion minima y tiempo de asentamiento descartado
+POINT_CYCLES = 10
+POINT_MIN_SECONDS = 2.0
+SETTLE_SECONDS = 0.5
+REST_SECONDS = 0.5            # pausa en m0 entre puntos
+HARMONICS = 5                 # armonicos ajustados para la THD
+
+# Telemetria pedida al firmware ('r<hz>'): 500 Hz caben de sobra en 921600 baudios
+TELEMETRY_RATE_HZ = 500
+
+# Criterios de viabilidad
+GAIN_TOLERANCE = 0.1          # |ganancia - 1|
+PHASE_LIMIT_DEG = 30.0        # desfase maximo, en valor absoluto
+THD_LIMIT = 0.1
+
+ENVELOPE_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "app", "performance_envelope.json")
+# --- FIN DE LA CONFIGURACION ---
+
+
+class TableLink:
+    """Puerto serial con un hilo lector que guarda la telemetria en buffers numpy."""
+
+    def __init__(self, port, baudrate, capacity):
+        self.ser = serial.Serial(port, baudrate, timeout=1)
+        self.capacity = capacity
+        self.host_times = np.empty(capacity)
+        self.device_times = np.full(capacity, np.nan)
+        self.angles = np.empty(capacity)
+        self.count = 0
+        self.recording = False
+        self.is_running = True
+        self.reader_thread = threading.Thread(target=self._read_serial_thread, daemon=True)
+        self.reader_thread.start()
+
+    def _read_serial_thread(self):
+        while self.is_running:
+            try:
+                line = self.ser.readline().decode('utf-8').strip()
+                received = time.perf_counter()
+                if not line or line[0] in '#!' or not self.recording or self.count >= self.capacity:
+                    continue
+                # "<micros>,<grados>" (micro2nucleoV2) o solo "<grados>"
+                if ',' in line:
+                    device_us, angle = line.split(',', 1)
+                    self.device_times[self.count] = int(device_us) * 1e-6
+                else:
+                    angle = line
+                self.angles[self.count] = float(angle)
+                self.host_times[self.count] = received
+                self.count += 1
+            except (ValueError, UnicodeDecodeError, serial.SerialException):
+                pass
+
+    def start_recording(self):
+        self.count = 0
+        self.device_times[:] = np.nan
+        self.recording = True
+
+    def stop_recording(self):
+        """Devuelve (tiempos, angulos) grabados; con marcas del dispositivo, en el reloj del host."""
+        self.recording = False
+        n = self.count
+        host, device, angles = self.host_times[:n], self.device_times[:n], self.angles[:n]
+        if n and not np.isnan(device).any():
+            # La latencia minima es la mas representativa del desfase entre relojes
+            host = device + np.min(host - device)
+        return host.copy(), angles.copy()
+
+    def send(self, command):
+        self.ser.write(f"{command}\n".encode('utf-8'))
+
+    def close(self):
+        self.is_running = False
+        try:
+            self.send("m0")
+            time.sleep(0.2)
+            self.ser.close()
+        except serial.SerialException:
+            pass
+
+
+def harmonic_fit(t, y, frequency, harmonics=HARMONICS):
+    """Ajusta y ~ c0 + c1 t + sum_k (a_k sen(2 pi k f t) + b_k cos(2 pi k f t)).
+
+    Devuelve (amplitudes[k], fases[k] en rad, rms del residuo) para k = 1..harmonics."""
+    t = np.asarray(t, dtype=np.float64)
+    y = np.asarray(y, dtype=np.float64)
+    angles = 2 * np.pi * frequency * np.outer(t, np.arange(1, harmonics + 1))
+    design = np.hstack([np.ones((t.size, 1)), t[:, None] - t.mean(), np.sin(angles), np.cos(angles)])
+    coefficients, *_ = np.linalg.lstsq(design, y, rcond=None)
+    a, b = coefficients[2:2 + harmonics], coefficients[2 + harmonics:]
+    residual = y - design @ coefficients
+    return np.hypot(a, b), np.arctan2(b, a), float(np.sqrt(np.mean(residual ** 2)))
+
+
+def analyze_point(command_times, commands, telemetry_times, angles, frequency, settle=SETTLE_SECONDS):
+    """Ganancia, fase (grados, negativa = retraso), THD y ruido de un punto del barrido."""
+    start = command_times[0] + settle
+    end = command_times[-1]
+    c = (command_times >= start) & (command_times <= end)
+    m = (telemetry_times >= start) & (telemetry_times <= end)
+    if c.sum() < 8 or m.sum() < 8:
+        raise ValueError("muy pocas muestras en el tramo estacionario")
+    measured = np.unwrap(np.radians(angles[m])) * STEPS_PER_REVOLUTION / (2 * np.pi)
+    cmd_amp, cmd_phase, _ = harmonic_fit(command_times[c], commands[c], frequency)
+    out_amp, out_phase, noise = harmonic_fit(telemetry_times[m], measured, frequency)
+    gain = out_amp[0] / cmd_amp[0] if cmd_amp[0] > 0 else 0.0
+    phase = math.degrees((out_phase[0] - cmd_phase[0] + np.pi) % (2 * np.pi) - np.pi)
+    thd = float(np.sqrt(np.sum(out_amp[1:] ** 2)) / out_amp[0]) if out_amp[0] > 0 else float('inf')
+    return dict(gain=float(gain), phase_deg=phase, thd=thd, noise_steps=noise,
+                telemetry_samples=int(m.sum()))
+
+
+def unwrap_phase(phase_deg, reference_deg):
+    """Fase desplazada en vueltas enteras a la mas cercana a la de referencia (la
+    medida a la frecuencia anterior del barrido); sin referencia queda en (-180, 180]."""
+    if reference_deg is None:
+        return phase_deg
+    return reference_deg + (phase_deg - reference_deg + 180.0) % 360.0 - 180.0
+
+
+def judge(result):
+    """Motivo de inviabilidad, o None si el punto cumple los criterios."""
+    if abs(result['gain'] - 1.0) > GAIN_TOLERANCE:
+        return f"ganancia {result['gain']:.2f}"
+    # La fase llega envuelta (o desenvuelta a lo largo del barrido): un retraso de
+    # 200 grados aparece como +160, por eso se compara el valor absoluto
+    if abs(result['phase_deg']) > PHASE_LIMIT_DEG:
+        return f"fase {result['phase_deg']:.0f} grados"
+    if result['thd'] > THD_LIMIT:
+        return f"THD {result['thd']:.1%}"
+    return None
+
+
+def run_point(link, frequency, amplitude, command_rate):
+    """Envia la senoidal del punto con plazos absolutos y devuelve los datos grabados."""
+    duration = max(POINT_MIN_SECONDS, POINT_CYCLES / frequency) + SETTLE_SECONDS
+    n = int(duration * command_rate)
+    times = np.arange(n) / command_rate
+    targets = np.rint(amplitude * np.sin(2 * np.pi * frequency * times)).astype(int)
+    sent = np.empty(n)
+    link.start_recording()
+    start = time.perf_counter()
+    for i, target in enumerate(targets.tolist()):
+        delay = start + times[i] - time.perf_counter()
+        if delay > 0:
+            time.sleep(delay)
+        sent[i] = time.perf_counter()
+        link.send(f"m{target}")
+    time.sleep(0.1)                      # cola de la telemetria
+    telemetry_times, angles = link.stop_recording()
+    lateness = sent - (start + times)
+    return sent, targets, telemetry_times, angles, float(np.percentile(lateness, 99))
+
+
+def sweep(link):
+    points = []
+    for (speed, acceleration), command_rate, frequency in itertools.product(
+            MOTOR_SETTINGS, COMMAND_RATES_HZ, FREQUENCIES_HZ):
+        link.send(f"s{speed}")
+        link.send(f"a{acceleration}")
+        if frequency == FREQUENCIES_HZ[0]:
+            last_phase = {}              # fase por amplitud a la frecuencia anterior
+        failed = False
+        for amplitude in AMPLITUDES_STEPS:
+            point = dict(speed=speed, acceleration=acceleration, command_rate=command_rate,
+                         frequency=frequency, amplitude=amplitude)
+            omega = 2 * np.pi * frequency
+            if frequency * 4 > command_rate:
+                point.update(feasible=False, reason="menos de 4 comandos por ciclo", measured=False)
+            elif amplitude * omega > speed or amplitude * omega ** 2 > acceleration:
+                point.update(feasible=False, reason="excede velocidad/aceleracion configuradas", measured=False)
+            elif failed:
+                point.update(feasible=False, reason="amplitud menor ya fallo", measured=False)
+            else:
+                sent, targets, telemetry_times, angles, late_p99 = run_point(link, frequency, amplitude, command_rate)
+                link.send("m0")
+                time.sleep(REST_SECONDS)
+                try:
+                    point.update(analyze_point(sent, targets, telemetry_times, angles, frequency))
+                    point['phase_deg'] = unwrap_phase(point['phase_deg'], last_phase.get(amplitude))
+                    last_phase[amplitude] = point['phase_deg']
+                    reason = judge(point)
+                except ValueError as e:
+                    reason = str(e)
+                point.update(feasible=reason is None, reason=reason, measured=True, late_p99_ms=late_p99 * 1e3)
+                failed = reason is not None
+            points.append(point)
+            status = "OK" if point['feasible'] else f"NO ({point['reason']})"
+            extra = (f" ganancia={point['gain']:.2f} fase={point['phase_deg']:.0f} THD={point['thd']:.1%}"
+                     if 'gain' in point else "")
+            print(f"s={speed} a={acceleration} r={command_rate} Hz f={frequency} Hz A={amplitude}: {status}{extra}")
+    return points
+
+
+def save_envelope(points, path=ENVELOPE_FILE):
+    data = {'created': time.strftime('%Y-%m-%d %H:%M:%S'), 'steps_per_revolution': STEPS_PER_REVOLUTION,
+            'criteria': {'gain_tolerance': GAIN_TOLERANCE, 'phase_limit_deg': PHASE_LIMIT_DEG,
+                         'thd_limit': THD_LIMIT},
+            'points': points}
+    with open(path, 'w') as f:
+        json.dump(data, f, indent=2)
+    print(f"Envolvente guardada en {os.path.abspath(path)} ({len(points)} puntos).")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Barrido de la envolvente de operacion de la mesa.")
+    parser.add_argument("--port", default=SERIAL_PORT)
+    parser.add_argument("--baud", type=int, default=BAUD_RATE)
+    parser.add_argument("--out", default=ENVELOPE_FILE, help="archivo JSON de salida")
+    args = parser.parse_args()
+
+    longest = max(POINT_MIN_SECONDS, POINT_CYCLES / min(FREQUENCIES_HZ)) + SETTLE_SECONDS + 1.0
+    try:
+        link = TableLink(args.port, args.baud, capacity=int(longest * TELEMETRY_RATE_HZ * 1.5))
+    except serial.SerialException as e:
+        print(f"Error al abrir el puerto serial: {e}")
+        return
+    print("Puerto serial abierto. Esperando al ESP32 (3 segundos)...")
+    time.sleep(3)
+    link.ser.reset_input_buffer()
+    link.send(f"r{TELEMETRY_RATE_HZ}")
+    total = len(MOTOR_SETTINGS) * len(COMMAND_RATES_HZ) * len(FREQUENCIES_HZ) * len(AMPLITUDES_STEPS)
+    print(f"Barrido de {total} puntos como maximo.")
+    try:
+        points = sweep(link)
+    except KeyboardInterrupt:
+        print("Barrido interrumpido; no se guarda el mapa.")
+        return
+    finally:
+        link.close()
+    save_envelope(points, args.out)
+
+
+if __name__ == '__main__':
+    main()
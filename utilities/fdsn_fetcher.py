@@ -0,0 +1,244 @@
+"""
+Descarga de registros sismicos desde servicios FDSN con cache local.
+
+- Las respuestas (MiniSEED y StationXML) se guardan en una cache direccionada
+  por contenido: cada blob se nombra con el SHA-256 de sus bytes y un indice
+  asocia cada consulta (URL + parametros) con su blob. Repetir una descarga no
+  vuelve a tocar la red; las consultas sin datos (HTTP 204/404) tambien se
+  recuerdan.
+- Para una lista de eventos, todas las consultas de formas de onda (todas las
+  estaciones candidatas de todos los eventos) se lanzan a la vez en un pool de
+  hilos; luego se piden en paralelo las respuestas instrumentales de las
+  estaciones elegidas (la primera candidata con datos, en orden de preferencia).
+- El resultado se escribe directamente en app/sismic_records como MiniSEED en
+  velocidad (respuesta instrumental removida, m/s), que es lo que la aplicacion
+  espera: el catalogo y el visor derivan la aceleracion de ahi. La deconvolucion
+  usa un prefiltro coseno explicito y un nivel de agua para no amplificar el
+  ruido fuera de la banda del sensor.
+
+Con --base-url se puede apuntar a cualquier servicio FDSN, por ejemplo al
+servidor local de prueba (utilities/fdsn_standin_server.py) para probar sin red.
+
+Uso:
+    python utilities/fdsn_fetcher.py [--events eventos.json] [--base-url URL] [--workers 8]
+
+Formato de eventos.json:
+    [{"name": "chignik-2021", "time": "2021-07-29T06:15:49", "pre": 30, "post": 90,
+      "stations": ["IU.COL", "IU.ANMO"], "channel": "BH?"}]
+"""
+import argparse
+import hashlib
+import io
+import json
+import os
+import threading
+import time
+import urllib.error
+import urllib.parse
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+
+from obspy import UTCDateTime, read, read_inventory
+
+# --- CONFIGURACION ---
+DEFAULT_BASE_URL = "https://service.iris.edu"
+DATASELECT_PATH = "/fdsnws/dataselect/1/query"
+STATION_PATH = "/fdsnws/station/1/query"
+REQUEST_TIMEOUT_S = 60
+DEFAULT_WORKERS = 8
+
+# Remocion de respuesta: prefiltro (f1, f2, f3, f4); las esquinas altas son
+# fracciones de Nyquist porque los canales BH suelen estar a 20-40 Hz
+PRE_FILT_LOW_HZ = (0.02, 0.05)
+PRE_FILT_HIGH_NYQUIST = (0.8, 0.9)
+WATER_LEVEL_DB = 60
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+CACHE_DIR = os.path.join(HERE, ".fdsn_cache")
+RECORDS_DIR = os.path.join(HERE, "..", "app", "sismic_records")
+
+# Evento usado hasta ahora por descarga-sismo.py
+DEFAULT_EVENTS = [
+    {"name": "chignik-2021", "time": "2021-07-29T06:15:49", "pre": 30, "post": 90,
+     "stations": ["IU.COL", "IU.ANMO"], "channel": "BH?"},
+]
+# --- FIN DE LA CONFIGURACION ---
+
+NO_DATA = "nodata"
+
+
+def pre_filt(stream):
+    """Prefiltro para remove_response segun la menor frecuencia de muestreo del stream."""
+    nyquist = 0.5 * min(tr.stats.sampling_rate for tr in stream)
+    return PRE_FILT_LOW_HZ + tuple(f * nyquist for f in PRE_FILT_HIGH_NYQUIST)
+
+
+class ContentCache:
+    """Cache en disco: indice consulta -> SHA-256 del contenido, blobs en objects/xx/<sha>."""
+
+    def __init__(self, folder=CACHE_DIR):
+        self.folder = folder
+        self.index_path = os.path.join(folder, "index.json")
+        self.lock = threading.Lock()
+        self.hits = self.misses = self.bytes_downloaded = 0
+        os.makedirs(os.path.join(folder, "objects"), exist_ok=True)
+        try:
+            with open(self.index_path) as f:
+                self.index = json.load(f)
+        except (OSError, ValueError):
+            self.index = {}
+
+    @staticmethod
+    def request_key(url, params):
+        query = urllib.parse.urlencode(sorted(params.items()))
+        return hashlib.sha256(f"{url}?{query}".encode()).hexdigest()
+
+    def _object_path(self, digest):
+        return os.path.join(self.folder, "objects", digest[:2], digest)
+
+    def _store(self, content):
+        digest = hashlib.sha256(content).hexdigest()
+        path = self._object_path(digest)
+        if not os.path.exists(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            tmp = f"{path}.{threading.get_ident()}.tmp"
+            with open(tmp, "wb") as f:
+                f.write(content)
+            os.replace(tmp, path)
+        return digest
+
+    def get(self, url, params):
+        """Devuelve los bytes de la respuesta (None si el servicio no tiene datos)."""
+        key = self.request_key(url, params)
+        with self.lock:
+            digest = self.index.get(key)
+        if digest == NO_DATA:
+            with self.lock:
+                self.hits += 1
+            return None
+        if digest is not None and os.path.exists(self._object_path(digest)):
+            with self.lock:
+                self.hits += 1
+            with open(self._object_path(digest), "rb") as f:
+                return f.read()
+
+        full_url = f"{url}?{urllib.parse.urlencode(params)}"
+        try:
+            with urllib.request.urlopen(full_url, timeout=REQUEST_TIMEOUT_S) as response:
+                content = response.read() if response.status != 204 else b""
+        except urllib.error.HTTPError as e:
+            if e.code not in (204, 404):
+                raise
+            content = b""
+        digest = self._store(content) if content else NO_DATA
+        with self.lock:
+            self.misses += 1
+            self.bytes_downloaded += len(content)
+            self.index[key] = digest
+        return content or None
+
+    def save(self):
+        """Escribe el indice de forma atomica."""
+        with self.lock:
+            data = json.dumps(self.index, indent=1)
+        tmp = self.index_path + ".tmp"
+        with open(tmp, "w") as f:
+            f.write(data)
+        os.replace(tmp, self.index_path)
+
+
+def _window(event):
+    t0 = UTCDateTime(event["time"])
+    return t0 - event.get("pre", 30), t0 + event.get("post", 90)
+
+
+def _waveform_params(event, station_code):
+    network, station = station_code.split(".")[:2]
+    start, end = _window(event)
+    return {"net": network, "sta": station, "loc": "*", "cha": event.get("channel", "BH?"),
+            "start": start.strftime("%Y-%m-%dT%H:%M:%S"), "end": end.strftime("%Y-%m-%dT%H:%M:%S")}
+
+
+def _station_params(event, station_code):
+    params = _waveform_params(event, station_code)
+    params["level"] = "response"
+    return params
+
+
+def fetch_events(events, base_url=DEFAULT_BASE_URL, out_dir=RECORDS_DIR, workers=DEFAULT_WORKERS, cache=None):
+    """Descarga los eventos, remueve la respuesta instrumental (salida en velocidad, m/s) y
+    los guarda como MiniSEED. Devuelve la lista de archivos escritos."""
+    cache = cache or ContentCache()
+    dataselect_url = base_url.rstrip("/") + DATASELECT_PATH
+    station_url = base_url.rstrip("/") + STATION_PATH
+    os.makedirs(out_dir, exist_ok=True)
+    start = time.perf_counter()
+    written = []
+
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        # 1) Todas las formas de onda candidatas a la vez
+        waveform_futures = {
+            (i, code): pool.submit(cache.get, dataselect_url, _waveform_params(event, code))
+            for i, event in enumerate(events) for code in event["stations"]
+        }
+        # 2) Primera estacion con datos de cada evento (orden de preferencia)
+        chosen = {}
+        for i, event in enumerate(events):
+            for code in event["stations"]:
+                try:
+                    data = waveform_futures[(i, code)].result()
+                except (urllib.error.URLError, OSError) as e:
+                    print(f"{event['name']}: error pidiendo {code}: {e}")
+                    continue
+                if data:
+                    chosen[i] = (code, data)
+                    break
+                print(f"{event['name']}: {code} sin datos, probando la siguiente estacion...")
+            if i not in chosen:
+                print(f"{event['name']}: ninguna estacion tiene datos.")
+        # 3) Respuestas instrumentales de las estaciones elegidas, en paralelo
+        inventory_futures = {i: pool.submit(cache.get, station_url, _station_params(events[i], code))
+                             for i, (code, _) in chosen.items()}
+
+        for i, (code, data) in chosen.items():
+            event = events[i]
+            try:
+                xml = inventory_futures[i].result()
+                if not xml:
+                    print(f"{event['name']}: sin StationXML para {code}.")
+                    continue
+                stream = read(io.BytesIO(data))
+                stream.remove_response(inventory=read_inventory(io.BytesIO(xml)), output="VEL",
+                                       pre_filt=pre_filt(stream), water_level=WATER_LEVEL_DB)
+                path = os.path.join(out_dir, f"{event['name']}_{code}.mseed")
+                stream.write(path, format="MSEED", encoding="FLOAT64")
+                written.append(path)
+                print(f"{event['name']}: {len(stream)} trazas de {code} -> {os.path.normpath(path)}")
+            except Exception as e:
+                print(f"{event['name']}: error procesando {code}: {e}")
+
+    cache.save()
+    elapsed = time.perf_counter() - start
+    print(f"\n{len(written)}/{len(events)} eventos en {elapsed:.2f} s. Cache: {cache.hits} aciertos, "
+          f"{cache.misses} descargas ({cache.bytes_downloaded / 1e6:.2f} MB).")
+    return written
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Descarga de eventos FDSN con cache local.")
+    parser.add_argument("--events", help="archivo JSON con la lista de eventos (por defecto: Chignik 2021)")
+    parser.add_argument("--base-url", default=DEFAULT_BASE_URL, help="servicio FDSN (por defecto IRIS)")
+    parser.add_argument("--out", default=RECORDS_DIR, help="carpeta de salida (por defecto app/sismic_records)")
+    parser.add_argument("--cache", default=CACHE_DIR, help="carpeta de la cache")
+    parser.add_argument("--workers", type=int, default=DEFAULT_WORKERS, help="consultas simultaneas")
+    args = parser.parse_args()
+
+    events = DEFAULT_EVENTS
+    if args.events:
+        with open(args.events) as f:
+            events = json.load(f)
+    fetch_events(events, args.base_url, args.out, args.workers, ContentCache(args.cache))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,136 @@
+"""
+Servidor HTTP local que imita los servicios FDSN dataselect y station.
+
+Sirve para probar utilities/fdsn_fetcher.py sin red:
+    python utilities/fdsn_standin_server.py --port 8089 --stations IU.ANMO
+    python utilities/fdsn_fetcher.py --base-url http://127.0.0.1:8089 --out /tmp/registros
+
+- /fdsnws/dataselect/1/query devuelve MiniSEED (cuentas) para las estaciones
+  configuradas y HTTP 204 (sin datos) para el resto, como un servicio real.
+- /fdsnws/station/1/query?level=response devuelve un StationXML con una
+  respuesta polos/ceros de sismometro de banda ancha.
+Las respuestas son deterministas (misma consulta -> mismos bytes). Con
+--canned DIR se sirven en su lugar archivos grabados de un servicio real,
+nombrados dataselect_<RED>.<EST>.mseed y station_<RED>.<EST>.xml.
+"""
+import argparse
+import hashlib
+import io
+import os
+import threading
+import urllib.parse
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import numpy as np
+from obspy import Stream, Trace, UTCDateTime
+from obspy.core.inventory import Channel, Inventory, Network, Response, Station
+
+SAMPLING_RATE = 20.0
+STAGE_GAIN = 2.0e9          # cuentas por m/s
+
+
+def synthetic_waveforms(network, station, channel_pattern, start, end):
+    """Tres componentes de ruido con un 'sismo' gaussiano en el centro de la ventana."""
+    seed = int(hashlib.sha256(f"{network}.{station}.{start}.{end}".encode()).hexdigest()[:8], 16)
+    rng = np.random.default_rng(seed)
+    n = int((end - start) * SAMPLING_RATE)
+    t = np.arange(n) / SAMPLING_RATE
+    envelope = 0.02 + np.exp(-((t - t[-1] / 2) / (0.1 * t[-1] + 1e-9)) ** 2)
+    traces = []
+    for component in "ENZ":
+        velocity = np.convolve(rng.normal(0, 1e-4, n), np.ones(4) / 4, mode="same") * envelope
+        trace = Trace((velocity * STAGE_GAIN).astype(np.int32))
+        trace.stats.network, trace.stats.station, trace.stats.location = network, station, "00"
+        trace.stats.channel = channel_pattern.replace("?", component)
+        trace.stats.sampling_rate = SAMPLING_RATE
+        trace.stats.starttime = start
+        traces.append(trace)
+    buffer = io.BytesIO()
+    Stream(traces).write(buffer, format="MSEED", encoding="STEIM2")
+    return buffer.getvalue()
+
+
+def synthetic_stationxml(network, station, channel_pattern):
+    response = Response.from_paz(zeros=[0j, 0j], poles=[-0.037 + 0.037j, -0.037 - 0.037j],
+                                 stage_gain=STAGE_GAIN, input_units="M/S", output_units="COUNTS")
+    channels = [Channel(channel_pattern.replace("?", c), "00", 0.0, 0.0, 0.0, 0.0,
+                        sample_rate=SAMPLING_RATE, start_date=UTCDateTime(2000, 1, 1), response=response)
+                for c in "ENZ"]
+    inventory = Inventory([Network(network, [Station(station, 0.0, 0.0, 0.0, channels=channels)])],
+                          source="fdsn-standin")
+    buffer = io.BytesIO()
+    inventory.write(buffer, format="STATIONXML")
+    return buffer.getvalue()
+
+
+class StandinHandler(BaseHTTPRequestHandler):
+    stations = set()
+    canned_dir = None
+    request_count = 0
+    count_lock = threading.Lock()
+
+    def _canned(self, kind, code, extension):
+        if self.canned_dir is None:
+            return None
+        path = os.path.join(self.canned_dir, f"{kind}_{code}.{extension}")
+        if os.path.exists(path):
+            with open(path, "rb") as f:
+                return f.read()
+        return None
+
+    def do_GET(self):
+        with StandinHandler.count_lock:
+            StandinHandler.request_count += 1
+        url = urllib.parse.urlparse(self.path)
+        params = dict(urllib.parse.parse_qsl(url.query))
+        code = f"{params.get('net', '')}.{params.get('sta', '')}"
+        channel = params.get("cha", "BH?")
+        if code not in self.stations and self._canned("dataselect", code, "mseed") is None:
+            self.send_response(204)
+            self.end_headers()
+            return
+        if url.path == "/fdsnws/dataselect/1/query":
+            body = self._canned("dataselect", code, "mseed") or synthetic_waveforms(
+                params["net"], params["sta"], channel, UTCDateTime(params["start"]), UTCDateTime(params["end"]))
+            content_type = "application/vnd.fdsn.mseed"
+        elif url.path == "/fdsnws/station/1/query":
+            body = self._canned("station", code, "xml") or synthetic_stationxml(params["net"], params["sta"], channel)
+            content_type = "application/xml"
+        else:
+            self.send_error(404)
+            return
+        self.send_response(200)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        print(f"[standin #{StandinHandler.request_count}] {format % args}")
+
+
+def make_server(port=8089, stations=("IU.ANMO",), canned_dir=None):
+    """Crea el servidor (sin arrancarlo) para usarlo desde otros scripts."""
+    StandinHandler.stations = set(stations)
+    StandinHandler.canned_dir = canned_dir
+    return ThreadingHTTPServer(("127.0.0.1", port), StandinHandler)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Servidor FDSN local para pruebas sin red.")
+    parser.add_argument("--port", type=int, default=8089)
+    parser.add_argument("--stations", default="IU.ANMO", help="estaciones con datos, separadas por comas")
+    parser.add_argument("--canned", help="carpeta con respuestas grabadas")
+    args = parser.parse_args()
+    server = make_server(args.port, [s.strip() for s in args.stations.split(",") if s.strip()], args.canned)
+    print(f"Servidor FDSN de prueba en http://127.0.0.1:{args.port} (estaciones: {args.stations})")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == "__main__":
+    main()
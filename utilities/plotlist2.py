@@ -15,6 +15,7 @@ class SeismicGroupedViewer:
         self.selected_file = None
         self.selected_trace_index = None
         self.expanded_files = set()  # Archivos expandidos en el árbol
+        self.trace_themes = {}       # Temas de botón compartidos: seleccionado / normal
         
     def load_seismic_data(self):
         """Cargar datos sísmicos desde archivos, agrupados por archivo"""
@@ -121,17 +122,8 @@ class SeismicGroupedViewer:
                                      f"{trace['sampling_rate']}Hz | "
                                      f"{len(trace['times'])/trace['sampling_rate']:.0f}s")
                         
-                        # Usar diferentes colores según selección
-                        if is_selected:
-                            button_color = (100, 200, 100)  # Verde para seleccionado
-                        else:
-                            button_color = (70, 130, 180)   # Azul normal
-                        
-                        with dpg.theme() as trace_theme:
-                            with dpg.theme_component(dpg.mvButton):
-                                dpg.add_theme_color(dpg.mvThemeCol_Button, button_color)
-                                dpg.add_theme_color(dpg.mvThemeCol_ButtonHovered, 
-                                                  (button_color[0]+20, button_color[1]+20, button_color[2]+20))
+                        # Usar diferentes colores según selección (temas reutilizados)
+                        trace_theme = self.get_trace_theme(is_selected)
                         
                         btn = dpg.add_button(label=trace_label,
                                            callback=self.select_trace,
@@ -139,6 +131,21 @@ class SeismicGroupedViewer:
                                            width=650)
                         dpg.bind_item_theme(btn, trace_theme)
     
+    def get_trace_theme(self, is_selected):
+        """Devuelve el tema del botón de traza, creándolo una sola vez"""
+        if is_selected not in self.trace_themes:
+            if is_selected:
+                button_color = (100, 200, 100)  # Verde para seleccionado
+            else:
+                button_color = (70, 130, 180)   # Azul normal
+            with dpg.theme() as trace_theme:
+                with dpg.theme_component(dpg.mvButton):
+                    dpg.add_theme_color(dpg.mvThemeCol_Button, button_color)
+                    dpg.add_theme_color(dpg.mvThemeCol_ButtonHovered, 
+                                      (button_color[0]+20, button_color[1]+20, button_color[2]+20))
+            self.trace_themes[is_selected] = trace_theme
+        return self.trace_themes[is_selected]
+    
     def select_trace(self, sender, app_data, user_data):
         """Seleccionar una traza específica y mostrar en el plotter"""
         self.selected_trace_index = user_data
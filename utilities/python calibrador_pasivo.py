@@ -1,11 +1,13 @@
 import serial
 import time
+import json
+import os
 from collections import deque
 import threading
 
 # --- CONFIGURACION ---
-SERIAL_PORT = 'COM4' 
-BAUD_RATE = 115200
+SERIAL_PORT = 'COM4'
+BAUD_RATE = 921600    # micro2nucleoV2
 
 # Parametros del motor (ajusta a tu configuracion)
 STEPS_PER_REVOLUTION = 3200
@@ -18,34 +20,42 @@ ACCEL_STEP = 100000
 
 SPEED_START = 500000
 SPEED_END = 1200000
-SPEED_STEP = 50000
+# Resolucion de la busqueda: la biseccion se detiene cuando el intervalo
+# [ultima velocidad exitosa, primera fallida] es menor que este valor.
+SPEED_RESOLUTION = 10000
 
 # Parametros del test de movimiento
 # La direccion se alternara automaticamente en cada prueba.
-BASE_MOVE_DEGREES = 360 * 3 
+BASE_MOVE_DEGREES = 360 * 3
 ERROR_TOLERANCE_DEGREES = 10.0
 
-# Parametros para la deteccion de parada del motor
+# Parametros para la deteccion de parada del motor (a partir de la telemetria)
 STABILITY_WINDOW_SEC = 0.3
-STABILITY_THRESHOLD_DEG = 0.2
+STOP_VELOCITY_DEG_S = 1.0      # velocidad estimada por debajo de la cual el motor esta detenido
+STOP_TIMEOUT_SEC = 20.0
+
+# Tabla de limites que consume la aplicacion (app/motion_limits.py)
+LIMITS_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "app", "motion_limits.json")
 # --- FIN DE LA CONFIGURACION ---
 
 
 class ESP32Monitor:
     """
     Gestiona la comunicacion y el monitoreo del ESP32 sin modificar su codigo.
-    Lee el flujo de datos del encoder en un hilo separado.
+    Lee el flujo de datos del encoder en un hilo separado y guarda una ventana
+    corta de muestras (tiempo, angulo) para estimar la velocidad.
     """
     def __init__(self, port, baudrate):
         self.ser = serial.Serial(port, baudrate, timeout=1)
         self.latest_angle = 0.0
         self.is_running = True
-        self.lock = threading.Lock()
-        
+        self.samples = deque(maxlen=4096)   # (tiempo_s, angulo_grados)
+        self.new_sample = threading.Condition()
+
         self.reader_thread = threading.Thread(target=self._read_serial_thread)
         self.reader_thread.daemon = True
         self.reader_thread.start()
-        
+
         print(f"Conectado a {port}. Esperando datos del encoder...")
         time.sleep(2)
 
@@ -55,12 +65,19 @@ class ESP32Monitor:
         while self.is_running:
             try:
                 line = self.ser.readline().decode('utf-8').strip()
-                if line:
-                    clean_line = ''.join(filter(lambda x: x in '0123456789.-', line))
-                    if clean_line:
-                        angle = float(clean_line)
-                        with self.lock:
-                            self.latest_angle = angle
+                if not line:
+                    continue
+                # Firmware con marca de tiempo: "<micros>,<grados>"; anterior: "<grados>"
+                if ',' in line:
+                    device_us, angle_text = line.split(',', 1)
+                    sample_time = int(device_us) * 1e-6
+                else:
+                    angle_text, sample_time = line, time.monotonic()
+                angle = float(angle_text)
+                with self.new_sample:
+                    self.latest_angle = angle
+                    self.samples.append((sample_time, angle))
+                    self.new_sample.notify_all()
             except (ValueError, UnicodeDecodeError):
                 pass
             except serial.SerialException:
@@ -69,31 +86,55 @@ class ESP32Monitor:
 
     def get_latest_angle(self):
         """Obtiene el ultimo angulo leido de forma segura."""
-        with self.lock:
+        with self.new_sample:
             return self.latest_angle
 
     def send_command(self, command):
         """Envia un comando al ESP32."""
         print(f"-> Enviando: {command}")
         self.ser.write((command + '\n').encode('utf-8'))
-        time.sleep(0.05)
 
-    def wait_for_stop(self):
-        """Espera hasta que el motor se detenga."""
+    def _velocity_estimate(self):
+        """Pendiente (grados/s) por minimos cuadrados sobre la ventana de estabilidad."""
+        if len(self.samples) < 2:
+            return None
+        t_end = self.samples[-1][0]
+        window = [(t, a) for t, a in reversed(self.samples) if t_end - t <= STABILITY_WINDOW_SEC]
+        if len(window) < 2 or window[0][0] - window[-1][0] < 0.8 * STABILITY_WINDOW_SEC:
+            return None
+        n = len(window)
+        mean_t = sum(t for t, _ in window) / n
+        mean_a = sum(a for _, a in window) / n
+        var = sum((t - mean_t) ** 2 for t, _ in window)
+        if var == 0:
+            return None
+        return sum((t - mean_t) * (a - mean_a) for t, a in window) / var
+
+    def wait_for_stop(self, after_command=False):
+        """Espera hasta que la telemetria indique que el motor se detuvo.
+
+        Se despierta con cada muestra nueva en lugar de dormir intervalos fijos.
+        Con after_command=True solo se evalua la telemetria posterior al comando
+        y se exige haber visto movimiento (o 1 s sin moverse) antes de aceptar la parada."""
         print("... Esperando a que el motor se detenga...")
-        num_readings = int(STABILITY_WINDOW_SEC / 0.005)
-        history = deque(maxlen=num_readings)
-        time.sleep(0.1) 
-
-        while True:
-            history.append(self.get_latest_angle())
-            if len(history) == num_readings:
-                delta = max(history) - min(history)
-                if delta < STABILITY_THRESHOLD_DEG:
+        start = time.monotonic()
+        deadline = start + STOP_TIMEOUT_SEC
+        seen_motion = not after_command
+        with self.new_sample:
+            if after_command:
+                self.samples.clear()
+            while time.monotonic() < deadline:
+                self.new_sample.wait(timeout=0.1)
+                velocity = self._velocity_estimate()
+                if velocity is None:
+                    continue
+                if abs(velocity) >= STOP_VELOCITY_DEG_S:
+                    seen_motion = True
+                elif seen_motion or time.monotonic() - start > 1.0:
                     print("Motor detenido detectado!")
-                    time.sleep(0.1)
-                    return self.get_latest_angle()
-            time.sleep(0.01)
+                    return self.latest_angle
+        print("ADVERTENCIA: tiempo de espera agotado sin detectar parada.")
+        return self.get_latest_angle()
 
     def close(self):
         """Cierra la conexion y detiene el hilo."""
@@ -104,59 +145,133 @@ class ESP32Monitor:
         print("Conexion cerrada.")
 
 
+class CalibrationEngine:
+    """
+    Busca la maxima velocidad confiable para cada aceleracion por biseccion.
+    El resultado de la aceleracion anterior se usa como punto de partida:
+    si sigue funcionando se busca hacia arriba, si falla hacia abajo.
+    """
+    def __init__(self, monitor):
+        self.monitor = monitor
+        self.current_step_pos = 0
+        self.direction_multiplier = 1
+        self.moves = 0
+
+    def test_speed(self, speed):
+        """Ejecuta un movimiento de prueba a la velocidad dada. Devuelve True si fue exitoso."""
+        monitor = self.monitor
+        monitor.send_command(f"s{speed}")
+
+        # Alternar direccion en cada prueba de velocidad
+        move_degrees_this_test = BASE_MOVE_DEGREES * self.direction_multiplier
+        start_angle = monitor.get_latest_angle()
+        expected_angle_change = abs(move_degrees_this_test)
+        steps_to_move = int((move_degrees_this_test / 360.0) * STEPS_PER_REVOLUTION)
+        target_step_pos = self.current_step_pos + steps_to_move
+
+        print(f"Probando Velocidad: {speed} Hz... (Direccion: {'Positiva' if self.direction_multiplier > 0 else 'Negativa'})")
+        monitor.send_command(f"m{target_step_pos}")
+        self.moves += 1
+        final_angle = monitor.wait_for_stop(after_command=True)
+
+        actual_angle_change = abs(final_angle - start_angle)
+        error = abs(expected_angle_change - actual_angle_change)
+        if error <= ERROR_TOLERANCE_DEGREES:
+            print(f"  EXITO. Error: {error:.2f} grados.")
+            self.current_step_pos = target_step_pos
+            # Invertir la direccion para la proxima prueba
+            self.direction_multiplier *= -1
+            return True
+
+        print(f"  FALLO. Error: {error:.2f} grados (Esperado: {expected_angle_change:.2f}, Obtenido: {actual_angle_change:.2f}).")
+        monitor.send_command(f"s{SPEED_START}")
+        monitor.send_command("m0")
+        monitor.wait_for_stop(after_command=True)
+        self.current_step_pos = 0
+        return False
+
+    def max_speed_for_accel(self, accel, hint=None):
+        """Velocidad maxima exitosa para una aceleracion, con resolucion SPEED_RESOLUTION.
+
+        hint es la velocidad esperada (resultado extrapolado de las aceleraciones
+        anteriores): se prueba primero y el intervalo se abre a pasos dobles
+        desde alli antes de bisecar. Sin hint se biseca todo el rango."""
+        self.monitor.send_command(f"a{accel}")
+        print(f"\n--- Probando Aceleracion: {accel} steps/s^2 ---")
+
+        # Invariante: good es exitosa (0 = ninguna), bad falla (o esta fuera de rango)
+        if hint is None:
+            if not self.test_speed(SPEED_START):
+                return 0
+            good, bad = SPEED_START, SPEED_END + SPEED_RESOLUTION
+        else:
+            start = min(max(int(hint), SPEED_START), SPEED_END)
+            step = SPEED_RESOLUTION
+            if self.test_speed(start):
+                good, bad = start, SPEED_END + SPEED_RESOLUTION
+                while good < SPEED_END:
+                    probe = min(good + step, SPEED_END)
+                    if not self.test_speed(probe):
+                        bad = probe
+                        break
+                    good, step = probe, step * 2
+            else:
+                good, bad = 0, start
+                while bad > SPEED_START:
+                    probe = max(bad - step, SPEED_START)
+                    if self.test_speed(probe):
+                        good = probe
+                        break
+                    bad, step = probe, step * 2
+                if good == 0:
+                    return 0
+
+        while bad - good > SPEED_RESOLUTION:
+            mid = (good + bad) // 2
+            if self.test_speed(mid):
+                good = mid
+            else:
+                bad = mid
+        return good
+
+
+def predict_next_limit(results):
+    """Extrapola linealmente la frontera con los dos ultimos resultados (seguimiento de frontera)."""
+    speeds = [speed for _, speed in sorted(results.items()) if speed > 0]
+    if not speeds:
+        return None
+    if len(speeds) == 1:
+        return speeds[-1]
+    return speeds[-1] + (speeds[-1] - speeds[-2])
+
+
+def save_limit_table(results, path=LIMITS_FILE):
+    """Escribe la tabla de limites (aceleracion -> velocidad maxima) para la aplicacion."""
+    table = {
+        'steps_per_revolution': STEPS_PER_REVOLUTION,
+        'speed_resolution': SPEED_RESOLUTION,
+        'created': time.strftime('%Y-%m-%d %H:%M:%S'),
+        'limits': [{'acceleration': accel, 'max_speed': speed} for accel, speed in sorted(results.items())],
+    }
+    with open(path, 'w') as f:
+        json.dump(table, f, indent=2)
+    print(f"Tabla de limites guardada en: {os.path.normpath(path)}")
+
+
 def run_calibration():
     """Ejecuta el proceso completo de calibracion."""
     results = {}
-    current_step_pos = 0
-    # CAMBIO 2: Variable para alternar la direccion
-    direction_multiplier = 1 
+    engine = None
 
     try:
         monitor = ESP32Monitor(SERIAL_PORT, BAUD_RATE)
+        engine = CalibrationEngine(monitor)
         initial_pos = monitor.wait_for_stop()
         # CAMBIO 3: Se quitan las tildes de los prints
         print(f"Posicion inicial estable: {initial_pos:.2f} grados")
 
         for accel in range(ACCEL_START, ACCEL_END + 1, ACCEL_STEP):
-            monitor.send_command(f"a{accel}")
-            last_successful_speed = 0
-            
-            print(f"\n--- Probando Aceleracion: {accel} steps/s^2 ---")
-            
-            for speed in range(SPEED_START, SPEED_END + 1, SPEED_STEP):
-                monitor.send_command(f"s{speed}")
-                
-                # Alternar direccion en cada prueba de velocidad
-                move_degrees_this_test = BASE_MOVE_DEGREES * direction_multiplier
-                
-                start_angle = monitor.get_latest_angle()
-                expected_angle_change = abs(move_degrees_this_test)
-                
-                steps_to_move = int((move_degrees_this_test / 360.0) * STEPS_PER_REVOLUTION)
-                target_step_pos = current_step_pos + steps_to_move
-                
-                print(f"Probando Velocidad: {speed} Hz... (Direccion: {'Positiva' if direction_multiplier > 0 else 'Negativa'})")
-                monitor.send_command(f"m{target_step_pos}")
-
-                final_angle = monitor.wait_for_stop()
-                
-                actual_angle_change = abs(final_angle - start_angle)
-                error = abs(expected_angle_change - actual_angle_change)
-
-                if error <= ERROR_TOLERANCE_DEGREES:
-                    print(f"  EXITO. Error: {error:.2f} grados.")
-                    last_successful_speed = speed
-                    current_step_pos = target_step_pos
-                else:
-                    print(f"  FALLO. Error: {error:.2f} grados (Esperado: {expected_angle_change:.2f}, Obtenido: {actual_angle_change:.2f}).")
-                    monitor.send_command("m0")
-                    monitor.wait_for_stop()
-                    current_step_pos = 0
-                    break
-                
-                # Invertir la direccion para la proxima prueba
-                direction_multiplier *= -1
-
+            last_successful_speed = engine.max_speed_for_accel(accel, hint=predict_next_limit(results))
             results[accel] = last_successful_speed
             print(f"-> Maxima velocidad para aceleracion {accel} es: {last_successful_speed} Hz")
 
@@ -165,7 +280,11 @@ def run_calibration():
     finally:
         if 'monitor' in locals():
             monitor.close()
-    
+        if engine is not None:
+            print(f"Movimientos de prueba realizados: {engine.moves}")
+
+    if results:
+        save_limit_table(results)
     return results
 
 if __name__ == "__main__":
@@ -175,4 +294,4 @@ if __name__ == "__main__":
         print("No se completo ninguna prueba.")
     else:
         for accel, speed in final_results.items():
-            print(f"Aceleracion: {accel:<8} -> Vel. Maxima Sostenible: {speed} Hz")
\ No newline at end of file
+            print(f"Aceleracion: {accel:<8} -> Vel. Maxima Sostenible: {speed} Hz")
@@ -0,0 +1,77 @@
+"""
+Desglose del tiempo de arranque de la aplicacion con `python -X importtime`.
+
+Importa app/main.py en un interprete nuevo (como al lanzar la aplicacion),
+y muestra el tiempo total de importacion y los modulos mas costosos, tanto por
+tiempo acumulado (incluye sus dependencias) como por tiempo propio.
+Tambien indica si ObsPy/scipy se cargaron en el arranque (no deberian: se
+importan al usar el visor de trazas).
+
+Uso:
+    python utilities/startup_importtime.py [--module main] [--top 15] [--raw salida.txt]
+"""
+import argparse
+import os
+import subprocess
+import sys
+import time
+
+APP_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "app")
+HEAVY_PACKAGES = ("obspy", "scipy", "matplotlib")
+
+
+def run_importtime(module):
+    """Ejecuta el import en un proceso nuevo y devuelve (lineas de importtime, segundos de reloj)."""
+    start = time.perf_counter()
+    result = subprocess.run([sys.executable, "-X", "importtime", "-c", f"import {module}"],
+                            cwd=os.path.abspath(APP_DIR), capture_output=True, text=True)
+    elapsed = time.perf_counter() - start
+    if result.returncode != 0:
+        sys.exit(f"Error importando {module}:\n{result.stderr[-2000:]}")
+    return result.stderr.splitlines(), elapsed
+
+
+def parse_importtime(lines):
+    """Convierte la salida de -X importtime en [(modulo, propio_us, acumulado_us, nivel)]."""
+    rows = []
+    for line in lines:
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|", 2)
+        level = (len(name) - len(name.lstrip())) // 2
+        rows.append((name.strip(), int(self_us), int(cumulative_us), level))
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Desglose -X importtime del arranque de la app.")
+    parser.add_argument("--module", default="main", help="modulo de app/ a importar (por defecto main)")
+    parser.add_argument("--top", type=int, default=15, help="cantidad de modulos a mostrar")
+    parser.add_argument("--raw", help="guardar la salida completa de -X importtime en este archivo")
+    args = parser.parse_args()
+
+    lines, elapsed = run_importtime(args.module)
+    if args.raw:
+        with open(args.raw, "w") as f:
+            f.write("\n".join(lines) + "\n")
+    rows = parse_importtime(lines)
+
+    total_us = sum(cumulative for _, _, cumulative, level in rows if level == 0)
+    print(f"Proceso completo (interprete + import {args.module}): {elapsed:.3f} s")
+    print(f"Tiempo total de imports: {total_us / 1e6:.3f} s en {len(rows)} modulos\n")
+
+    print(f"--- Top {args.top} por tiempo acumulado (imports directos de {args.module}) ---")
+    direct = sorted((r for r in rows if r[3] == 1), key=lambda r: r[2], reverse=True)
+    for name, _, cumulative, _ in direct[:args.top]:
+        print(f"{cumulative / 1000:10.1f} ms  {name}")
+
+    print(f"\n--- Top {args.top} por tiempo propio ---")
+    for name, self_us, _, _ in sorted(rows, key=lambda r: r[1], reverse=True)[:args.top]:
+        print(f"{self_us / 1000:10.1f} ms  {name}")
+
+    loaded = sorted({name.split(".")[0] for name, _, _, _ in rows} & set(HEAVY_PACKAGES))
+    print(f"\nPaquetes pesados cargados en el arranque: {', '.join(loaded) if loaded else 'ninguno'}")
+
+
+if __name__ == "__main__":
+    main()
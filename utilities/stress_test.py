@@ -5,7 +5,7 @@ import threading
 import matplotlib.pyplot as plt
 
 SERIAL_PORT = 'COM4' 
-BAUD_RATE = 115200
+BAUD_RATE = 921600    # micro2nucleoV2
 
 MOTOR_SPEED_HZ = 1200000
 MOTOR_ACCELERATION = 500000
@@ -30,7 +30,12 @@ def serial_reader(ser):
         try:
             if ser.in_waiting > 0:
                 line = ser.readline().decode('utf-8').strip()
-                angle_deg = float(line)
+                if line.startswith('#q'):
+                    # contadores del firmware (micro2nucleoV2): respuesta al comando 'q'
+                    print(f"Estadisticas del ESP32: {line[3:]}")
+                    continue
+                # Firmware con marca de tiempo: "<micros>,<grados>"; anterior: "<grados>"
+                angle_deg = float(line.split(',', 1)[-1])
                 real_time_stamps.append(time.time() - start_time)
                 plot_data_real.append(angle_deg)
         except (ValueError, UnicodeDecodeError, serial.SerialException):
@@ -84,6 +89,7 @@ def main():
     reader_thread.daemon = True
     reader_thread.start()
 
+    ser.write(b'q\n')   # reinicia la ventana de contadores del firmware
     start_time = time.time()
     loop_delay = 1.0 / COMMAND_FREQUENCY_HZ
 
@@ -109,14 +115,17 @@ def main():
     except KeyboardInterrupt:
         print("Prueba interrumpida.")
     finally:
-        is_running = False
         print("Finalizando prueba...")
         try:
+            ser.write(b'q\n')   # contadores de la prueba: cmd deberia acercarse a COMMAND_FREQUENCY_HZ
+            time.sleep(0.2)     # el lector sigue activo para imprimir la respuesta
+            is_running = False
             ser.write(b'm0\n')
             time.sleep(0.5)
             ser.close()
         except serial.SerialException:
             pass
+        is_running = False
         reader_thread.join(timeout=1)
         print("Conexión cerrada.")
 